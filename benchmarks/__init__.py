@@ -0,0 +1,4 @@
+"""Throughput benchmarks run against a local stub translation server.
+
+Run with: python -m benchmarks.run --help
+"""
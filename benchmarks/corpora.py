@@ -0,0 +1,130 @@
+import os
+import random
+
+WORDS = (
+    "the quick brown fox jumps over a lazy dog while river lights drift past quiet houses and "
+    "old friends remember summer evenings under tall trees near the harbour"
+).split()
+
+# Paragraphs per PDF page and per EPUB chapter
+PARAGRAPHS_PER_PAGE = 8
+
+def _sentences(rng, count):
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(6, 18))
+        yield " ".join(words).capitalize() + "."
+
+def _paragraphs(size, seed):
+    """Return size deterministic paragraphs of two to five sentences."""
+    rng = random.Random(seed)
+    return [" ".join(_sentences(rng, rng.randint(2, 5))) for _ in range(size)]
+
+def write_txt(file_path, size, seed=0):
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(_paragraphs(size, seed)) + "\n")
+
+def _srt_time(milliseconds):
+    hours, rest = divmod(milliseconds, 3600000)
+    minutes, rest = divmod(rest, 60000)
+    seconds, rest = divmod(rest, 1000)
+    return f"{hours:02}:{minutes:02}:{seconds:02},{rest:03}"
+
+def write_srt(file_path, size, seed=0):
+    rng = random.Random(seed)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for index, text in enumerate(_sentences(rng, size), 1):
+            start = index * 3000
+            f.write(f"{index}\n{_srt_time(start)} --> {_srt_time(start + 2500)}\n{text}\n\n")
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _pdf_wrap(text, width=90):
+    line = ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            yield line
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        yield line
+
+def write_pdf(file_path, size, seed=0):
+    """Write a plain PDF with extractable text, without a PDF authoring library."""
+    paragraphs = _paragraphs(size, seed)
+    pages = [paragraphs[i:i + PARAGRAPHS_PER_PAGE] for i in range(0, len(paragraphs), PARAGRAPHS_PER_PAGE)]
+
+    # Objects 1-3 are the catalog, the page tree and the font; each page then
+    # takes a page object and a content stream object
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        lines = [line for paragraph in page for line in list(_pdf_wrap(paragraph)) + [""]]
+        text = " T* ".join(f"({_pdf_escape(line)}) Tj" for line in lines)
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td {text} ET".encode("latin-1")
+        page_number = len(objects) + 1
+        kids.append(f"{page_number} 0 R")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+                       f"/Contents {page_number + 1} 0 R >>".encode("latin-1"))
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode("latin-1")
+
+    with open(file_path, 'wb') as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+def write_docx(file_path, size, seed=0):
+    from docx import Document
+    doc = Document()
+    for paragraph in _paragraphs(size, seed):
+        doc.add_paragraph(paragraph)
+    doc.save(file_path)
+
+def write_epub(file_path, size, seed=0):
+    from ebooklib import epub
+    book = epub.EpubBook()
+    book.set_identifier(f"benchmark-{size}-{seed}")
+    book.set_title("Benchmark corpus")
+    book.set_language("en")
+
+    paragraphs = _paragraphs(size, seed)
+    chapters = []
+    for number, start in enumerate(range(0, len(paragraphs), PARAGRAPHS_PER_PAGE), 1):
+        chapter = epub.EpubHtml(title=f"Chapter {number}", file_name=f"chapter_{number}.xhtml", lang="en")
+        body = "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs[start:start + PARAGRAPHS_PER_PAGE])
+        chapter.content = f"<h1>Chapter {number}</h1>{body}"
+        book.add_item(chapter)
+        chapters.append(chapter)
+
+    book.toc = chapters
+    book.spine = chapters
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    epub.write_epub(file_path, book)
+
+WRITERS = {
+    "txt": write_txt,
+    "srt": write_srt,
+    "pdf": write_pdf,
+    "docx": write_docx,
+    "epub": write_epub,
+}
+
+def make_corpus(file_type, size, directory, seed=0):
+    """Write a synthetic corpus of size paragraphs (or cues) and return its path.
+
+    Corpora are deterministic for a given seed, and an existing file is reused.
+    """
+    file_path = os.path.join(directory, f"corpus_{size}_{seed}.{file_type}")
+    if not os.path.exists(file_path):
+        WRITERS[file_type](file_path, size, seed)
+    return file_path
@@ -0,0 +1,209 @@
+"""Measure translation throughput against a local stub server.
+
+Each case (backend, format, corpus size) runs in a fresh process, so its
+peak RSS is its own. Results are written as JSON; pass an earlier result
+file with --compare to see how throughput changed between versions.
+
+Example:
+    python -m benchmarks.run --sizes 100 1000 --latency 0.05 --jitter 0.02
+    python -m benchmarks.run --compare benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.corpora import make_corpus, WRITERS
+from benchmarks.stub_server import StubServer, STUB_MODEL, API_PATH
+from telemetry import percentile
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_case(case):
+    """Read and translate one corpus in this process and return its measurements."""
+    from http_client import configure_http_client, get_http_client
+    from file_handlers import get_file_format
+    from model_handlers import translate_with_ollama, translate_with_api, chunk_size_for, split_text_into_chunks
+    from rate_limiter import RequestGovernor
+
+    configure_http_client(pool_maxsize=case["workers"])
+    latencies = []
+    lock = threading.Lock()
+
+    def record_latency(response, *args, **kwargs):
+        # elapsed is the time until the response headers arrived
+        with lock:
+            latencies.append(response.elapsed.total_seconds())
+
+    get_http_client().session.hooks["response"].append(record_latency)
+
+    # A fixed chunk size, so a local calibration does not change the results
+    chunk_size = chunk_size_for(case["backend"], STUB_MODEL)
+    file_format = get_file_format(case["format"])
+    started = time.perf_counter()
+    if file_format.kind == "subtitle":
+        content = file_format.read(case["path"])
+        units = len(content)
+    else:
+        segments, _ = file_format.open_stream(case["path"])
+        content = "".join(segments)
+        units = len(split_text_into_chunks(content, chunk_size))
+    read_seconds = time.perf_counter() - started
+
+    governor = RequestGovernor(case["workers"], max_retries=case["retries"], max_delay=case["max_delay"])
+    translate_started = time.perf_counter()
+    if case["backend"] == "ollama":
+        translate_with_ollama(content, STUB_MODEL, "en", "zh", max_workers=case["workers"],
+                              batch_size=case["batch_size"], chunk_size=chunk_size, stream=case["stream"],
+                              governor=governor, host=case["url"])
+    else:
+        translate_with_api(content, case["url"] + API_PATH, "benchmark", "en", "zh", max_workers=case["workers"],
+                           batch_size=case["batch_size"], chunk_size=chunk_size, governor=governor)
+    translate_seconds = time.perf_counter() - translate_started
+    wall_seconds = time.perf_counter() - started
+
+    return {
+        "backend": case["backend"],
+        "format": case["format"],
+        "size": case["size"],
+        "units": units,
+        "requests": len(latencies),
+        "retries": governor.retries,
+        "read_seconds": round(read_seconds, 4),
+        "translate_seconds": round(translate_seconds, 4),
+        "wall_seconds": round(wall_seconds, 4),
+        "chunks_per_sec": round(units / translate_seconds, 2) if translate_seconds else None,
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_p99": percentile(latencies, 0.99),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+def _run_case_child(case, results):
+    try:
+        results.put(run_case(case))
+    except Exception as e:
+        results.put({"backend": case["backend"], "format": case["format"], "size": case["size"], "error": str(e)})
+
+def run_isolated(case):
+    """Run a case in a fresh interpreter so peak RSS is measured per case."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run_case_child, args=(case, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(RESULTS_DIR)).stdout.strip() or None
+    except OSError:
+        return None
+
+def _case_key(result):
+    return (result["backend"], result["format"], result["size"])
+
+def compare(results, baseline_path):
+    """Print the change in throughput and wall time against an earlier result file."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {_case_key(result): result for result in json.load(f)["results"]}
+
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        old = baseline.get(_case_key(result))
+        if old is None or "error" in result or "error" in old or not old.get("chunks_per_sec"):
+            continue
+        speedup = result["chunks_per_sec"] / old["chunks_per_sec"] - 1
+        wall = result["wall_seconds"] / old["wall_seconds"] - 1 if old["wall_seconds"] else 0
+        print(f"  {result['backend']:6} {result['format']:4} {result['size']:>7}  "
+              f"chunks/s {speedup:+.1%}  wall {wall:+.1%}  rss {result['peak_rss_mb'] - old['peak_rss_mb']:+.1f} MB")
+
+def _format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.0f}"
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark translation throughput against a stub server.")
+    parser.add_argument("--backends", nargs="+", choices=["ollama", "api"], default=["ollama", "api"])
+    parser.add_argument("--formats", nargs="+", choices=sorted(WRITERS), default=sorted(WRITERS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 5000],
+                        help="corpus sizes in paragraphs (subtitle cues for SRT)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=10, help="subtitle cues per request")
+    parser.add_argument("--stream", action="store_true", help="stream Ollama responses")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency per request in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random latency added or removed, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests failing with 429")
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--max-delay", type=float, default=1.0, help="longest retry backoff in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus-dir", help="where to keep generated corpora (default: a temporary directory)")
+    parser.add_argument("-o", "--output", help="result file (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix="translator-bench-")
+    os.makedirs(corpus_dir, exist_ok=True)
+
+    results = []
+    with StubServer(args.latency, args.jitter, args.error_rate, args.rate_limit_rate, seed=args.seed) as stub:
+        print(f"{'backend':6} {'fmt':4} {'size':>7} {'chunks':>7} {'reqs':>6} {'chunks/s':>9} "
+              f"{'p50ms':>6} {'p95ms':>6} {'p99ms':>6} {'wall s':>7} {'rss MB':>7}")
+        for file_type in args.formats:
+            for size in args.sizes:
+                path = make_corpus(file_type, size, corpus_dir, args.seed)
+                for backend in args.backends:
+                    result = run_isolated({
+                        "backend": backend, "format": file_type, "size": size, "path": path, "url": stub.url,
+                        "workers": args.workers, "batch_size": args.batch_size, "stream": args.stream,
+                        "retries": args.retries, "max_delay": args.max_delay,
+                    })
+                    results.append(result)
+                    if "error" in result:
+                        print(f"{backend:6} {file_type:4} {size:>7}  error: {result['error']}")
+                        continue
+                    print(f"{backend:6} {file_type:4} {size:>7} {result['units']:>7} {result['requests']:>6} "
+                          f"{result['chunks_per_sec']:>9} {_format_ms(result['latency_p50']):>6} "
+                          f"{_format_ms(result['latency_p95']):>6} {_format_ms(result['latency_p99']):>6} "
+                          f"{result['wall_seconds']:>7.2f} {result['peak_rss_mb']:>7.1f}")
+        server_stats = stub.stats()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "server": server_stats,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
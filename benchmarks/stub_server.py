@@ -0,0 +1,146 @@
+import json
+import random
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+STUB_MODEL = "bench-model"
+# Path of the generic translate API served next to the Ollama endpoints
+API_PATH = "/translate"
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients that abort a request close the connection before the reply is sent
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class StubServer:
+    """A fake Ollama and generic translate API server for benchmarks.
+
+    Every POST waits latency seconds plus or minus up to jitter seconds, then
+    fails with a 500 at error_rate or a 429 (with Retry-After) at
+    rate_limit_rate, and otherwise echoes the text back as its translation.
+    Faults and jitter come from a seeded generator, so runs are repeatable.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0, retry_after=0, seed=0,
+                 host="127.0.0.1", port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _QuietServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def next_outcome(self):
+        """Draw the delay and status of the next request."""
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            roll = self._random.random()
+            if roll < self.rate_limit_rate:
+                self.rate_limited += 1
+                return delay, 429
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.errors += 1
+                return delay, 500
+            return delay, 200
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors, "rate_limited": self.rate_limited}
+
+def _message(content, done=True):
+    return {"message": {"role": "assistant", "content": content}, "done": done}
+
+def _make_handler(stub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, data, headers=None):
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_stream(self, text):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            words = text.split(" ")
+            lines = [_message(word + " ", done=False) for word in words]
+            lines.append(dict(_message(""), done_reason="stop", eval_count=len(words)))
+            for line in lines:
+                data = json.dumps(line).encode("utf-8") + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.write(b"0\r\n\r\n")
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send_json(200, {"models": [{"name": STUB_MODEL}]})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            data = json.loads(self.rfile.read(length) or b"{}")
+
+            delay, status = stub.next_outcome()
+            time.sleep(delay)
+            if status == 429:
+                return self._send_json(429, {"error": "rate limited"}, {"Retry-After": str(stub.retry_after)})
+            if status != 200:
+                return self._send_json(status, {"error": "server error"})
+
+            if self.path == "/api/chat":
+                messages = data.get("messages", [])
+                if not messages:
+                    # A request without messages only loads the model
+                    return self._send_json(200, dict(_message(""), done_reason="load"))
+                text = messages[-1].get("content", "")
+                if text.startswith("Translate: "):
+                    text = text[len("Translate: "):]
+                if data.get("stream"):
+                    return self._send_stream(text)
+                return self._send_json(200, dict(_message(text), done_reason="stop"))
+            if self.path == API_PATH:
+                return self._send_json(200, {"translated_text": data.get("text", "")})
+            self._send_json(404, {"error": "not found"})
+
+    return Handler
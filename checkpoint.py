@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+
+JOURNAL_VERSION = 1
+
+def file_sha256(file_path):
+    """Hash a file in blocks so large inputs are never fully loaded."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def text_fingerprint(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def journal_path_for(output_file):
+    """Return the journal path kept next to an output file."""
+    return output_file + ".journal"
+
+class TranslationJournal:
+    """Append-only per-chunk journal used to resume an interrupted job.
+
+    The first line holds the job metadata; every later line records one
+    translated chunk, or for jobs read by byte offset a checkpoint: how far
+    into the input and the output the job had got. An existing journal is only reused if its metadata
+    matches the current job exactly, otherwise it is discarded.
+
+    Only the file offset of each journaled chunk is kept in memory; its
+    translation is read back from the file when the chunk is replayed, and
+    forgotten afterwards.
+    """
+
+    def __init__(self, path, metadata):
+        self.path = path
+        self.metadata = dict(metadata, journal_version=JOURNAL_VERSION)
+        self._offsets = {}
+        self._count = 0
+        self._reader = None
+        self.checkpoint = None
+        self._lock = threading.Lock()
+
+        valid_end = self._load()
+        if valid_end is not None:
+            self._file = open(path, 'r+b')
+            # Drop a last line cut short by a crash, so new lines do not follow it
+            self._file.truncate(valid_end)
+            self._file.seek(valid_end)
+            self._reader = open(path, 'rb')
+        else:
+            self._file = open(path, 'wb')
+            self._write_line(self.metadata)
+
+    def _load(self):
+        """Index the entries of a matching journal; return where its intact lines end, or None."""
+        if not os.path.exists(self.path):
+            return None
+
+        with open(self.path, 'rb') as f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                return None
+            if header != self.metadata:
+                return None
+
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                try:
+                    entry = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    entry = None
+                if entry is None:
+                    # The end, or a line cut short by a crash; everything before it is intact
+                    self._count = len(self._offsets)
+                    return offset
+                if "offset" in entry:
+                    self.checkpoint = entry
+                else:
+                    self._offsets[entry["index"]] = offset
+
+    def _write_line(self, data):
+        self._file.write((json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8"))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def __len__(self):
+        if self.checkpoint is not None:
+            return self.checkpoint["chunks"]
+        return self._count
+
+    def get(self, index, source_text):
+        """Return the journaled translation of chunk index, or None.
+
+        The source fingerprint guards against a chunk having changed since it
+        was journaled. A chunk is replayed once; its offset is then dropped.
+        """
+        with self._lock:
+            offset = self._offsets.pop(index, None)
+            if offset is None:
+                return None
+            self._reader.seek(offset)
+            entry = json.loads(self._reader.readline())
+        if entry["source"] != text_fingerprint(source_text):
+            return None
+        return entry["text"]
+
+    def record(self, index, source_text, translated_text):
+        """Durably append one translated chunk."""
+        with self._lock:
+            self._count += 1
+            self._write_line({"index": index, "source": text_fingerprint(source_text), "text": translated_text})
+
+    def record_checkpoint(self, offset, output_bytes, chunks):
+        """Durably record that input up to byte offset is translated into output_bytes of output."""
+        with self._lock:
+            self.checkpoint = {"offset": offset, "output_bytes": output_bytes, "chunks": chunks}
+            self._write_line(self.checkpoint)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+            if self._reader is not None:
+                self._reader.close()
+
+    def remove(self):
+        """Close and delete the journal once the job output has been written."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def open_job_journal(input_file, output_file, file_type, backend, model, source_lang, target_lang,
+                     chunk_size, prompt_version, batch_size=1):
+    """Open the journal for a job, resuming it if the same job was interrupted."""
+    metadata = {
+        "input_file": os.path.abspath(input_file),
+        "input_sha256": file_sha256(input_file),
+        "file_type": file_type,
+        "chunk_size": chunk_size,
+        "batch_size": batch_size,
+        "backend": backend,
+        "model": model,
+        "source_lang": source_lang,
+        "target_lang": target_lang,
+        "prompt_version": prompt_version
+    }
+    return TranslationJournal(journal_path_for(output_file), metadata)
@@ -0,0 +1,143 @@
+import json
+import os
+import time
+
+from chunking import iter_chunks, estimate_tokens, chunk_token_budget, context_window
+from model_handlers import translate_texts, split_text_into_chunks, chunk_size_for, TranslationCancelled
+
+DEFAULT_TUNING_PATH = os.path.join(os.path.expanduser("~"), ".longtext_translator", "chunk_sizes.json")
+
+# Chunk sizes tried by a calibration, in estimated tokens
+CALIBRATION_SIZES = (256, 512, 1024)
+# Smallest sample translated at each size; it also gives every worker a chunk of the largest size
+CALIBRATION_SAMPLE_TOKENS = 2048
+# A size whose output is shorter than this share of the longest output seen probably lost text
+TRUNCATION_TOLERANCE = 0.8
+
+class ChunkSizeMeasurement:
+    """The throughput and output length of a sample translated at one chunk size."""
+
+    def __init__(self, chunk_size, chunks, input_tokens, output_tokens=0, seconds=0.0, error=None):
+        self.chunk_size = chunk_size
+        self.chunks = chunks
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.seconds = seconds
+        self.error = error
+
+    @property
+    def tokens_per_sec(self):
+        """Input tokens translated per second."""
+        return self.input_tokens / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def output_ratio(self):
+        return self.output_tokens / self.input_tokens if self.input_tokens else 0.0
+
+    def to_dict(self):
+        return {
+            "chunk_size": self.chunk_size,
+            "chunks": self.chunks,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "seconds": round(self.seconds, 3),
+            "tokens_per_sec": round(self.tokens_per_sec, 2),
+            "output_ratio": round(self.output_ratio, 3),
+            "error": self.error,
+        }
+
+def read_sample(segments, sample_tokens):
+    """Return the first sample_tokens or so of a document, ending at a sentence or paragraph."""
+    chunks = iter_chunks(segments, sample_tokens)
+    try:
+        return next(chunks, "")
+    finally:
+        chunks.close()
+
+def calibration_sizes(backend, model_name=None, sizes=CALIBRATION_SIZES):
+    """Return the sizes to try whose chunk and translation fit in the model's context window."""
+    limit = chunk_token_budget(context_window(model_name)) if backend == "ollama" else max(sizes)
+    return [size for size in sizes if size <= limit] or [min(sizes)]
+
+def measure_chunk_size(sample, chunk_size, translate_fn, max_workers, cancel_event=None):
+    """Translate sample in chunks of chunk_size and measure it; a failure is recorded, not raised."""
+    chunks = split_text_into_chunks(sample, chunk_size)
+    measurement = ChunkSizeMeasurement(chunk_size, len(chunks), sum(estimate_tokens(chunk) for chunk in chunks))
+    started = time.monotonic()
+    try:
+        translated_chunks = translate_texts(chunks, translate_fn, max_workers=max_workers, cancel_event=cancel_event)
+    except TranslationCancelled:
+        raise
+    except Exception as e:
+        measurement.error = str(e)
+        return measurement
+    measurement.seconds = time.monotonic() - started
+    measurement.output_tokens = sum(estimate_tokens(text) for text in translated_chunks)
+    return measurement
+
+def pick_chunk_size(measurements):
+    """Return the fastest chunk size whose output is not noticeably shorter than the others, or None."""
+    finished = [m for m in measurements if m.error is None and m.seconds > 0]
+    if not finished:
+        return None
+    longest_ratio = max(m.output_ratio for m in finished)
+    complete = [m for m in finished if m.output_ratio >= longest_ratio * TRUNCATION_TOLERANCE]
+    return max(complete, key=lambda m: m.tokens_per_sec).chunk_size
+
+def calibrate_chunk_size(sample, make_translator, sizes=CALIBRATION_SIZES, max_workers=4, cancel_event=None,
+                         on_measurement=None):
+    """Translate the same sample at each chunk size and return the best size and the measurements.
+
+    make_translator(chunk_size) returns the translation function to use at
+    that size. on_measurement(measurement) is called after each size.
+    Raises Exception if every size failed.
+    """
+    measurements = []
+    for chunk_size in sizes:
+        measurement = measure_chunk_size(sample, chunk_size, make_translator(chunk_size), max_workers, cancel_event)
+        measurements.append(measurement)
+        if on_measurement:
+            on_measurement(measurement)
+
+    best = pick_chunk_size(measurements)
+    if best is None:
+        errors = "; ".join(f"{m.chunk_size}: {m.error}" for m in measurements)
+        raise Exception(f"Calibration failed at every chunk size: {errors}")
+    return best, measurements
+
+def _tuning_key(backend, model):
+    return f"{backend}:{model or ''}"
+
+def load_tuned_chunk_sizes(path=DEFAULT_TUNING_PATH):
+    """Return the saved calibrations by backend and model, or an empty dict."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error loading tuned chunk sizes: {str(e)}")
+        return {}
+
+def tuned_chunk_size(backend, model, path=DEFAULT_TUNING_PATH):
+    """Return the calibrated chunk size for a backend and model, or None."""
+    entry = load_tuned_chunk_sizes(path).get(_tuning_key(backend, model))
+    return entry["chunk_size"] if entry else None
+
+def save_tuned_chunk_size(backend, model, chunk_size, measurements, path=DEFAULT_TUNING_PATH):
+    """Save a calibration atomically, replacing the earlier one for the same backend and model."""
+    tuned = load_tuned_chunk_sizes(path)
+    tuned[_tuning_key(backend, model)] = {
+        "chunk_size": chunk_size,
+        "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "measurements": [measurement.to_dict() for measurement in measurements],
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(tuned, f, indent=2)
+    os.replace(temp_path, path)
+
+def resolve_chunk_size(backend, model, path=DEFAULT_TUNING_PATH):
+    """Return the calibrated chunk size for a backend and model, or the default one for its context."""
+    return tuned_chunk_size(backend, model, path) or chunk_size_for(backend, model)
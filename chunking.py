@@ -0,0 +1,159 @@
+import re
+
+# Han, kana, hangul and full-width characters are roughly one token each
+CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+# Other scripts average about four characters per token
+CHARS_PER_TOKEN = 4
+
+# A sentence ends with terminal punctuation, optional closing quotes and trailing spaces
+SENTENCE_END_PATTERN = re.compile(r"[.!?;。！？；…]+[\"'”’」』）)]*\s*")
+
+# Known context windows by model family, longest prefix wins
+MODEL_CONTEXT_TOKENS = {
+    "llama2": 4096,
+    "llama3": 8192,
+    "llama3.1": 131072,
+    "llama3.2": 131072,
+    "mistral": 32768,
+    "mixtral": 32768,
+    "qwen": 8192,
+    "qwen2": 32768,
+    "qwen2.5": 32768,
+    "gemma": 8192,
+    "gemma2": 8192,
+    "phi3": 4096,
+    "deepseek": 16384,
+}
+DEFAULT_CONTEXT_TOKENS = 4096
+
+# Tokens reserved for the system prompt and instructions
+PROMPT_OVERHEAD_TOKENS = 128
+# Expected output tokens per input token; translations into CJK can grow
+OUTPUT_TOKEN_RATIO = 1.5
+# Bounds on chunk size: tiny chunks waste requests, huge ones stall
+MIN_CHUNK_TOKENS = 64
+MAX_CHUNK_TOKENS = 1024
+DEFAULT_CHUNK_TOKENS = 512
+
+# A line longer than this is split at sentences before the rest of it has arrived
+MAX_CARRY_CHARS = 64 * 1024
+
+# Marks a page end in extracted text; it ends the paragraph and hints a chunk boundary
+PAGE_BREAK = "\f"
+# A chunk at least this full is closed at a page break rather than run into the next page
+PAGE_BREAK_FILL = 0.5
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in text without a model tokenizer."""
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + -(-(len(text) - cjk) // CHARS_PER_TOKEN)
+
+def context_window(model_name):
+    """Return the context window of a model, guessed from its name."""
+    name = (model_name or "").lower().split("/")[-1]
+    best = None
+    for prefix in MODEL_CONTEXT_TOKENS:
+        if name.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return MODEL_CONTEXT_TOKENS[best] if best else DEFAULT_CONTEXT_TOKENS
+
+def chunk_token_budget(context_tokens):
+    """Return the largest chunk whose prompt and translation fit in the context window."""
+    budget = int((context_tokens - PROMPT_OVERHEAD_TOKENS) / (1 + OUTPUT_TOKEN_RATIO))
+    return max(MIN_CHUNK_TOKENS, min(MAX_CHUNK_TOKENS, budget))
+
+def _iter_sentences(text):
+    start = 0
+    for match in SENTENCE_END_PATTERN.finditer(text):
+        yield text[start:match.end()]
+        start = match.end()
+    if start < len(text):
+        yield text[start:]
+
+def _hard_split(text, tokens, max_tokens):
+    """Cut text with no usable sentence boundary into pieces of about max_tokens."""
+    piece_chars = max(1, len(text) * max_tokens // tokens)
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + piece_chars)
+        if end < len(text):
+            # Prefer to break after a space in the last fifth of the piece
+            space = text.rfind(" ", start + piece_chars * 4 // 5, end)
+            if space > start:
+                end = space + 1
+        piece = text[start:end]
+        yield piece, estimate_tokens(piece)
+        start = end
+
+def _split_paragraph(text, max_tokens):
+    """Yield (text, tokens) units of a paragraph, none larger than max_tokens."""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        yield text, tokens
+        return
+
+    for sentence in _iter_sentences(text):
+        sentence_tokens = estimate_tokens(sentence)
+        if sentence_tokens <= max_tokens:
+            yield sentence, sentence_tokens
+        else:
+            yield from _hard_split(sentence, sentence_tokens, max_tokens)
+
+def _iter_units(segments, max_tokens):
+    """Turn a stream of text segments into paragraph or sentence sized units.
+
+    Yields None at every PAGE_BREAK, after the paragraph the break ends.
+    """
+    carry = ""
+    for segment in segments:
+        for page_number, text in enumerate(segment.split(PAGE_BREAK)):
+            if page_number > 0:
+                if carry:
+                    yield from _split_paragraph(carry + "\n", max_tokens)
+                    carry = ""
+                yield None
+
+            paragraphs = (carry + text).split("\n")
+            # The last piece has no newline yet and may continue in the next segment
+            carry = paragraphs.pop()
+            for paragraph in paragraphs:
+                yield from _split_paragraph(paragraph + "\n", max_tokens)
+
+            if len(carry) > MAX_CARRY_CHARS:
+                # Keep only the unfinished last unit, so one endless line stays linear
+                units = list(_split_paragraph(carry, max_tokens))
+                carry = units.pop()[0]
+                yield from units
+
+    if carry:
+        yield from _split_paragraph(carry + "\n", max_tokens)
+
+def iter_chunks(segments, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """Group a stream of text segments into chunks of at most max_tokens estimated tokens.
+
+    Whole paragraphs are kept together where they fit. Longer paragraphs are
+    split at sentence boundaries, and sentences that are still too long are
+    cut at spaces or, for unspaced text, anywhere. A PAGE_BREAK ends the
+    paragraph before it, and closes the chunk if it is PAGE_BREAK_FILL full,
+    so chunks tend to follow pages. Runs in linear time.
+    """
+    current_chunk = []
+    current_tokens = 0
+    for unit in _iter_units(segments, max_tokens):
+        if unit is None:
+            if current_chunk and current_tokens >= max_tokens * PAGE_BREAK_FILL:
+                yield "".join(current_chunk)
+                current_chunk = []
+                current_tokens = 0
+            continue
+
+        text, tokens = unit
+        if current_chunk and current_tokens + tokens > max_tokens:
+            yield "".join(current_chunk)
+            current_chunk = []
+            current_tokens = 0
+        current_chunk.append(text)
+        current_tokens += tokens
+
+    if current_chunk:
+        yield "".join(current_chunk)
@@ -0,0 +1,335 @@
+import re
+from copy import deepcopy
+
+from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.parts.hdrftr import FooterPart, HeaderPart
+from lxml import etree
+
+from inline_tags import close_tag, matching_tags, open_tag, single_tag, strip_tags
+
+# Run content that stands for text, and that text; w:t holds its own.
+# Page and column breaks are w:br too, but are not text.
+RUN_TEXT = {qn("w:tab"): "\t", qn("w:ptab"): "\t", qn("w:cr"): "\n", qn("w:noBreakHyphen"): "-"}
+TEXT_BREAK_TYPES = (None, "textWrapping")
+
+# Run content that can be dropped when the text is rewritten: formatting is copied,
+# and Word recomputes where it last broke pages
+REWRITTEN_RUN_CONTENT = {qn("w:rPr"), qn("w:lastRenderedPageBreak"), qn("w:softHyphen")}
+
+# Paragraph content that shows nothing, left where it is when the text is rewritten
+MARKER_TAGS = {qn(tag) for tag in ("w:pPr", "w:bookmarkStart", "w:bookmarkEnd", "w:proofErr", "w:permStart",
+                                   "w:permEnd", "w:commentRangeStart", "w:commentRangeEnd", "w:del")}
+
+# Word stores each text box twice: as a drawing in mc:Choice, and again as VML in
+# mc:Fallback for older readers
+MC_NS = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+# A unit is only translated if it holds a letter in some script; numbers, dates,
+# amounts and punctuation are kept as they are
+LETTER_PATTERN = re.compile(r"[^\W\d_]")
+BREAK_PATTERN = re.compile(r"(\t|\n)")
+
+class DocxPiece:
+    """Neighbouring content of a paragraph: text runs with one formatting, or content kept as it is.
+
+    key is the formatting of text runs (their w:rPr, or the hyperlink they
+    are in) and None for kept content, such as fields, images and breaks.
+    """
+
+    __slots__ = ("elements", "key", "text")
+
+    def __init__(self, element, key, text):
+        self.elements = [element]
+        self.key = key
+        self.text = text
+
+class DocxUnit:
+    """A translatable paragraph and its text, with formatting and kept content as placeholder tags.
+
+    tags maps each tag number to its DocxPiece, and base is the piece whose
+    formatting the untagged text gets.
+    """
+
+    __slots__ = ("paragraph", "text", "pieces", "tags", "base")
+
+    def __init__(self, paragraph, text, pieces, tags, base):
+        self.paragraph = paragraph
+        self.text = text
+        self.pieces = pieces
+        self.tags = tags
+        self.base = base
+
+def _paragraph_runs(paragraph):
+    """Return the runs of a paragraph, including those in hyperlinks, but not those of text boxes in it."""
+    return [run for run in paragraph.iter(qn("w:r")) if next(run.iterancestors(qn("w:p"))) is paragraph]
+
+def _element_text(element):
+    if element.tag == qn("w:t"):
+        return element.text or ""
+    if element.tag == qn("w:br"):
+        return "\n" if element.get(qn("w:type")) in TEXT_BREAK_TYPES else ""
+    return RUN_TEXT.get(element.tag, "")
+
+def run_text(run):
+    return "".join(_element_text(element) for element in run)
+
+def paragraph_text(paragraph):
+    return "".join(run_text(run) for run in _paragraph_runs(paragraph))
+
+def is_translatable(text):
+    return LETTER_PATTERN.search(strip_tags(text)) is not None
+
+def _is_text_run(run):
+    """Whether a run holds only formatting and text, so it can be rewritten."""
+    for element in run:
+        if element.tag in REWRITTEN_RUN_CONTENT or element.tag in RUN_TEXT or element.tag == qn("w:t"):
+            continue
+        if element.tag == qn("w:br") and element.get(qn("w:type")) in TEXT_BREAK_TYPES:
+            continue
+        return False
+    return True
+
+def _field_depth_change(run):
+    change = 0
+    for element in run.iter(qn("w:fldChar")):
+        field_char_type = element.get(qn("w:fldCharType"))
+        change += 1 if field_char_type == "begin" else -1 if field_char_type == "end" else 0
+    return change
+
+def paragraph_pieces(paragraph, field_depth=0):
+    """Split a paragraph into DocxPieces; returns them and the field depth after it.
+
+    field_depth counts the complex fields open at the start of the
+    paragraph, as they may span paragraphs. Field codes and results, simple
+    fields, images, page breaks, tracked insertions and anything else that is
+    not plain formatted text are kept content.
+    """
+    pieces = []
+    for element in paragraph:
+        if element.tag in MARKER_TAGS:
+            continue
+        key, text = None, ""
+        if element.tag == qn("w:r"):
+            change = _field_depth_change(element)
+            if field_depth == 0 and change == 0 and _is_text_run(element):
+                properties = element.find(qn("w:rPr"))
+                key = etree.tostring(properties) if properties is not None else b""
+                text = run_text(element)
+            field_depth = max(0, field_depth + change)
+        elif element.tag == qn("w:hyperlink") and field_depth == 0:
+            runs = element.findall(qn("w:r"))
+            if runs and all(child.tag in MARKER_TAGS or (child.tag == qn("w:r") and _is_text_run(child))
+                            for child in element):
+                # Each hyperlink is a formatting of its own, so its text keeps its link
+                key, text = element, "".join(run_text(run) for run in runs)
+
+        last = pieces[-1] if pieces else None
+        if last is not None and (last.key is None and key is None or last.key is not None and last.key == key):
+            last.elements.append(element)
+            last.text += text
+        else:
+            pieces.append(DocxPiece(element, key, text))
+    return pieces, field_depth
+
+def tagged_text(pieces):
+    """Return the text of pieces with placeholder tags, the piece for each tag and the base piece.
+
+    The formatting holding the most text is the base and is not tagged; other
+    formatted text is wrapped in <gN> tags, and kept content is <xN/>.
+    """
+    totals = {}
+    for piece in pieces:
+        if piece.key is not None:
+            totals[piece.key] = totals.get(piece.key, 0) + len(piece.text)
+    base_key = max(totals, key=totals.get) if totals else None
+
+    texts = []
+    tags = {}
+    base = None
+    for piece in pieces:
+        if piece.key is None:
+            tags[len(tags) + 1] = piece
+            texts.append(single_tag(len(tags)))
+        elif piece.key == base_key:
+            base = base if base is not None else piece
+            texts.append(piece.text)
+        elif piece.text:
+            tags[len(tags) + 1] = piece
+            texts.append(open_tag(len(tags)) + piece.text + close_tag(len(tags)))
+    return "".join(texts), tags, base
+
+def _new_text_elements(text):
+    elements = []
+    for piece in BREAK_PATTERN.split(text):
+        if piece == "\t":
+            elements.append(OxmlElement("w:tab"))
+        elif piece == "\n":
+            elements.append(OxmlElement("w:br"))
+        elif piece:
+            element = OxmlElement("w:t")
+            element.text = piece
+            element.set(qn("xml:space"), "preserve")
+            elements.append(element)
+    return elements
+
+def _new_content(template, text):
+    """Return a run, or a hyperlink holding one, with text in the formatting of template."""
+    if template.tag == qn("w:hyperlink"):
+        hyperlink = deepcopy(template)
+        for child in list(hyperlink):
+            hyperlink.remove(child)
+        hyperlink.append(_new_content(template.find(qn("w:r")), text))
+        return hyperlink
+    run = OxmlElement("w:r")
+    properties = template.find(qn("w:rPr"))
+    if properties is not None:
+        run.append(deepcopy(properties))
+    for element in _new_text_elements(text):
+        run.append(element)
+    return run
+
+def _translated_spans(unit, text):
+    """Return, for each stretch between kept pieces, the (template, text) spans of the translation.
+
+    If the translation lost, garbled or reordered any placeholder, all of it
+    goes where the base text was, in the base formatting.
+    """
+    kept = [piece for piece in unit.pieces if piece.key is None]
+    slots = [[] for _ in range(len(kept) + 1)]
+    tokens = matching_tags(unit.text, text)
+    singles = [value for kind, value in tokens if kind == "single"] if tokens is not None else None
+    if tokens is None or singles != sorted(singles):
+        slot = 0
+        for piece in unit.pieces:
+            if piece is unit.base:
+                break
+            slot += piece.key is None
+        slots[slot].append((unit.base.elements[0], strip_tags(text)))
+        return slots
+
+    slot = 0
+    formats = [unit.base.elements[0]]
+    for kind, value in tokens:
+        if kind == "text":
+            slots[slot].append((formats[-1], value))
+        elif kind == "open":
+            formats.append(unit.tags[value].elements[0])
+        elif kind == "close":
+            formats.pop()
+        else:
+            slot += 1
+    return slots
+
+def set_unit_text(unit, text):
+    """Replace the text of a unit's paragraph with text, which holds the unit's placeholder tags.
+
+    Text runs are rewritten with the formatting their tags stand for, and
+    hyperlinks keep their links. Kept content, such as fields, images and
+    page breaks, and markers such as bookmarks stay where they were.
+    """
+    paragraph = unit.paragraph
+    slots = _translated_spans(unit, text)
+    stretches = [[]]
+    for piece in unit.pieces:
+        if piece.key is None:
+            stretches.append([])
+        else:
+            stretches[-1].append(piece)
+    kept = [piece for piece in unit.pieces if piece.key is None]
+
+    for index, (spans, pieces) in enumerate(zip(slots, stretches)):
+        new_elements = [_new_content(template, span) for template, span in spans if span]
+        if not new_elements:
+            continue
+        if pieces:
+            anchor = pieces[0].elements[0]
+            for element in new_elements:
+                anchor.addprevious(element)
+        elif index < len(kept):
+            anchor = kept[index].elements[0]
+            for element in new_elements:
+                anchor.addprevious(element)
+        else:
+            anchor = kept[-1].elements[-1]
+            for element in reversed(new_elements):
+                anchor.addnext(element)
+
+    for piece in unit.pieces:
+        if piece.key is not None:
+            for element in piece.elements:
+                paragraph.remove(element)
+
+def _story_parts(document):
+    """Return the parts holding text: the body, then the headers and the footers."""
+    parts = [part for part in document.part.package.iter_parts() if isinstance(part, (HeaderPart, FooterPart))]
+    parts.sort(key=lambda part: (isinstance(part, FooterPart), str(part.partname)))
+    return [document.part] + parts
+
+def _is_fallback(paragraph):
+    return next(paragraph.iterancestors(f"{MC_NS}Fallback"), None) is not None
+
+def copy_text_boxes_to_fallbacks(element):
+    """Make the fallback copy of each text box under element hold the content of the one shown."""
+    for alternate in element.iter(f"{MC_NS}AlternateContent"):
+        choice, fallback = alternate.find(f"{MC_NS}Choice"), alternate.find(f"{MC_NS}Fallback")
+        if choice is None or fallback is None:
+            continue
+        boxes = list(choice.iter(qn("w:txbxContent")))
+        fallback_boxes = list(fallback.iter(qn("w:txbxContent")))
+        if len(boxes) != len(fallback_boxes):
+            continue
+        for box, fallback_box in zip(boxes, fallback_boxes):
+            for child in list(fallback_box):
+                fallback_box.remove(child)
+            for child in box:
+                fallback_box.append(deepcopy(child))
+
+class DocxDocument:
+    """The translatable paragraphs of a DOCX file, with the elements they came from.
+
+    Body paragraphs, table cells (nested tables included), text boxes,
+    headers and footers are collected in document order. Paragraphs
+    without a letter in them, such as empty ones or table cells holding
+    numbers, are not units, and the fallback copies of text boxes are
+    skipped. save() writes the translations into the loaded document, so
+    styles, run formatting and everything else are kept, and copies each
+    translated text box into its fallback.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._document = Document(file_path)
+        self.paragraphs = []
+        self.units = []
+        self._parts = _story_parts(self._document)
+        for part in self._parts:
+            field_depth = 0
+            for paragraph in part.element.iter(qn("w:p")):
+                if _is_fallback(paragraph):
+                    continue
+                self.paragraphs.append(paragraph)
+                pieces, field_depth = paragraph_pieces(paragraph, field_depth)
+                text, tags, base = tagged_text(pieces)
+                if base is not None and is_translatable(text):
+                    self.units.append(DocxUnit(paragraph, text.strip(), pieces, tags, base))
+
+    @property
+    def texts(self):
+        return [unit.text for unit in self.units]
+
+    def iter_paragraph_texts(self):
+        """Yield the text of every paragraph, empty ones included."""
+        for paragraph in self.paragraphs:
+            yield paragraph_text(paragraph)
+
+    def save(self, output_path, translated_texts):
+        """Write a translated DOCX; translated_texts follows the order of texts."""
+        if len(translated_texts) != len(self.units):
+            raise ValueError("Number of translations does not match the number of text units")
+        for unit, translated_text in zip(self.units, translated_texts):
+            set_unit_text(unit, translated_text.strip())
+        for part in self._parts:
+            copy_text_boxes_to_fallbacks(part.element)
+        self._document.save(output_path)
@@ -0,0 +1,337 @@
+import html
+import posixpath
+import re
+import zipfile
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+from inline_tags import open_tag, close_tag, single_tag, strip_tags, tag_tokens, matching_tags
+
+CONTAINER_PATH = "META-INF/container.xml"
+CONTAINER_NS = "{urn:oasis:names:tc:opendocument:xmlns:container}"
+OPF_NS = "{http://www.idpf.org/2007/opf}"
+DOCUMENT_MEDIA_TYPES = ("application/xhtml+xml", "text/html")
+
+# Elements whose text is translated as one unit; the text before, between and after
+# the blocks inside one is a unit of its own
+BLOCK_TAGS = frozenset([
+    "address", "article", "aside", "blockquote", "body", "caption", "dd", "div", "dl", "dt", "figcaption",
+    "figure", "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "li", "main", "nav", "ol", "p", "section",
+    "summary", "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul",
+])
+# Elements whose content is never translated; inside a unit they are kept whole
+SKIP_TAGS = frozenset(["head", "math", "pre", "script", "style", "svg"])
+VOID_TAGS = frozenset(["area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"])
+
+# Comments, CDATA, declarations and processing instructions, tags, then text
+TOKEN_PATTERN = re.compile(
+    r"<!--.*?-->|<!\[CDATA\[.*?\]\]>|<[!?][^>]*>|<(/?)([A-Za-z][\w:.-]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>|[^<]+|<",
+    re.S
+)
+# Runs of whitespace other than the newlines that stand for <br>
+WHITESPACE_PATTERN = re.compile(r"[^\S\n]+")
+ENCODING_PATTERN = re.compile(rb"""^<\?xml[^>]*encoding=["']([\w.-]+)["']""")
+# Placeholders at the edges of a unit, with the whitespace next to them
+LEADING_SINGLE_PATTERN = re.compile(r"^<x(\d+)/>(\s*)")
+TRAILING_SINGLE_PATTERN = re.compile(r"(\s*)<x(\d+)/>$")
+LEADING_OPEN_PATTERN = re.compile(r"^<g(\d+)>")
+
+class TextUnit:
+    """The text of one block element and the span of its content in the markup.
+
+    Inline elements in the text are placeholder tags (see inline_tags);
+    tags maps each placeholder number to the markup it stands for. Markup
+    wrapping the whole content, such as the <a> of a table of contents
+    entry, is kept in prefix and suffix instead.
+    """
+
+    __slots__ = ("start", "end", "text", "tags", "prefix", "suffix")
+
+    def __init__(self, start, end, text, tags, prefix="", suffix=""):
+        self.start = start
+        self.end = end
+        self.text = text
+        self.tags = tags
+        self.prefix = prefix
+        self.suffix = suffix
+
+    @property
+    def plain_text(self):
+        return strip_tags(self.text)
+
+class _Block:
+    __slots__ = ("name", "start", "parts", "tags", "inline")
+
+    def __init__(self, name, start):
+        self.name = name
+        # Where the text collected in parts starts: after the opening tag or the last inner block
+        self.start = start
+        self.parts = []
+        # Placeholder number -> [opening markup, closing markup or None for a single tag]
+        self.tags = {}
+        # Open inline elements: (name, placeholder number, index of its tag in parts)
+        self.inline = []
+
+    def flush(self, units, end):
+        """Add the text collected since start as a unit ending at end, and start collecting again."""
+        # Inline elements still open run across an inner block; that text is left alone
+        if not self.inline:
+            text, prefix, suffix = _split_edges(_unit_text(self.parts), self.tags)
+            if strip_tags(text).strip():
+                units.append(TextUnit(self.start, end, text, self.tags, prefix, suffix))
+        self.parts = []
+        self.tags = {}
+        self.inline = []
+
+    def add_single(self, markup):
+        number = len(self.tags) + 1
+        self.tags[number] = [markup, None]
+        self.parts.append(single_tag(number))
+
+    def open_inline(self, name, markup):
+        number = len(self.tags) + 1
+        self.tags[number] = [markup, None]
+        self.inline.append((name, number, len(self.parts)))
+        self.parts.append(open_tag(number))
+
+    def close_inline(self, name, markup):
+        for position in range(len(self.inline) - 1, -1, -1):
+            if self.inline[position][0] == name:
+                break
+        else:
+            # A stray closing tag is kept where it is
+            self.add_single(markup)
+            return
+        self.unclose(position + 1)
+        _, number, index = self.inline.pop()
+        if index == len(self.parts) - 1:
+            # An empty element, such as an <a id> anchor, is one single tag
+            self.tags[number][0] += markup
+            self.parts[index] = single_tag(number)
+            return
+        self.tags[number][1] = markup
+        self.parts.append(close_tag(number))
+
+    def unclose(self, depth=0):
+        """Turn the inline elements left open above depth into single tags."""
+        while len(self.inline) > depth:
+            _, number, index = self.inline.pop()
+            self.parts[index] = single_tag(number)
+
+def _unit_text(parts):
+    lines = WHITESPACE_PATTERN.sub(" ", "".join(parts)).split("\n")
+    return "\n".join(line.strip() for line in lines).strip()
+
+def _split_edges(text, tags):
+    """Move the markup standing at the edges of a unit, or wrapping all of it, out of its text."""
+    prefix = []
+    suffix = []
+    while True:
+        match = LEADING_SINGLE_PATTERN.match(text)
+        if match:
+            prefix.append(tags[int(match.group(1))][0] + (" " if match.group(2) else ""))
+            text = text[match.end():]
+            continue
+        match = TRAILING_SINGLE_PATTERN.search(text)
+        if match:
+            suffix.insert(0, (" " if match.group(1) else "") + tags[int(match.group(2))][0])
+            text = text[:match.start()]
+            continue
+        match = LEADING_OPEN_PATTERN.match(text)
+        if match and text.endswith(close_tag(match.group(1))):
+            number = int(match.group(1))
+            prefix.append(tags[number][0])
+            suffix.insert(0, tags[number][1])
+            text = text[match.end():-len(close_tag(number))].strip()
+            continue
+        return text, "".join(prefix), "".join(suffix)
+
+def extract_units(markup):
+    """Find the translatable text units of an HTML or XHTML document in one pass.
+
+    A unit is the text of a block element such as <p>, <li> or <h2>, or the
+    part of it before, between or after the blocks it contains, such as the
+    link of a table of contents entry holding a nested list. Its text has
+    entities decoded, whitespace collapsed and <br> turned
+    into newlines, and its inline elements such as <a>, <em> or <img>
+    become placeholder tags. Text inside <head>, <script>, <style>, <pre> and
+    the like is left alone; inside a unit such an element is one placeholder.
+    """
+    units = []
+    stack = []
+    skip_depth = 0
+    skip_start = None
+    for match in TOKEN_PATTERN.finditer(markup):
+        closing, name = match.group(1), match.group(2)
+        if name is None:
+            token = match.group(0)
+            if not skip_depth and stack and not token.startswith("<"):
+                stack[-1].parts.append(html.unescape(token).replace("\n", " "))
+            continue
+
+        name = name.lower()
+        self_closing = match.group(3).rstrip().endswith("/") or name in VOID_TAGS
+        if name in SKIP_TAGS and not self_closing:
+            if not skip_depth and not closing:
+                skip_start = match.start()
+            skip_depth += -1 if closing else 1
+            skip_depth = max(0, skip_depth)
+            if not skip_depth and closing and stack and skip_start is not None:
+                stack[-1].add_single(markup[skip_start:match.end()])
+                skip_start = None
+            continue
+        if skip_depth:
+            continue
+
+        if closing:
+            if name not in BLOCK_TAGS:
+                if stack:
+                    stack[-1].close_inline(name, match.group(0))
+                continue
+            if not any(block.name == name for block in stack):
+                continue
+            # Close the block, and any unclosed blocks inside it
+            while stack:
+                block = stack.pop()
+                block.unclose()
+                block.flush(units, match.start())
+                if block.name == name:
+                    break
+            if stack:
+                stack[-1].start = match.end()
+        elif name in BLOCK_TAGS and not self_closing:
+            if stack:
+                stack[-1].flush(units, match.start())
+            stack.append(_Block(name, match.end()))
+        elif stack:
+            if name == "br":
+                stack[-1].parts.append("\n")
+            elif self_closing:
+                stack[-1].add_single(match.group(0))
+            else:
+                stack[-1].open_inline(name, match.group(0))
+    return units
+
+def _escape_text(text):
+    lines = text.split("\n")
+    return "<br/>".join(html.escape(line, quote=False) for line in lines)
+
+def restore_unit(unit, translated_text):
+    """Return the markup for a unit's content with translated_text, its placeholders turned back into tags.
+
+    If the translation lost or garbled any placeholder, the elements without
+    text are kept before it and the inline formatting is dropped.
+    """
+    translated_text = "\n".join(line.strip() for line in translated_text.strip().split("\n"))
+    tokens = matching_tags(unit.text, translated_text)
+    if tokens is None:
+        kept = "".join(unit.tags[value][0] for kind, value in tag_tokens(unit.text) if kind == "single")
+        body = kept + _escape_text(strip_tags(translated_text))
+    else:
+        pieces = []
+        for kind, value in tokens:
+            if kind == "text":
+                pieces.append(_escape_text(value))
+            elif kind == "close":
+                pieces.append(unit.tags[value][1])
+            else:
+                pieces.append(unit.tags[value][0])
+        body = "".join(pieces)
+    return unit.prefix + body + unit.suffix
+
+def replace_units(markup, units, translated_texts):
+    """Return markup with the content of every unit replaced by its translation."""
+    pieces = []
+    position = 0
+    for unit, translated_text in zip(units, translated_texts):
+        pieces.append(markup[position:unit.start])
+        pieces.append(restore_unit(unit, translated_text))
+        position = unit.end
+    pieces.append(markup[position:])
+    return "".join(pieces)
+
+def _decode_markup(data):
+    match = ENCODING_PATTERN.match(data)
+    encoding = match.group(1).decode("ascii") if match else "utf-8"
+    return data.decode(encoding, errors="replace"), encoding
+
+def _content_documents(archive):
+    """Return the archive names of the spine documents in reading order, then the navigation document.
+
+    Other XHTML files in the archive, such as unused templates, are left alone.
+    """
+    container = ElementTree.fromstring(archive.read(CONTAINER_PATH))
+    rootfile = container.find(f".//{CONTAINER_NS}rootfile").get("full-path")
+    package = ElementTree.fromstring(archive.read(rootfile))
+    base = posixpath.dirname(rootfile)
+
+    documents = {}
+    navigation = []
+    for item in package.iter(f"{OPF_NS}item"):
+        if item.get("media-type") in DOCUMENT_MEDIA_TYPES:
+            name = posixpath.normpath(posixpath.join(base, unquote(item.get("href"))))
+            documents[item.get("id")] = name
+            # The EPUB 3 navigation document holds the table of contents
+            if "nav" in (item.get("properties") or "").split():
+                navigation.append(name)
+
+    ordered = []
+    for itemref in package.iter(f"{OPF_NS}itemref"):
+        name = documents.get(itemref.get("idref"))
+        if name is not None and name not in ordered:
+            ordered.append(name)
+    return ordered + [name for name in navigation if name not in ordered]
+
+class EpubChapter:
+    __slots__ = ("name", "units")
+
+    def __init__(self, name, units):
+        self.name = name
+        self.units = units
+
+class EpubDocument:
+    """The translatable text of an EPUB, with where each unit came from.
+
+    Only the units are kept in memory; save() reads each chapter again
+    from the original file and splices the translations into its markup,
+    copying every other entry of the archive unchanged.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.chapters = []
+        with zipfile.ZipFile(file_path) as archive:
+            for name in _content_documents(archive):
+                markup, _ = _decode_markup(archive.read(name))
+                self.chapters.append(EpubChapter(name, extract_units(markup)))
+
+    @property
+    def texts(self):
+        return [unit.text for chapter in self.chapters for unit in chapter.units]
+
+    def iter_chapter_texts(self):
+        """Yield the text of each chapter, one unit per line."""
+        for chapter in self.chapters:
+            yield "\n".join(unit.plain_text for unit in chapter.units)
+
+    def save(self, output_path, translated_texts):
+        """Write a translated EPUB; translated_texts follows the order of texts."""
+        if len(translated_texts) != sum(len(chapter.units) for chapter in self.chapters):
+            raise ValueError("Number of translations does not match the number of text units")
+
+        translations = {}
+        position = 0
+        for chapter in self.chapters:
+            translations[chapter.name] = (chapter.units, translated_texts[position:position + len(chapter.units)])
+            position += len(chapter.units)
+
+        with zipfile.ZipFile(self.file_path) as source, zipfile.ZipFile(output_path, 'w') as target:
+            # Entries keep their order and compression, so the stored mimetype entry stays first
+            for info in source.infolist():
+                data = source.read(info)
+                units, texts = translations.get(info.filename, (None, None))
+                if units:
+                    markup, encoding = _decode_markup(data)
+                    # Characters the declared encoding lacks, such as Greek in a Latin-1 chapter, become references
+                    data = replace_units(markup, units, texts).encode(encoding, errors="xmlcharrefreplace")
+                target.writestr(info, data)
@@ -1,91 +1,399 @@
+import codecs
+import io
+import itertools
+import mmap
 import os
-import chardet
-import pysrt
-from PyPDF2 import PdfReader
-from docx import Document
-import ebooklib
-from ebooklib import epub
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from chunking import PAGE_BREAK
+
+# Format libraries (chardet, PyPDF2, python-docx) and the EPUB, DOCX and SRT readers are
+# imported on first use, so a TXT or SRT job never loads the PDF/DOCX/EPUB stacks.
+
+# Approximate size of the blocks a text file is streamed in
+TEXT_BLOCK_SIZE = 64 * 1024
+
+# Bytes read from the start of a file to detect its format
+SNIFF_SIZE = 4096
+
+# Most bytes fed to chardet; it usually decides long before that
+ENCODING_SAMPLE_LIMIT = 1024 * 1024
+
+# Checked in order, so the UTF-32 marks come before the UTF-16 ones they start with.
+# Each mark gives the encoding for the whole file and the codec for the bytes after it.
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig", "utf-8"),
+    (codecs.BOM_UTF32_LE, "utf-32", "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32", "utf-32-be"),
+    (codecs.BOM_UTF16_LE, "utf-16", "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16", "utf-16-be"),
+]
+
+# Guesses from a partial sample are widened to the encodings that contain them
+ENCODING_SUPERSETS = {
+    "ascii": "utf-8",
+    "gb2312": "gb18030",
+    "gbk": "gb18030",
+}
+
+# A byte outside printable ASCII text, where the encodings of a text file start to differ;
+# NUL bytes come from wide encodings such as UTF-16 without a byte order mark
+NON_ASCII_PATTERN = re.compile(rb"[\x00\x80-\xff]")
+
+# PDFs with fewer pages are extracted in this process; starting workers costs more
+PDF_PARALLEL_MIN_PAGES = 32
+# Pages each worker extracts per task, and tasks kept in flight per worker
+PDF_PAGES_PER_TASK = 8
+PDF_TASKS_PER_WORKER = 2
+PDF_MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+# An SRT file opens with a cue number line followed by a timing line
+SRT_HEAD_PATTERN = re.compile(rb"^(?:\xef\xbb\xbf)?\s*\d+\s*\r?\n\s*\d+:\d\d:\d\d[,.]\d+\s*-->")
+
+def _is_plain_ascii(block):
+    return block.isascii() and b"\0" not in block
+
+def _detect_encoding(blocks):
+    """Detect the encoding of a byte stream from as few of its blocks as possible.
+
+    A byte order mark decides at once. Blocks of plain ASCII say nothing
+    about the rest of the file, so reading goes on to the first block with
+    other bytes; if that block is valid UTF-8 without NUL bytes the file is
+    taken as UTF-8. Otherwise chardet is fed block by block from there until
+    it is confident or ENCODING_SAMPLE_LIMIT bytes have been seen. A sample
+    that is all ASCII is taken as UTF-8. Returns the encoding and the blocks
+    consumed, so the caller can decode them without reading them again.
+    """
+    head = next(blocks, b"")
+    consumed = [head]
+    for bom, encoding, _ in BOMS:
+        if head.startswith(bom):
+            return encoding, consumed
+
+    block = head
+    sampled = len(head)
+    while _is_plain_ascii(block) and sampled < ENCODING_SAMPLE_LIMIT:
+        block = next(blocks, b"")
+        if not block:
+            break
+        consumed.append(block)
+        sampled += len(block)
+    if _is_plain_ascii(block):
+        return "utf-8", consumed
+
+    # NUL is valid UTF-8 but no text file holds it; it means UTF-16 or UTF-32, for chardet to tell
+    if b"\0" not in block:
+        try:
+            # The blocks before are ASCII, so this one starts on a character; not final,
+            # so a character cut at its end is fine
+            codecs.getincrementaldecoder("utf-8")().decode(block)
+            return "utf-8", consumed
+        except UnicodeDecodeError:
+            pass
+
+    from chardet import UniversalDetector
+    detector = UniversalDetector()
+    # ASCII text before the line with the first other byte only dilutes the guess. Blocks
+    # start at a multiple of 4 bytes, so starting at one too keeps wide characters whole.
+    first = NON_ASCII_PATTERN.search(block).start()
+    start = block.rfind(b"\n", 0, first) + 1
+    detector.feed(block[start - start % 4:])
+    while not detector.done and sampled < ENCODING_SAMPLE_LIMIT:
+        block = next(blocks, b"")
+        if not block:
+            break
+        consumed.append(block)
+        detector.feed(block)
+        sampled += len(block)
+    encoding = (detector.close()["encoding"] or "utf-8").lower()
+    return ENCODING_SUPERSETS.get(encoding, encoding), consumed
+
+def _read_blocks(f):
+    return iter(lambda: f.read(TEXT_BLOCK_SIZE), b"")
+
+def _decode_blocks(blocks, encoding):
+    """Decode byte blocks incrementally, with newlines translated as in text mode."""
+    # Bytes the detected encoding cannot decode are replaced rather than failing the job
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(errors="replace"), translate=True)
+    for block in blocks:
+        text = decoder.decode(block)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
 
 def detect_encoding(file_path):
-    """Detect the encoding of a file."""
+    """Detect the encoding of a file from a bounded sample of it."""
+    with open(file_path, 'rb') as f:
+        return _detect_encoding(_read_blocks(f))[0]
+
+def _decode_file(file_path):
+    """Read a file once and return its content decoded in the detected encoding."""
     with open(file_path, 'rb') as f:
-        result = chardet.detect(f.read())
-    return result['encoding']
+        data = f.read()
+    view = memoryview(data)
+    blocks = (bytes(view[start:start + TEXT_BLOCK_SIZE]) for start in range(0, len(data), TEXT_BLOCK_SIZE))
+    encoding, _ = _detect_encoding(blocks)
+    return "".join(_decode_blocks([data], encoding))
 
 def read_text_file(file_path):
     """Read a text file and return its content."""
     try:
-        encoding = detect_encoding(file_path)
-        with open(file_path, 'r', encoding=encoding) as f:
-            return f.read()
+        return _decode_file(file_path)
     except Exception as e:
         print(f"Error reading text file: {str(e)}")
         return None
 
+class TextSegment:
+    """Decoded text and the byte range [start, end) of the file it came from."""
+
+    __slots__ = ("text", "start", "end")
+
+    def __init__(self, text, start, end):
+        self.text = text
+        self.start = start
+        self.end = end
+
+def _find_aligned(mapped, newline, start, end, base, reverse=False):
+    """Find newline in mapped[start:end] at a whole code unit, or return -1."""
+    width = len(newline)
+    found = mapped.rfind(newline, start, end) if reverse else mapped.find(newline, start, end)
+    while found >= 0 and (found - base) % width:
+        found = mapped.rfind(newline, start, found + width - 1) if reverse else mapped.find(newline, found + 1, end)
+    return found
+
+def _segment_end(mapped, position, size, segment_size, newline, base, codec):
+    """Return where the segment starting at position ends: after a line break if possible."""
+    limit = position + segment_size
+    if limit >= size:
+        return size
+
+    found = _find_aligned(mapped, newline, position, limit, base, reverse=True)
+    if found < 0:
+        # A line longer than a segment; allow it a few segments before cutting it
+        found = _find_aligned(mapped, newline, limit, limit + 3 * segment_size, base)
+    if found >= 0:
+        return found + len(newline)
+
+    end = limit - (limit - base) % len(newline)
+    # Do not cut a character in two, so the offset stays a clean resume point: the bytes
+    # the decoder holds back at the cut are the start of a character it has not finished
+    decoder = codecs.getincrementaldecoder(codec)(errors="replace")
+    decoder.decode(mapped[position:end])
+    pending = len(decoder.getstate()[0])
+    return end - pending if pending < end - position else end
+
+def iter_text_segments(file_path, start=0, segment_size=TEXT_BLOCK_SIZE):
+    """Yield a text file as TextSegments of about segment_size bytes, ending at line breaks.
+
+    The file is read through a memory map, so only the segment being decoded
+    is copied into memory however large the file is. start is a byte offset
+    to resume from, normally the end of an earlier segment. The encoding is
+    always detected from the start of the file.
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            blocks = (mapped[offset:offset + TEXT_BLOCK_SIZE] for offset in range(0, size, TEXT_BLOCK_SIZE))
+            codec, _ = _detect_encoding(blocks)
+            base = 0
+            for bom, _, bom_codec in BOMS:
+                if mapped[:len(bom)] == bom:
+                    # Offsets count from the file start, the text from after the mark
+                    codec, base = bom_codec, len(bom)
+                    break
+
+            newline = "\n".encode(codec)
+            decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(codec)(errors="replace"),
+                                                   translate=True)
+            position = max(start, base)
+            while position < size:
+                end = _segment_end(mapped, position, size, segment_size, newline, base, codec)
+                yield TextSegment(decoder.decode(mapped[position:end], final=end >= size), position, end)
+                position = end
+
+def _extract_page_text(page, page_number):
+    try:
+        # extract_text() returns None for pages without a text layer, such as scans
+        return page.extract_text() or ""
+    except Exception as e:
+        print(f"Error extracting PDF page {page_number + 1}: {str(e)}")
+        return ""
+
+# The PDF each extraction worker process parsed once, when it started
+_worker_pdf_reader = None
+
+def _open_worker_pdf(file_path):
+    global _worker_pdf_reader
+    from PyPDF2 import PdfReader
+    _worker_pdf_reader = PdfReader(file_path)
+
+def _extract_pdf_pages(start, end):
+    """Extract the text of pages start to end - 1; runs in a worker process."""
+    return [_extract_page_text(_worker_pdf_reader.pages[number], number) for number in range(start, end)]
+
+def _iter_pdf_pages_parallel(file_path, page_count, workers):
+    # Spawned workers import only this module, not the threads of the parent
+    context = multiprocessing.get_context("spawn")
+    # Each worker parses the PDF once, and tasks only name the pages to extract
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_open_worker_pdf,
+                                   initargs=(file_path,))
+    try:
+        starts = iter(range(0, page_count, PDF_PAGES_PER_TASK))
+        pending = deque()
+
+        def submit_next():
+            start = next(starts, None)
+            if start is not None:
+                end = min(start + PDF_PAGES_PER_TASK, page_count)
+                pending.append(executor.submit(_extract_pdf_pages, start, end))
+
+        # A bounded window of tasks keeps memory flat however far ahead the workers get
+        for _ in range(workers * PDF_TASKS_PER_WORKER):
+            submit_next()
+        while pending:
+            pages = pending.popleft().result()
+            submit_next()
+            yield from pages
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def iter_pdf_pages(file_path, reader=None, workers=PDF_MAX_WORKERS):
+    """Yield the text of each page of a PDF in page order, "" for pages without text.
+
+    Large PDFs are extracted by a pool of worker processes, and each page is
+    yielded as soon as it and every page before it are ready, so the first
+    pages can be translated while later ones are still being parsed.
+    """
+    if reader is None:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(file_path)
+    page_count = len(reader.pages)
+    if workers > 1 and page_count >= PDF_PARALLEL_MIN_PAGES:
+        yield from _iter_pdf_pages_parallel(file_path, page_count, workers)
+    else:
+        for number, page in enumerate(reader.pages):
+            yield _extract_page_text(page, number)
+
 def read_pdf_file(file_path):
     """Read a PDF file and return its content as text."""
     try:
-        reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        return "".join(page + "\n" for page in iter_pdf_pages(file_path))
     except Exception as e:
         print(f"Error reading PDF file: {str(e)}")
         return None
 
 def read_docx_file(file_path):
-    """Read a DOCX file and return its content as text."""
+    """Read a DOCX file, tables, headers and footers included, and return its content as text."""
+    try:
+        from docx_document import DocxDocument
+        return "".join(text + "\n" for text in DocxDocument(file_path).iter_paragraph_texts())
+    except Exception as e:
+        print(f"Error reading DOCX file: {str(e)}")
+        return None
+
+def read_docx_document(file_path):
+    """Read a DOCX file into a DocxDocument, or return None on failure."""
     try:
-        doc = Document(file_path)
-        text = ""
-        for para in doc.paragraphs:
-            text += para.text + "\n"
-        return text
+        from docx_document import DocxDocument
+        return DocxDocument(file_path)
     except Exception as e:
         print(f"Error reading DOCX file: {str(e)}")
         return None
 
+def write_docx_document(file_path, document, translated_texts):
+    """Write a translated copy of a DocxDocument's DOCX."""
+    try:
+        document.save(file_path, translated_texts)
+        return True
+    except Exception as e:
+        print(f"Error writing DOCX file: {str(e)}")
+        return False
+
 def read_epub_file(file_path):
     """Read an EPUB file and return its content as text."""
     try:
-        book = epub.read_epub(file_path)
-        text = ""
-        
-        for item in book.get_items():
-            if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                content = item.get_content().decode('utf-8')
-                # 简单移除HTML标签
-                content = content.replace('<p>', '\n').replace('</p>', '\n')
-                content = content.replace('<br>', '\n').replace('<br/>', '\n')
-                
-                # 移除其他HTML标签
-                in_tag = False
-                cleaned_content = ""
-                for char in content:
-                    if char == '<':
-                        in_tag = True
-                    elif char == '>':
-                        in_tag = False
-                    elif not in_tag:
-                        cleaned_content += char
-                
-                text += cleaned_content + "\n"
-        return text
+        from epub_document import EpubDocument
+        return "".join(chapter + "\n" for chapter in EpubDocument(file_path).iter_chapter_texts())
     except Exception as e:
         print(f"Error reading EPUB file: {str(e)}")
         return None
 
+def read_epub_document(file_path):
+    """Read an EPUB file into an EpubDocument, or return None on failure."""
+    try:
+        from epub_document import EpubDocument
+        return EpubDocument(file_path)
+    except Exception as e:
+        print(f"Error reading EPUB file: {str(e)}")
+        return None
+
+def write_epub_document(file_path, document, translated_texts):
+    """Write a translated copy of an EpubDocument's EPUB."""
+    try:
+        document.save(file_path, translated_texts)
+        return True
+    except Exception as e:
+        print(f"Error writing EPUB file: {str(e)}")
+        return False
+
+def _open_txt_stream(file_path):
+    total = os.path.getsize(file_path) // TEXT_BLOCK_SIZE + 1
+    return (segment.text for segment in iter_text_segments(file_path)), total
+
+def _open_pdf_stream(file_path):
+    from PyPDF2 import PdfReader
+    reader = PdfReader(file_path)
+    # Each page ends in a PAGE_BREAK, which the chunker uses as a boundary hint
+    pages = (page + PAGE_BREAK for page in iter_pdf_pages(file_path, reader))
+    return pages, len(reader.pages)
+
+def _open_docx_stream(file_path):
+    from docx_document import DocxDocument
+    document = DocxDocument(file_path)
+    return (text + "\n" for text in document.iter_paragraph_texts()), len(document.paragraphs)
+
+def _open_epub_stream(file_path):
+    from epub_document import EpubDocument
+    document = EpubDocument(file_path)
+    # Chapters end in a PAGE_BREAK, so chunks do not run across chapters
+    chapters = (chapter + PAGE_BREAK for chapter in document.iter_chapter_texts())
+    return chapters, len(document.chapters)
+
+def iter_srt_cues(file_path):
+    """Parse an SRT file as it is read, yielding one Cue at a time."""
+    from srt_stream import iter_cues
+    with open(file_path, 'rb') as f:
+        blocks = _read_blocks(f)
+        encoding, consumed = _detect_encoding(blocks)
+        yield from iter_cues(_decode_blocks(itertools.chain(consumed, blocks), encoding))
+
 def read_srt_file(file_path):
-    """Read an SRT file and return its content as a list of subtitle objects."""
+    """Read an SRT file into compact SubtitleCues, or return None on failure."""
     try:
-        encoding = detect_encoding(file_path)
-        subs = pysrt.open(file_path, encoding=encoding)
-        return subs
+        from srt_stream import SubtitleCues
+        return SubtitleCues.from_cues(iter_srt_cues(file_path))
     except Exception as e:
         print(f"Error reading SRT file: {str(e)}")
         return None
 
+def write_text_stream(file_path, parts):
+    """Write parts to a text file as they arrive, separated by newlines."""
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for i, part in enumerate(parts):
+            if i > 0:
+                f.write("\n")
+            f.write(part)
+            # Make every finished part visible on disk immediately
+            f.flush()
+
 def write_text_file(file_path, content):
     """Write content to a text file."""
     try:
@@ -96,33 +404,137 @@ def write_text_file(file_path, content):
         print(f"Error writing text file: {str(e)}")
         return False
 
-def write_srt_file(file_path, subtitles):
-    """Write subtitles to an SRT file."""
+def write_srt_stream(file_path, subtitles, translated_texts=None, bilingual=False):
+    """Write SubtitleCues to an SRT file in one pass, each cue as its translation arrives.
+
+    See srt_stream.write_cues; errors, including those raised while
+    producing translated_texts, are not caught.
+    """
+    from srt_stream import write_cues
+    with open(file_path, 'w', encoding='utf-8') as f:
+        write_cues(f, subtitles, translated_texts, bilingual)
+
+def write_srt_file(file_path, subtitles, translated_texts=None, bilingual=False):
+    """Write subtitles, optionally translated or bilingual, to an SRT file."""
     try:
-        subtitles.save(file_path, encoding='utf-8')
+        write_srt_stream(file_path, subtitles, translated_texts, bilingual)
         return True
     except Exception as e:
         print(f"Error writing SRT file: {str(e)}")
         return False
 
-def merge_subtitles(original_subs, translated_subs):
-    """Merge original and translated subtitles into bilingual subtitles."""
-    try:
-        if len(original_subs) != len(translated_subs):
-            raise ValueError("Original and translated subtitles have different lengths")
-        
-        merged_subs = pysrt.SubRipFile()
-        
-        for i, (orig, trans) in enumerate(zip(original_subs, translated_subs)):
-            new_sub = pysrt.SubRipItem(
-                index=orig.index,
-                start=orig.start,
-                end=orig.end,
-                text=f"{orig.text}\n{trans.text}"
-            )
-            merged_subs.append(new_sub)
-        
-        return merged_subs
-    except Exception as e:
-        print(f"Error merging subtitles: {str(e)}")
-        return None
+class FileFormat:
+    """A registered file format.
+
+    kind is "document" for formats streamed through the text pipeline, with
+    open_stream(path) returning (segments, total_segments), or "subtitle"
+    for formats translated cue by cue: read(path) returns cues with
+    iter_texts(), and write(path, cues, translated_texts, bilingual) writes
+    them as the translations arrive, raising on failure.
+    "markup" formats keep their structure: read(path) returns a document
+    whose texts are translated in batches, and write(path, document,
+    translated_texts) writes the translated file; their open_stream is used
+    when the output is plain text instead. A document format may also have
+    open_segments(path, start) yielding TextSegments with byte offsets, which
+    lets a job resume from the offset it stopped at.
+    sniff(head, file_path) returns True if the first bytes belong to this
+    format; it is optional, formats without one are matched by extension.
+    """
+
+    def __init__(self, name, extensions, kind, label, open_stream=None, read=None, write=None, sniff=None,
+                 open_segments=None):
+        self.name = name
+        self.extensions = tuple(extensions)
+        self.kind = kind
+        self.label = label
+        self.open_stream = open_stream
+        self.read = read
+        self.write = write
+        self.sniff = sniff
+        self.open_segments = open_segments
+
+    def file_filter(self):
+        """Return a file dialog filter such as "PDF files (*.pdf)"."""
+        return f"{self.label} ({' '.join('*' + ext for ext in self.extensions)})"
+
+FILE_FORMATS = {}
+
+def register_format(file_format):
+    """Add a format to the registry, replacing any format with the same name."""
+    FILE_FORMATS[file_format.name] = file_format
+    return file_format
+
+def get_file_format(name):
+    """Return the registered format called name."""
+    try:
+        return FILE_FORMATS[name]
+    except KeyError:
+        raise ValueError(f"Unsupported file type: {name}")
+
+def _zip_names(file_path):
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            return set(archive.namelist())
+    except (zipfile.BadZipFile, OSError):
+        return set()
+
+def _sniff_pdf(head, file_path):
+    return head.startswith(b"%PDF-")
+
+def _sniff_docx(head, file_path):
+    return head.startswith(b"PK\x03\x04") and "word/document.xml" in _zip_names(file_path)
+
+def _sniff_epub(head, file_path):
+    if not head.startswith(b"PK\x03\x04"):
+        return False
+    # The EPUB container stores its uncompressed mimetype entry first
+    if head[30:38] == b"mimetype" and b"application/epub+zip" in head[:128]:
+        return True
+    return "META-INF/container.xml" in _zip_names(file_path)
+
+def _sniff_srt(head, file_path):
+    return SRT_HEAD_PATTERN.match(head) is not None
+
+def detect_file_type(file_path):
+    """Detect the format of a file from its content, falling back to its extension.
+
+    Returns the registered format name, or None if neither matches.
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(SNIFF_SIZE)
+    except OSError:
+        head = b""
+
+    if head:
+        for file_format in FILE_FORMATS.values():
+            if file_format.sniff is not None and file_format.sniff(head, file_path):
+                return file_format.name
+
+    ext = os.path.splitext(file_path)[1].lower()
+    for file_format in FILE_FORMATS.values():
+        if ext in file_format.extensions:
+            return file_format.name
+    return None
+
+def open_text_stream(file_path, file_type):
+    """Open a text document for streaming.
+    
+    Returns a generator of text segments (blocks, pages, paragraphs or
+    chapters) and the expected number of segments, which is exact for
+    PDF/DOCX/EPUB and an estimate for TXT.
+    """
+    file_format = get_file_format(file_type)
+    if file_format.open_stream is None:
+        raise ValueError(f"Unsupported text file type: {file_type}")
+    return file_format.open_stream(file_path)
+
+register_format(FileFormat("txt", [".txt", ".text", ".md"], "document", "Text files", open_stream=_open_txt_stream,
+                           open_segments=iter_text_segments))
+register_format(FileFormat("pdf", [".pdf"], "document", "PDF files", open_stream=_open_pdf_stream, sniff=_sniff_pdf))
+register_format(FileFormat("docx", [".docx"], "markup", "Word files", open_stream=_open_docx_stream,
+                           read=read_docx_document, write=write_docx_document, sniff=_sniff_docx))
+register_format(FileFormat("epub", [".epub"], "markup", "EPUB files", open_stream=_open_epub_stream,
+                           read=read_epub_document, write=write_epub_document, sniff=_sniff_epub))
+register_format(FileFormat("srt", [".srt"], "subtitle", "Subtitle files", read=read_srt_file,
+                           write=write_srt_stream, sniff=_sniff_srt))
@@ -0,0 +1,203 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from chunking import estimate_tokens
+from http_client import RequestScope, current_scope
+from telemetry import current_chunk, measuring, percentile
+
+# Requests running longer than this share of recent ones get a duplicate
+DEFAULT_HEDGE_PERCENTILE = 0.95
+# Duplicates allowed, as a share of all requests
+DEFAULT_HEDGE_BUDGET = 0.1
+# Requests that must finish before any is hedged, and how many recent ones count
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200
+# No request is hedged sooner than this many seconds after it was sent
+MIN_HEDGE_DELAY = 1.0
+
+# The HedgeAttempt sending requests on the current thread, if any
+_local = threading.local()
+
+def current_attempt():
+    """Return the HedgeAttempt running on this thread, or None."""
+    return getattr(_local, "attempt", None)
+
+class HedgeAttempt:
+    """One copy of a hedged request, sent in its own RequestScope.
+
+    hosts is shared by the copies of a request: each adds the endpoint it
+    used, so the others can pick a different one.
+    """
+
+    def __init__(self, parent_scope, hosts):
+        self.scope = RequestScope(parent_scope)
+        self.hosts = hosts
+
+    @contextmanager
+    def activate(self):
+        previous = current_attempt()
+        _local.attempt = self
+        try:
+            with self.scope.activate():
+                yield self
+        finally:
+            _local.attempt = previous
+
+class _Race:
+    def __init__(self):
+        # Set once the first copy has finished, either way
+        self.primary_done = threading.Event()
+        self.hedge = None
+        self.hedge_attempt = None
+        # Set once the duplicate has its governor slot and is being sent
+        self.sending = False
+        self.winner = None
+        self.lock = threading.Lock()
+
+class _NotNeeded(Exception):
+    """The first copy finished while the duplicate waited for the governor."""
+
+class HedgePolicy:
+    """Sends a duplicate of a request that runs slower than most, and keeps the first answer.
+
+    A request still running after the given percentile of recent latencies
+    per token, scaled to its own size, gets a copy sent in its own
+    RequestScope, preferably to another endpoint. With a RequestGovernor the
+    copy waits for its rate limit and a concurrency slot like any request,
+    and is dropped if the first copy finishes meanwhile. Whichever copy
+    answers first wins and the other is aborted; if one fails, the other
+    still may answer. Duplicates are capped at budget times the number of
+    requests, and nothing is hedged until HEDGE_MIN_SAMPLES requests have
+    finished.
+    """
+
+    def __init__(self, percentile=DEFAULT_HEDGE_PERCENTILE, budget=DEFAULT_HEDGE_BUDGET,
+                 min_delay=MIN_HEDGE_DELAY):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.requests = 0
+        self.hedged = 0
+        self.wins = 0
+        self._latencies = deque(maxlen=HEDGE_WINDOW)
+        self._lock = threading.Lock()
+
+    def hedge_delay(self, tokens):
+        """Return how long a request of tokens runs before it is hedged, or None if not yet known."""
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            latencies = list(self._latencies)
+        return max(self.min_delay, percentile(latencies, self.percentile) * tokens)
+
+    def _observe(self, seconds, tokens):
+        with self._lock:
+            self._latencies.append(seconds / tokens)
+
+    def _take_budget(self):
+        with self._lock:
+            if self.hedged + 1 > self.budget * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def _won(self, race, attempt):
+        """Record the first copy to answer; return whether it was the first."""
+        with race.lock:
+            if race.winner is not None:
+                return False
+            race.winner = attempt
+            return True
+
+    def call(self, fn, text, governor=None, request_tokens=0):
+        """Return fn(text), hedging it with a second call if it runs slow.
+
+        The second call goes through the governor, if given, costing
+        request_tokens of its token budget.
+        """
+        tokens = max(1, estimate_tokens(text))
+        with self._lock:
+            self.requests += 1
+        delay = self.hedge_delay(tokens)
+
+        parent = current_scope()
+        hosts = set()
+        primary = HedgeAttempt(parent, hosts)
+        race = _Race()
+        if delay is not None:
+            threading.Thread(
+                target=self._run_hedge,
+                args=(race, delay, fn, text, tokens, HedgeAttempt(parent, hosts), primary, current_chunk(),
+                      governor, request_tokens),
+                daemon=True
+            ).start()
+
+        started = time.monotonic()
+        try:
+            with primary.activate():
+                result = fn(text)
+        except Exception as error:
+            with race.lock:
+                race.primary_done.set()
+                # A duplicate still waiting for the governor is dropped rather than waited for
+                hedge = race.hedge if race.sending else None
+            if hedge is None:
+                raise
+            # The duplicate may still answer; if it fails as well, the first error stands
+            try:
+                return hedge.result()
+            except Exception:
+                pass
+            raise error
+
+        self._observe(time.monotonic() - started, tokens)
+        with race.lock:
+            race.primary_done.set()
+        if self._won(race, primary) and race.hedge_attempt is not None:
+            race.hedge_attempt.scope.close()
+        return result
+
+    def _run_hedge(self, race, delay, fn, text, tokens, attempt, primary, chunk, governor, request_tokens):
+        if race.primary_done.wait(delay):
+            return
+        with race.lock:
+            if race.primary_done.is_set() or not self._take_budget():
+                return
+            race.hedge = future = Future()
+            race.hedge_attempt = attempt
+
+        def send():
+            with race.lock:
+                if race.primary_done.is_set():
+                    raise _NotNeeded()
+                race.sending = True
+            if chunk is not None:
+                chunk.hedge_started()
+            started = time.monotonic()
+            with attempt.activate(), measuring(chunk):
+                result = fn(text)
+            self._observe(time.monotonic() - started, tokens)
+            return result
+
+        try:
+            result = send() if governor is None else governor.attempt(send, tokens=request_tokens)
+        except _NotNeeded:
+            with self._lock:
+                self.hedged -= 1
+            return
+        except BaseException as e:
+            future.set_exception(e)
+            return
+
+        if self._won(race, attempt):
+            with self._lock:
+                self.wins += 1
+            primary.scope.close()
+        future.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "hedged": self.hedged, "wins": self.wins}
@@ -0,0 +1,150 @@
+import re
+import threading
+import time
+
+from http_client import get_http_client
+
+# Consecutive failed requests after which a host is taken out of rotation
+FAILURE_THRESHOLD = 2
+# Seconds before a failed host is health checked again; doubles while it stays down
+RECHECK_INTERVAL = 5.0
+MAX_RECHECK_INTERVAL = 120.0
+HEALTH_CHECK_TIMEOUT = 3
+LATENCY_SMOOTHING = 0.3
+
+def parse_hosts(value):
+    """Split a host setting such as "gpu1:11434, http://gpu2:11434" into base URLs."""
+    hosts = []
+    for host in re.split(r"[\s,;]+", value or ""):
+        if not host:
+            continue
+        if "://" not in host:
+            host = "http://" + host
+        host = host.rstrip("/")
+        if host not in hosts:
+            hosts.append(host)
+    return hosts
+
+class _Endpoint:
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.latency = None  # smoothed seconds per token
+        self.failures = 0
+        self.down_until = 0
+        self.recheck_interval = RECHECK_INTERVAL
+        self.checking = False
+
+    @property
+    def healthy(self):
+        return self.failures < FAILURE_THRESHOLD
+
+class HostPool:
+    """Spreads requests over several Ollama hosts.
+
+    Each request goes to the healthy host with the fewest outstanding
+    requests, the faster one by smoothed latency per token on a tie. Fast
+    hosts free their slots sooner and so take a larger share. A host
+    that fails FAILURE_THRESHOLD requests in a row leaves the rotation; once
+    its recheck interval has passed, a health check on /api/tags brings it
+    back. If every host is down, the one due back soonest is used anyway so
+    the caller's retries keep probing.
+    """
+
+    def __init__(self, hosts):
+        if not hosts:
+            raise ValueError("No Ollama hosts configured")
+        self._endpoints = {url: _Endpoint(url) for url in hosts}
+        self._lock = threading.Lock()
+
+    @property
+    def hosts(self):
+        return list(self._endpoints)
+
+    def healthy_hosts(self):
+        with self._lock:
+            return [endpoint.url for endpoint in self._endpoints.values() if endpoint.healthy]
+
+    def check_health(self, url):
+        """Probe a host and return it to the rotation if it answers."""
+        try:
+            response = get_http_client().get(f"{url}/api/tags", timeout=HEALTH_CHECK_TIMEOUT)
+            ok = response.status_code == 200
+            response.close()
+        except Exception:
+            ok = False
+
+        with self._lock:
+            endpoint = self._endpoints[url]
+            endpoint.checking = False
+            if ok:
+                endpoint.failures = 0
+                endpoint.recheck_interval = RECHECK_INTERVAL
+            else:
+                endpoint.recheck_interval = min(MAX_RECHECK_INTERVAL, endpoint.recheck_interval * 2)
+                endpoint.down_until = time.monotonic() + endpoint.recheck_interval
+        return ok
+
+    def _due_for_check(self, now):
+        due = []
+        for endpoint in self._endpoints.values():
+            if not endpoint.healthy and not endpoint.checking and now >= endpoint.down_until:
+                endpoint.checking = True
+                due.append(endpoint.url)
+        return due
+
+    def acquire(self, exclude=()):
+        """Pick a host for one request; release() it when the request ends.
+
+        Hosts in exclude are only used when no other healthy host is left.
+        """
+        with self._lock:
+            due = self._due_for_check(time.monotonic())
+        for url in due:
+            self.check_health(url)
+
+        with self._lock:
+            healthy = [endpoint for endpoint in self._endpoints.values() if endpoint.healthy]
+            healthy = [endpoint for endpoint in healthy if endpoint.url not in exclude] or healthy
+            if healthy:
+                # Hosts without a latency sample yet are tried first
+                endpoint = min(healthy, key=lambda e: (e.outstanding, e.latency or 0))
+            else:
+                endpoint = min(self._endpoints.values(), key=lambda e: e.down_until)
+            endpoint.outstanding += 1
+            return endpoint.url
+
+    def release(self, url, latency=None, failed=False):
+        """Return a host, with the request's seconds per token or whether it failed.
+
+        A request released with neither, such as one rejected with a 4xx or
+        cancelled, says nothing about the host and leaves its failures as they are.
+        """
+        with self._lock:
+            endpoint = self._endpoints[url]
+            endpoint.outstanding -= 1
+            if failed:
+                endpoint.failures += 1
+                if endpoint.failures == FAILURE_THRESHOLD:
+                    endpoint.down_until = time.monotonic() + endpoint.recheck_interval
+                return
+            if latency is None:
+                return
+            endpoint.failures = 0
+            endpoint.recheck_interval = RECHECK_INTERVAL
+            if endpoint.latency is None:
+                endpoint.latency = latency
+            else:
+                endpoint.latency += LATENCY_SMOOTHING * (latency - endpoint.latency)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_host_pool(value):
+    """Return the HostPool for a host setting, shared by every job using the same hosts."""
+    hosts = tuple(parse_hosts(value))
+    with _pools_lock:
+        pool = _pools.get(hosts)
+        if pool is None:
+            pool = _pools[hosts] = HostPool(hosts)
+        return pool
@@ -0,0 +1,251 @@
+import socket
+import threading
+import weakref
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Seconds to wait for a connection to be established
+DEFAULT_CONNECT_TIMEOUT = 10
+# Seconds to wait for a response; local models can be slow on long chunks
+DEFAULT_READ_TIMEOUT = 300
+# Maximum number of kept-alive connections per host
+DEFAULT_POOL_MAXSIZE = 16
+
+# Seconds between checks for a closed scope while a paused request waits
+PAUSE_POLL_INTERVAL = 0.1
+
+# The RequestScope requests sent on the current thread belong to
+_local = threading.local()
+
+class RequestAborted(Exception):
+    """Raised for a request cut off by RequestScope.abort(), or sent in a closed scope."""
+
+def current_scope():
+    return getattr(_local, "scope", None)
+
+class RequestScope:
+    """A group of requests, such as those of one job, that can be paused or aborted together.
+
+    Requests sent on a thread inside activate() are tracked from the moment
+    they take a pooled connection until they give it back. abort() shuts
+    those connections down, so blocked reads fail at once and the server
+    stops generating; the requests raise RequestAborted. While the scope is
+    paused, new requests wait with their connection before sending. Once it
+    is closed, they raise RequestAborted instead of being sent.
+
+    A scope with a parent is part of it: pausing, aborting or closing the
+    parent does the same to the child, but not the other way round.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self._closed = False
+        # Bumped by every abort, so a failure can be told apart from an abort
+        self._generation = 0
+        self._running = threading.Event()
+        self._running.set()
+        self._connections = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self):
+        previous = current_scope()
+        _local.scope = self
+        try:
+            yield self
+        finally:
+            _local.scope = previous
+
+    @property
+    def closed(self):
+        return self._closed or self.parent is not None and self.parent.closed
+
+    @property
+    def generation(self):
+        return self._generation + (self.parent.generation if self.parent is not None else 0)
+
+    @property
+    def paused(self):
+        return not self._running.is_set() or self.parent is not None and self.parent.paused
+
+    def pause(self):
+        """Hold back new requests and abort the ones in flight."""
+        self._running.clear()
+        self.abort()
+
+    def resume(self):
+        self._running.set()
+
+    def close(self):
+        """Abort the requests in flight and refuse any new ones."""
+        self._closed = True
+        self._running.set()
+        self.abort()
+
+    def abort(self):
+        with self._lock:
+            self._generation += 1
+            connections = list(self._connections)
+        for connection in connections:
+            sock = getattr(connection, "sock", None)
+            if sock is None:
+                continue
+            try:
+                # shutdown, unlike close, is safe while another thread reads the socket
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def wait_until_running(self):
+        """Block while the scope is paused; raise RequestAborted if it is closed."""
+        if self.parent is not None:
+            self.parent.wait_until_running()
+        while not self._running.wait(PAUSE_POLL_INTERVAL):
+            pass
+        if self.closed:
+            raise RequestAborted("Request scope closed")
+
+    def _track(self, connection):
+        with self._lock:
+            self._connections.add(connection)
+        if self.parent is not None:
+            self.parent._track(connection)
+
+    def _untrack(self, connection):
+        with self._lock:
+            self._connections.discard(connection)
+        if self.parent is not None:
+            self.parent._untrack(connection)
+
+def was_aborted(response):
+    """Return whether the scope of a streamed response aborted it after it was sent."""
+    scope, generation = getattr(response, "request_scope", (None, None))
+    return scope is not None and scope.generation != generation
+
+class _ScopedPoolMixin:
+    """Connection pool that registers checked-out connections with the thread's RequestScope."""
+
+    def _get_conn(self, timeout=None):
+        connection = super()._get_conn(timeout)
+        scope = current_scope()
+        if scope is None:
+            return connection
+        scope._track(connection)
+        connection.tracked_by = scope
+        try:
+            scope.wait_until_running()
+        except RequestAborted:
+            # urlopen gives the slot back to the pool without the connection, so drop it here
+            self._untrack_conn(connection)
+            connection.close()
+            raise
+        connection.tracked_generation = scope.generation
+        return connection
+
+    def _make_request(self, connection, *args, **kwargs):
+        scope = getattr(connection, "tracked_by", None)
+        if scope is not None:
+            # An abort skips a connection that has no socket yet, so open it first and
+            # then check that no abort came in between
+            if connection.sock is None:
+                connection.connect()
+            if scope.closed or scope.generation != connection.tracked_generation:
+                self._untrack_conn(connection)
+                connection.close()
+                raise RequestAborted("Request aborted before it was sent")
+        return super()._make_request(connection, *args, **kwargs)
+
+    def _untrack_conn(self, connection):
+        scope = getattr(connection, "tracked_by", None)
+        if scope is not None:
+            scope._untrack(connection)
+            connection.tracked_by = None
+
+    def _put_conn(self, connection):
+        self._untrack_conn(connection)
+        super()._put_conn(connection)
+
+class _ScopedHTTPConnectionPool(_ScopedPoolMixin, HTTPConnectionPool):
+    pass
+
+class _ScopedHTTPSConnectionPool(_ScopedPoolMixin, HTTPSConnectionPool):
+    pass
+
+class _ScopedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _ScopedHTTPConnectionPool,
+            "https": _ScopedHTTPSConnectionPool,
+        }
+
+class HttpClient:
+    """A pooled keep-alive HTTP session with default timeouts.
+
+    Requests sent inside an active RequestScope can be paused and aborted
+    through it.
+    """
+
+    def __init__(self, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_connections=10):
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+
+        # pool_block keeps each host at no more than pool_maxsize open connections
+        adapter = _ScopedHTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=True
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, url, **kwargs):
+        """Send a request through the pooled session."""
+        kwargs.setdefault("timeout", self.timeout)
+        scope = current_scope()
+        generation = scope.generation if scope is not None else None
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            if scope is not None and scope.generation != generation:
+                raise RequestAborted(f"Request aborted: {str(e)}") from e
+            raise
+        # Lets the reader of a streamed body tell an abort from a failure
+        response.request_scope = (scope, generation)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_http_client():
+    """Return the shared HTTP client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+def configure_http_client(**kwargs):
+    """Replace the shared HTTP client with one using the given settings."""
+    global _client
+    with _client_lock:
+        old_client = _client
+        _client = HttpClient(**kwargs)
+
+    # Requests still running on the old client keep their own connections
+    if old_client is not None:
+        old_client.close()
+    return _client
@@ -0,0 +1,61 @@
+import re
+
+# Inline markup inside a text unit is sent to the model as numbered placeholder tags:
+# <g1>...</g1> around the text an element holds, <x2/> for an element kept as it is
+TAG_PATTERN = re.compile(r"<(/?)([gx])(\d+)\s*(/?)>", re.IGNORECASE)
+
+def open_tag(number):
+    return f"<g{number}>"
+
+def close_tag(number):
+    return f"</g{number}>"
+
+def single_tag(number):
+    return f"<x{number}/>"
+
+def strip_tags(text):
+    """Return text without its placeholder tags."""
+    return TAG_PATTERN.sub("", text)
+
+def tag_tokens(text):
+    """Split text into ("text", str), ("open", n), ("close", n) and ("single", n) tokens."""
+    tokens = []
+    position = 0
+    for match in TAG_PATTERN.finditer(text):
+        if match.start() > position:
+            tokens.append(("text", text[position:match.start()]))
+        closing, kind, number, _ = match.groups()
+        if kind.lower() == "x":
+            tokens.append(("close" if closing else "single", int(number)))
+        else:
+            tokens.append(("close" if closing else "open", int(number)))
+        position = match.end()
+    if position < len(text):
+        tokens.append(("text", text[position:]))
+    return tokens
+
+def _tag_counts(tokens):
+    counts = {}
+    for kind, value in tokens:
+        if kind != "text":
+            counts[(kind, value)] = counts.get((kind, value), 0) + 1
+    return counts
+
+def matching_tags(source, translation):
+    """Return the tokens of translation if it holds exactly the tags of source, properly nested, or None.
+
+    The tags may be reordered, as the words they mark move in translation,
+    but each must appear once and every <gN> must be closed inside the
+    tags that enclose it.
+    """
+    tokens = tag_tokens(translation)
+    if _tag_counts(tokens) != _tag_counts(tag_tokens(source)):
+        return None
+    stack = []
+    for kind, value in tokens:
+        if kind == "open":
+            stack.append(value)
+        elif kind == "close":
+            if not stack or stack.pop() != value:
+                return None
+    return tokens
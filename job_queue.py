@@ -0,0 +1,338 @@
+import glob
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from file_handlers import FILE_FORMATS, detect_file_type
+from model_handlers import TranslationCancelled
+from rate_limiter import RequestGovernor, DEFAULT_MAX_RETRIES
+from translator import TranslationJob, default_output_path
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.expanduser("~"), ".longtext_translator", "job_queue.json")
+
+# Files translated at the same time; the next file starts while the last one finishes
+DEFAULT_PARALLEL_JOBS = 2
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+class QueuedJob:
+    """One file in the queue, with the TranslationJob options it runs with.
+
+    options holds TranslationJob keyword arguments such as model_type,
+    model_name, target_lang or batch_size. The API key is never stored;
+    the runner supplies it.
+    """
+
+    def __init__(self, input_file, output_file, file_type, options, job_id=None, status=PENDING, error=None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.input_file = input_file
+        self.output_file = output_file
+        self.file_type = file_type
+        self.options = options
+        self.status = status
+        self.error = error
+        self.progress = 100 if status == DONE else 0
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "input_file": self.input_file,
+            "output_file": self.output_file,
+            "file_type": self.file_type,
+            "options": self.options,
+            "status": self.status,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["input_file"], data["output_file"], data["file_type"], data.get("options", {}),
+                   data["id"], data.get("status", PENDING), data.get("error"))
+
+def _glob_root(pattern):
+    """Return the directory a glob pattern starts from: its path up to the first wildcard."""
+    parts = []
+    for part in os.path.normpath(pattern).split(os.sep)[:-1]:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    return os.sep.join(parts) or (os.sep if pattern.startswith(os.sep) else ".")
+
+def _expand_input(path, pattern, recursive, extensions):
+    """Return the files one path stands for, and the directory their relative paths start from."""
+    if os.path.isdir(path):
+        matches = glob.glob(os.path.join(path, "**", pattern or "*"), recursive=True) if recursive else \
+            glob.glob(os.path.join(path, pattern or "*"))
+        return [match for match in sorted(matches) if os.path.isfile(match) and
+                (pattern or os.path.splitext(match)[1].lower() in extensions)], path
+    if os.path.isfile(path):
+        return [path], os.path.dirname(path)
+    return [match for match in sorted(glob.glob(path, recursive=recursive)) if os.path.isfile(match)], \
+        _glob_root(path)
+
+def expand_inputs(paths, pattern=None, recursive=False):
+    """Expand files, directories and glob patterns into a sorted list of supported files.
+
+    Directories contribute the files matching pattern, or every file with a
+    registered extension if no pattern is given.
+    """
+    extensions = {ext for file_format in FILE_FORMATS.values() for ext in file_format.extensions}
+    return [input_file for path in paths for input_file in _expand_input(path, pattern, recursive, extensions)[0]]
+
+class JobQueue:
+    """An ordered list of translation jobs, saved to disk after every change.
+
+    With path=None the queue lives in memory only. Jobs that were running
+    when the queue was last saved are pending again on load; their journals
+    let them resume where they stopped.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH):
+        self.path = path
+        self.jobs = []
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading job queue: {str(e)}")
+            return
+        for job_data in data.get("jobs", []):
+            job = QueuedJob.from_dict(job_data)
+            if job.status == RUNNING:
+                job.status = PENDING
+            self.jobs.append(job)
+
+    def save(self):
+        """Write the queue atomically, so a crash never leaves it half written."""
+        if self.path is None:
+            return
+        with self._lock:
+            data = {"jobs": [job.to_dict() for job in self.jobs]}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+
+    def _check_output(self, input_file, output_file):
+        """Raise ValueError if output_file is written or read by another job still in the queue."""
+        for job in self.jobs:
+            if job.status not in (PENDING, RUNNING):
+                continue
+            if output_file == job.output_file:
+                raise ValueError(f"{input_file} and {job.input_file} would both be translated to {output_file}")
+            if output_file == job.input_file:
+                raise ValueError(f"Translating {input_file} would overwrite the queued file {job.input_file}")
+
+    def add(self, input_file, options, output_file=None, output_dir=None, file_type=None):
+        """Queue one file, named with the _translated suffix unless output_file is given.
+
+        Raises ValueError if another queued job already writes the same output.
+        """
+        file_type = detect_file_type(input_file) or file_type
+        if file_type is None:
+            raise ValueError(f"Unsupported file type: {input_file}")
+        input_file = os.path.abspath(input_file)
+        output_file = os.path.abspath(output_file or default_output_path(input_file, output_dir, file_type))
+        job = QueuedJob(input_file, output_file, file_type, dict(options))
+        with self._lock:
+            self._check_output(input_file, output_file)
+            self.jobs.append(job)
+            self.save()
+        return job
+
+    def add_paths(self, paths, options, pattern=None, recursive=False, output_dir=None):
+        """Queue every supported file found in paths; see expand_inputs.
+
+        With output_dir, each output keeps the folder it was found in relative
+        to the folder or pattern it was found through, so files with the same
+        name in different folders get separate outputs. Files that are the
+        output of another input found, or of a job in the queue, are skipped.
+        Raises ValueError, queuing nothing, if two files would share an output.
+        """
+        extensions = {ext for file_format in FILE_FORMATS.values() for ext in file_format.extensions}
+        found = []
+        for path in paths:
+            input_files, root = _expand_input(path, pattern, recursive, extensions)
+            for input_file in input_files:
+                file_type = detect_file_type(input_file)
+                if file_type is None:
+                    continue
+                input_file = os.path.abspath(input_file)
+                target_dir = None
+                if output_dir:
+                    relative_dir = os.path.relpath(os.path.dirname(input_file), os.path.abspath(root))
+                    target_dir = os.path.normpath(os.path.join(output_dir, relative_dir))
+                found.append((input_file, os.path.abspath(default_output_path(input_file, target_dir, file_type))))
+
+        with self._lock:
+            # Files already waiting, earlier outputs picked up by a directory scan,
+            # and outputs that jobs may still be writing
+            skipped = {job.input_file for job in self.jobs if job.status in (PENDING, RUNNING)}
+            skipped.update(output_file for _, output_file in found)
+            skipped.update(job.output_file for job in self.jobs)
+            files = []
+            for input_file, output_file in found:
+                if input_file not in skipped:
+                    skipped.add(input_file)
+                    files.append((input_file, output_file))
+
+            planned = {}
+            for input_file, output_file in files:
+                other = planned.setdefault(output_file, input_file)
+                if other != input_file:
+                    raise ValueError(f"{other} and {input_file} would both be translated to {output_file}")
+                self._check_output(input_file, output_file)
+            return [self.add(input_file, options, output_file) for input_file, output_file in files]
+
+    def get(self, job_id):
+        with self._lock:
+            for job in self.jobs:
+                if job.id == job_id:
+                    return job
+        return None
+
+    def remove(self, job_id):
+        with self._lock:
+            self.jobs = [job for job in self.jobs if job.id != job_id or job.status == RUNNING]
+            self.save()
+
+    def clear_finished(self):
+        with self._lock:
+            self.jobs = [job for job in self.jobs if job.status in (PENDING, RUNNING)]
+            self.save()
+
+    def retry_failed(self):
+        """Put failed and cancelled jobs back in the queue."""
+        with self._lock:
+            for job in self.jobs:
+                if job.status in (FAILED, CANCELLED):
+                    job.status = PENDING
+                    job.error = None
+            self.save()
+
+    def next_pending(self):
+        """Mark the first pending job as running and return it, or return None."""
+        with self._lock:
+            for job in self.jobs:
+                if job.status == PENDING:
+                    job.status = RUNNING
+                    job.error = None
+                    self.save()
+                    return job
+        return None
+
+    def set_status(self, job, status, error=None):
+        with self._lock:
+            job.status = status
+            job.error = error
+            self.save()
+
+class QueueRunner:
+    """Runs the pending jobs of a JobQueue under one shared request budget.
+
+    Up to parallel_jobs files are translated at once, so the backend stays
+    busy while one file is being read or written. All of them share one
+    RequestGovernor, so max_concurrency, the rate limits and retries apply
+    to the queue as a whole rather than to each file.
+
+    Callbacks are optional: on_status(job), on_progress(job, percent),
+    on_retry(attempt, delay, error_message) and on_telemetry(job, summary).
+    """
+
+    def __init__(self, queue, max_concurrency, parallel_jobs=DEFAULT_PARALLEL_JOBS, requests_per_second=0,
+                 tokens_per_minute=0, max_retries=DEFAULT_MAX_RETRIES, api_key=None,
+                 on_status=None, on_progress=None, on_retry=None, on_telemetry=None):
+        self.queue = queue
+        self.parallel_jobs = max(1, parallel_jobs)
+        self.api_key = api_key
+        self.on_status = on_status
+        self.on_progress = on_progress
+        self.on_telemetry = on_telemetry
+        self.cancelled = threading.Event()
+        self.governor = RequestGovernor(
+            max_concurrency,
+            requests_per_second=requests_per_second,
+            tokens_per_minute=tokens_per_minute,
+            max_retries=max_retries,
+            cancel_event=self.cancelled,
+            on_retry=on_retry
+        )
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Stop starting new jobs and cancel the running ones; they stay resumable."""
+        self.cancelled.set()
+        with self._lock:
+            running = list(self._running.values())
+        for translation_job in running:
+            translation_job.cancel()
+
+    def _set_status(self, job, status, error=None):
+        self.queue.set_status(job, status, error)
+        if self.on_status:
+            self.on_status(job)
+
+    def _make_job(self, job):
+        options = dict(job.options)
+        if options.get("model_type") == "api":
+            options["api_key"] = self.api_key
+
+        def report_progress(value):
+            job.progress = value
+            if self.on_progress:
+                self.on_progress(job, value)
+
+        def report_telemetry(summary):
+            if self.on_telemetry:
+                self.on_telemetry(job, summary)
+
+        return TranslationJob(job.input_file, job.output_file, job.file_type, governor=self.governor,
+                              on_progress=report_progress, on_telemetry=report_telemetry, **options)
+
+    def _run_job(self, job):
+        try:
+            os.makedirs(os.path.dirname(job.output_file), exist_ok=True)
+            translation_job = self._make_job(job)
+            with self._lock:
+                self._running[job.id] = translation_job
+            if self.cancelled.is_set():
+                raise TranslationCancelled("Translation cancelled")
+            translation_job.run()
+            self._set_status(job, DONE)
+        except TranslationCancelled:
+            self._set_status(job, CANCELLED)
+        except Exception as e:
+            self._set_status(job, FAILED, str(e))
+        finally:
+            with self._lock:
+                self._running.pop(job.id, None)
+
+    def _worker(self):
+        while not self.cancelled.is_set():
+            job = self.queue.next_pending()
+            if job is None:
+                return
+            if self.on_status:
+                self.on_status(job)
+            self._run_job(job)
+
+    def run(self):
+        """Run jobs until the queue has no pending jobs left or the runner is cancelled."""
+        with ThreadPoolExecutor(max_workers=self.parallel_jobs) as executor:
+            workers = [executor.submit(self._worker) for _ in range(self.parallel_jobs)]
+            for worker in workers:
+                worker.result()
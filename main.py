@@ -5,17 +5,32 @@ import requests
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                             QLabel, QPushButton, QComboBox, QFileDialog, QTextEdit, 
                             QTabWidget, QCheckBox, QLineEdit, QGroupBox, QRadioButton,
-                            QProgressBar, QMessageBox, QSpinBox)
+                            QProgressBar, QMessageBox, QSpinBox, QDoubleSpinBox,
+                            QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QSettings
 
-# Import file handlers
-from file_handlers import (read_text_file, read_pdf_file, read_docx_file, 
-                          read_epub_file, read_srt_file, write_text_file, 
-                          write_srt_file, merge_subtitles)
+# Import the shared HTTP client
+from http_client import configure_http_client, DEFAULT_POOL_MAXSIZE, DEFAULT_READ_TIMEOUT
+
+# Import the translation cache
+from translation_cache import TranslationCache
 
 # Import model handlers
-from model_handlers import (detect_ollama_models, translate_with_ollama,
-                           translate_with_api)
+from model_handlers import (detect_ollama_models, warm_up_ollama_model, ollama_num_ctx, TranslationCancelled,
+                           OLLAMA_DEFAULT_HOST, OLLAMA_DEFAULT_KEEP_ALIVE, DEFAULT_MAX_WORKERS,
+                           DEFAULT_SUBTITLE_BATCH_SIZE)
+from chunk_tuner import resolve_chunk_size
+from rate_limiter import DEFAULT_MAX_RETRIES
+
+# Import the format registry
+from file_handlers import FILE_FORMATS, detect_file_type, get_file_format
+
+# Import the translation core
+from translator import TranslationJob, default_output_path
+from telemetry import metrics_paths_for
+
+# Import the multi-file job queue
+from job_queue import JobQueue, QueueRunner, DEFAULT_PARALLEL_JOBS
 
 # 定义语言字典
 TRANSLATIONS = {
@@ -47,13 +62,67 @@ TRANSLATIONS = {
         "log": "Log:",
         "translate": "Translate",
         "ollama_settings": "Ollama Settings",
-        "ollama_host": "Ollama Host:",
+        "ollama_host": "Ollama Hosts (comma separated):",
+        "keep_alive": "Keep Model Loaded For (e.g. 30m, -1 = always):",
+        "max_workers": "Concurrent Requests:",
+        "request_timeout": "Request Timeout (s):",
+        "use_cache": "Use translation cache",
+        "subtitle_batch_size": "Subtitle cues per request:",
+        "stream_responses": "Stream responses",
+        "calibrate_chunk_size": "Calibrate chunk size on this file first",
+        "calibration_measurement": "Chunk size {chunk_size}: {tokens_per_sec} tokens/s, output ratio {output_ratio}",
+        "calibration_failed_size": "Chunk size {chunk_size} failed: {error}",
+        "calibration_done": "Chunk size {} tokens saved for this model",
+        "requests_per_second": "Requests per Second (0 = unlimited):",
+        "tokens_per_minute": "Tokens per Minute (0 = unlimited):",
+        "max_retries": "Retries per Request:",
+        "hedge_percentile": "Duplicate Requests Slower Than Percentile (0 = off):",
+        "hedge_stats": "Hedging: {} duplicate requests, {} answered first",
+        "retrying": "Retry {} in {:.1f} s after: {}",
+        "cancel": "Cancel",
+        "pause": "Pause",
+        "resume": "Resume",
+        "translation_paused": "Translation paused; requests in flight were aborted and will be sent again on resume",
+        "translation_resumed": "Translation resumed",
+        "translation_cancelled": "Translation cancelled; finished chunks are kept for resuming",
+        "stream_stats": "First token: {:.2f} s | {:.1f} tokens/s",
+        "export_metrics": "Export performance metrics",
+        "progress_summary": "%p% | {:.1f} chunks/s | {:.0f} tokens/s | ETA {} | cache {}/{}",
+        "metrics_saved": "Performance metrics saved next to the output: {}",
+        "queue_tab": "Queue",
+        "add_files": "Add Files...",
+        "add_folder": "Add Folder...",
+        "file_pattern": "Folder file pattern (empty = all supported):",
+        "recursive": "Include subfolders",
+        "output_folder": "Output folder (empty = next to each input):",
+        "parallel_jobs": "Files translated at once:",
+        "start_queue": "Start Queue",
+        "stop_queue": "Stop Queue",
+        "remove_selected": "Remove Selected",
+        "clear_finished": "Clear Finished",
+        "retry_failed": "Retry Failed",
+        "queue_columns": "File|Type|Status|Progress|Output",
+        "status_pending": "Pending",
+        "status_running": "Running",
+        "status_done": "Done",
+        "status_failed": "Failed",
+        "status_cancelled": "Cancelled",
+        "queue_added": "Added {} files to the queue",
+        "queue_job_failed": "{} failed: {}",
+        "queue_finished": "Queue finished: {} done, {} failed, {} cancelled",
+        "clear_cache": "Clear Cache",
+        "cache_cleared": "Translation cache cleared",
+        "cache_stats": "Translation cache: {} hits, {} misses",
+        "resuming_job": "Resuming interrupted job: {} chunks already translated",
         "save_settings": "Save Settings",
         "app_language": "Application Language:",
         "app_initialized": "Application initialized",
         "refreshing_models": "Refreshing Ollama models...",
         "found_models": "Found {} Ollama models",
         "error_refreshing": "Error refreshing Ollama models: {}",
+        "loading_model": "Loading Ollama model {}...",
+        "model_loaded": "Model {} loaded on {} host(s)",
+        "error_loading_model": "Error loading Ollama model: {}",
         "settings_saved": "Settings saved",
         "warning": "Warning",
         "select_input": "Please select an input file",
@@ -93,13 +162,67 @@ TRANSLATIONS = {
         "log": "日志：",
         "translate": "翻译",
         "ollama_settings": "Ollama 设置",
-        "ollama_host": "Ollama 主机：",
+        "ollama_host": "Ollama 主机（多个用逗号分隔）：",
+        "keep_alive": "模型保持加载时长（如 30m，-1 为一直保持）：",
+        "max_workers": "并发请求数：",
+        "request_timeout": "请求超时（秒）：",
+        "use_cache": "使用翻译缓存",
+        "subtitle_batch_size": "每次请求的字幕条数：",
+        "stream_responses": "流式响应",
+        "calibrate_chunk_size": "先在此文件上校准分块大小",
+        "calibration_measurement": "分块大小 {chunk_size}：{tokens_per_sec} tokens/s，输出长度比 {output_ratio}",
+        "calibration_failed_size": "分块大小 {chunk_size} 失败：{error}",
+        "calibration_done": "已为该模型保存分块大小 {} tokens",
+        "requests_per_second": "每秒请求数（0 = 不限）：",
+        "tokens_per_minute": "每分钟词元数（0 = 不限）：",
+        "max_retries": "每个请求的重试次数：",
+        "hedge_percentile": "慢于该百分位的请求发送副本（0 为关闭）：",
+        "hedge_stats": "对冲请求：发送 {} 个副本，其中 {} 个先返回",
+        "retrying": "{} 次重试，{:.1f} 秒后进行，原因：{}",
+        "cancel": "取消",
+        "pause": "暂停",
+        "resume": "继续",
+        "translation_paused": "翻译已暂停；进行中的请求已中止，继续时会重新发送",
+        "translation_resumed": "翻译已继续",
+        "translation_cancelled": "翻译已取消；已完成的片段会保留以便继续",
+        "stream_stats": "首个词元：{:.2f} 秒 | {:.1f} 词元/秒",
+        "export_metrics": "导出性能指标",
+        "progress_summary": "%p% | {:.1f} 片段/秒 | {:.0f} 词元/秒 | 剩余 {} | 缓存 {}/{}",
+        "metrics_saved": "性能指标已保存在输出文件旁：{}",
+        "queue_tab": "队列",
+        "add_files": "添加文件...",
+        "add_folder": "添加文件夹...",
+        "file_pattern": "文件夹文件匹配（留空 = 所有支持的格式）：",
+        "recursive": "包含子文件夹",
+        "output_folder": "输出文件夹（留空 = 与输入文件相同）：",
+        "parallel_jobs": "同时翻译的文件数：",
+        "start_queue": "开始队列",
+        "stop_queue": "停止队列",
+        "remove_selected": "移除所选",
+        "clear_finished": "清除已完成",
+        "retry_failed": "重试失败项",
+        "queue_columns": "文件|类型|状态|进度|输出",
+        "status_pending": "等待中",
+        "status_running": "进行中",
+        "status_done": "已完成",
+        "status_failed": "失败",
+        "status_cancelled": "已取消",
+        "queue_added": "已向队列添加 {} 个文件",
+        "queue_job_failed": "{} 失败：{}",
+        "queue_finished": "队列完成：{} 个成功，{} 个失败，{} 个取消",
+        "clear_cache": "清除缓存",
+        "cache_cleared": "翻译缓存已清除",
+        "cache_stats": "翻译缓存：命中 {} 次，未命中 {} 次",
+        "resuming_job": "继续未完成的任务：已翻译 {} 个片段",
         "save_settings": "保存设置",
         "app_language": "应用程序语言：",
         "app_initialized": "应用程序已初始化",
         "refreshing_models": "正在刷新 Ollama 模型...",
         "found_models": "找到 {} 个 Ollama 模型",
         "error_refreshing": "刷新 Ollama 模型出错：{}",
+        "loading_model": "正在加载 Ollama 模型 {}...",
+        "model_loaded": "模型 {} 已在 {} 台主机上加载",
+        "error_loading_model": "加载 Ollama 模型出错：{}",
         "settings_saved": "设置已保存",
         "warning": "警告",
         "select_input": "请选择输入文件",
@@ -117,79 +240,109 @@ class TranslationThread(QThread):
     progress_signal = pyqtSignal(int)
     result_signal = pyqtSignal(str)
     error_signal = pyqtSignal(str)
+    cache_stats_signal = pyqtSignal(int, int)
+    resume_signal = pyqtSignal(int)
+    stream_signal = pyqtSignal(float, float, int)
+    cancelled_signal = pyqtSignal()
+    retry_signal = pyqtSignal(int, float, str)
+    telemetry_signal = pyqtSignal(dict)
+    calibration_signal = pyqtSignal(dict)
+    calibrated_signal = pyqtSignal(int)
     
     def __init__(self, input_file, output_file, file_type, model_type, model_name, 
-                 api_url=None, api_key=None, merge_bilingual=False, source_lang="auto", target_lang="en"):
+                 api_url=None, api_key=None, merge_bilingual=False, source_lang="auto", target_lang="en",
+                 max_workers=DEFAULT_MAX_WORKERS, use_cache=True, batch_size=DEFAULT_SUBTITLE_BATCH_SIZE,
+                 stream=False, requests_per_second=0, tokens_per_minute=0, max_retries=DEFAULT_MAX_RETRIES,
+                 export_metrics=False, ollama_host=OLLAMA_DEFAULT_HOST, keep_alive=OLLAMA_DEFAULT_KEEP_ALIVE,
+                 hedge_percentile=None, calibrate=False):
         super().__init__()
-        self.input_file = input_file
-        self.output_file = output_file
-        self.file_type = file_type
-        self.model_type = model_type
-        self.model_name = model_name
-        self.api_url = api_url
-        self.api_key = api_key
-        self.merge_bilingual = merge_bilingual
-        self.source_lang = source_lang
-        self.target_lang = target_lang
+        self.calibrate = calibrate
+        self.job = TranslationJob(
+            input_file, output_file, file_type, model_type, model_name,
+            api_url, api_key, merge_bilingual, source_lang, target_lang,
+            max_workers, use_cache, batch_size, stream,
+            requests_per_second, tokens_per_minute, max_retries, export_metrics,
+            ollama_host=ollama_host,
+            keep_alive=keep_alive,
+            hedge_percentile=hedge_percentile,
+            on_progress=self.progress_signal.emit,
+            on_stream=self.stream_signal.emit,
+            on_retry=self.retry_signal.emit,
+            on_resume=self.resume_signal.emit,
+            on_cache_stats=self.cache_stats_signal.emit,
+            on_telemetry=self.telemetry_signal.emit
+        )
+    
+    def cancel(self):
+        """Stop scheduling chunks and abort the requests in flight."""
+        self.job.cancel()
+    
+    def pause(self):
+        """Hold back new requests and abort the ones in flight; finished chunks are kept."""
+        self.job.pause()
+    
+    def resume(self):
+        self.job.resume()
+    
+    @property
+    def paused(self):
+        return self.job.paused
         
     def run(self):
         try:
-            # Read the input file
-            content = None
-            if self.file_type == "txt":
-                content = read_text_file(self.input_file)
-            elif self.file_type == "pdf":
-                content = read_pdf_file(self.input_file)
-            elif self.file_type == "docx":
-                content = read_docx_file(self.input_file)
-            elif self.file_type == "epub":
-                content = read_epub_file(self.input_file)
-            elif self.file_type == "srt":
-                content = read_srt_file(self.input_file)
-            
-            if content is None:
-                self.error_signal.emit(f"Failed to read {self.input_file}")
-                return
-            
-            # Translate the content
-            translated_content = None
-            if self.model_type == "ollama":
-                translated_content = translate_with_ollama(
-                    content, 
-                    self.model_name, 
-                    self.source_lang, 
-                    self.target_lang,
-                    self.progress_signal
-                )
-            elif self.model_type == "api":
-                translated_content = translate_with_api(
-                    content, 
-                    self.api_url, 
-                    self.api_key, 
-                    self.source_lang, 
-                    self.target_lang,
-                    self.progress_signal
-                )
-            
-            if translated_content is None:
-                self.error_signal.emit("Translation failed")
-                return
-            
-            # Write the output file
-            if self.file_type == "srt" and self.merge_bilingual:
-                merged_content = merge_subtitles(content, translated_content)
-                write_srt_file(self.output_file, merged_content)
-            elif self.file_type == "srt":
-                write_srt_file(self.output_file, translated_content)
-            else:
-                write_text_file(self.output_file, translated_content)
-            
-            self.result_signal.emit(self.output_file)
-            
+            if self.calibrate:
+                self.calibrated_signal.emit(self.job.calibrate(
+                    on_measurement=lambda measurement: self.calibration_signal.emit(measurement.to_dict())
+                ))
+            self.result_signal.emit(self.job.run())
+        except TranslationCancelled:
+            self.cancelled_signal.emit()
         except Exception as e:
             self.error_signal.emit(f"Error: {str(e)}")
 
 
+class ModelWarmupThread(QThread):
+    loaded_signal = pyqtSignal(str, int)
+    error_signal = pyqtSignal(str)
+    
+    def __init__(self, model_name, ollama_host, keep_alive):
+        super().__init__()
+        self.model_name = model_name
+        self.ollama_host = ollama_host
+        self.keep_alive = keep_alive
+    
+    def run(self):
+        try:
+            # 与翻译任务使用相同的上下文长度，避免开始翻译时重新加载模型
+            num_ctx = ollama_num_ctx(resolve_chunk_size("ollama", self.model_name), self.model_name)
+            hosts = warm_up_ollama_model(self.model_name, self.ollama_host, self.keep_alive, num_ctx)
+            self.loaded_signal.emit(self.model_name, len(hosts))
+        except Exception as e:
+            self.error_signal.emit(str(e))
+
+
+class QueueThread(QThread):
+    status_signal = pyqtSignal(str)
+    progress_signal = pyqtSignal(str, int)
+    retry_signal = pyqtSignal(int, float, str)
+    
+    def __init__(self, queue, max_concurrency, parallel_jobs, requests_per_second, tokens_per_minute, max_retries,
+                 api_key=None):
+        super().__init__()
+        self.runner = QueueRunner(
+            queue, max_concurrency, parallel_jobs, requests_per_second, tokens_per_minute, max_retries, api_key,
+            on_status=lambda job: self.status_signal.emit(job.id),
+            on_progress=lambda job, value: self.progress_signal.emit(job.id, value),
+            on_retry=self.retry_signal.emit
+        )
+    
+    def cancel(self):
+        self.runner.cancel()
+    
+    def run(self):
+        self.runner.run()
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -258,7 +411,7 @@ class MainWindow(QMainWindow):
         file_type_layout = QHBoxLayout()
         self.file_type_label = QLabel(self.tr("file_type"))
         self.file_type_combo = QComboBox()
-        self.file_type_combo.addItems(["txt", "pdf", "docx", "epub", "srt"])
+        self.file_type_combo.addItems(list(FILE_FORMATS))
         file_type_layout.addWidget(self.file_type_label)
         file_type_layout.addWidget(self.file_type_combo)
         file_layout.addLayout(file_type_layout)
@@ -269,6 +422,14 @@ class MainWindow(QMainWindow):
         self.subtitle_options.setLayout(subtitle_layout)
         self.merge_bilingual = QCheckBox(self.tr("merge_bilingual"))
         subtitle_layout.addWidget(self.merge_bilingual)
+        subtitle_batch_layout = QHBoxLayout()
+        self.subtitle_batch_label = QLabel(self.tr("subtitle_batch_size"))
+        self.subtitle_batch_size = QSpinBox()
+        self.subtitle_batch_size.setRange(1, 100)
+        self.subtitle_batch_size.setValue(DEFAULT_SUBTITLE_BATCH_SIZE)
+        subtitle_batch_layout.addWidget(self.subtitle_batch_label)
+        subtitle_batch_layout.addWidget(self.subtitle_batch_size)
+        subtitle_layout.addLayout(subtitle_batch_layout)
         file_layout.addWidget(self.subtitle_options)
         self.subtitle_options.setVisible(False)
         
@@ -302,10 +463,19 @@ class MainWindow(QMainWindow):
         self.ollama_model_combo = QComboBox()
         self.refresh_button = QPushButton(self.tr("refresh"))
         self.refresh_button.clicked.connect(self.refresh_ollama_models)
+        # 用户选中模型时预先加载，避免第一批片段等待模型加载；
+        # 启动或刷新列表时不加载，以免占用各主机并换出正在使用的模型
+        self.warmup_threads = set()
+        self.ollama_model_combo.activated.connect(
+            lambda index: self.warm_up_model(self.ollama_model_combo.itemText(index))
+        )
         ollama_model_layout.addWidget(self.ollama_model_label)
         ollama_model_layout.addWidget(self.ollama_model_combo)
         ollama_model_layout.addWidget(self.refresh_button)
         ollama_layout.addLayout(ollama_model_layout)
+        self.stream_responses = QCheckBox(self.tr("stream_responses"))
+        self.stream_responses.setChecked(True)
+        ollama_layout.addWidget(self.stream_responses)
         
         translation_options_layout.addWidget(self.ollama_group)
         
@@ -359,12 +529,23 @@ class MainWindow(QMainWindow):
         
         translation_options_layout.addWidget(self.lang_group)
         
+        # 分块大小校准
+        self.calibrate_chunk_size = QCheckBox(self.tr("calibrate_chunk_size"))
+        translation_options_layout.addWidget(self.calibrate_chunk_size)
+        
         # 进度条
         progress_layout = QVBoxLayout()
         self.progress_label = QLabel(self.tr("progress"))
         self.progress_bar = QProgressBar()
         progress_layout.addWidget(self.progress_label)
         progress_layout.addWidget(self.progress_bar)
+        # 当前片段的生成进度和速度
+        self.chunk_progress_bar = QProgressBar()
+        self.chunk_progress_bar.setMaximumHeight(8)
+        self.chunk_progress_bar.setTextVisible(False)
+        self.stream_stats_label = QLabel()
+        progress_layout.addWidget(self.chunk_progress_bar)
+        progress_layout.addWidget(self.stream_stats_label)
         translation_layout.addLayout(progress_layout)
         
         # 状态和日志
@@ -377,7 +558,17 @@ class MainWindow(QMainWindow):
         # 翻译按钮
         self.translate_button = QPushButton(self.tr("translate"))
         self.translate_button.clicked.connect(self.start_translation)
-        translation_layout.addWidget(self.translate_button)
+        self.cancel_button = QPushButton(self.tr("cancel"))
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_translation)
+        self.pause_button = QPushButton(self.tr("pause"))
+        self.pause_button.setEnabled(False)
+        self.pause_button.clicked.connect(self.toggle_pause)
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(self.translate_button)
+        button_layout.addWidget(self.pause_button)
+        button_layout.addWidget(self.cancel_button)
+        translation_layout.addLayout(button_layout)
         
         # 设置标签页内容
         # Ollama设置
@@ -389,11 +580,96 @@ class MainWindow(QMainWindow):
         ollama_host_layout = QHBoxLayout()
         self.ollama_host_label = QLabel(self.tr("ollama_host"))
         self.ollama_host = QLineEdit()
-        self.ollama_host.setText(self.settings.value("ollama_host", "http://localhost:11434"))
+        self.ollama_host.setText(self.settings.value("ollama_host", OLLAMA_DEFAULT_HOST))
+        self.ollama_host.setPlaceholderText("http://gpu1:11434, http://gpu2:11434")
         ollama_host_layout.addWidget(self.ollama_host_label)
         ollama_host_layout.addWidget(self.ollama_host)
         ollama_settings_layout.addLayout(ollama_host_layout)
         
+        # 模型保持加载时长
+        keep_alive_layout = QHBoxLayout()
+        self.keep_alive_label = QLabel(self.tr("keep_alive"))
+        self.keep_alive = QLineEdit()
+        self.keep_alive.setText(self.settings.value("keep_alive", OLLAMA_DEFAULT_KEEP_ALIVE))
+        keep_alive_layout.addWidget(self.keep_alive_label)
+        keep_alive_layout.addWidget(self.keep_alive)
+        ollama_settings_layout.addLayout(keep_alive_layout)
+        
+        # 并发请求数
+        max_workers_layout = QHBoxLayout()
+        self.max_workers_label = QLabel(self.tr("max_workers"))
+        self.max_workers = QSpinBox()
+        self.max_workers.setRange(1, 32)
+        self.max_workers.setValue(self.settings.value("max_workers", DEFAULT_MAX_WORKERS, type=int))
+        max_workers_layout.addWidget(self.max_workers_label)
+        max_workers_layout.addWidget(self.max_workers)
+        ollama_settings_layout.addLayout(max_workers_layout)
+        
+        # 请求超时
+        request_timeout_layout = QHBoxLayout()
+        self.request_timeout_label = QLabel(self.tr("request_timeout"))
+        self.request_timeout = QSpinBox()
+        self.request_timeout.setRange(5, 3600)
+        self.request_timeout.setValue(self.settings.value("request_timeout", DEFAULT_READ_TIMEOUT, type=int))
+        request_timeout_layout.addWidget(self.request_timeout_label)
+        request_timeout_layout.addWidget(self.request_timeout)
+        ollama_settings_layout.addLayout(request_timeout_layout)
+        
+        # 速率限制和重试
+        rps_layout = QHBoxLayout()
+        self.requests_per_second_label = QLabel(self.tr("requests_per_second"))
+        self.requests_per_second = QDoubleSpinBox()
+        self.requests_per_second.setRange(0, 1000)
+        self.requests_per_second.setDecimals(1)
+        self.requests_per_second.setValue(self.settings.value("requests_per_second", 0, type=float))
+        rps_layout.addWidget(self.requests_per_second_label)
+        rps_layout.addWidget(self.requests_per_second)
+        ollama_settings_layout.addLayout(rps_layout)
+        
+        tpm_layout = QHBoxLayout()
+        self.tokens_per_minute_label = QLabel(self.tr("tokens_per_minute"))
+        self.tokens_per_minute = QSpinBox()
+        self.tokens_per_minute.setRange(0, 10000000)
+        self.tokens_per_minute.setSingleStep(1000)
+        self.tokens_per_minute.setValue(self.settings.value("tokens_per_minute", 0, type=int))
+        tpm_layout.addWidget(self.tokens_per_minute_label)
+        tpm_layout.addWidget(self.tokens_per_minute)
+        ollama_settings_layout.addLayout(tpm_layout)
+        
+        max_retries_layout = QHBoxLayout()
+        self.max_retries_label = QLabel(self.tr("max_retries"))
+        self.max_retries = QSpinBox()
+        self.max_retries.setRange(0, 20)
+        self.max_retries.setValue(self.settings.value("max_retries", DEFAULT_MAX_RETRIES, type=int))
+        max_retries_layout.addWidget(self.max_retries_label)
+        max_retries_layout.addWidget(self.max_retries)
+        ollama_settings_layout.addLayout(max_retries_layout)
+        
+        # 对冲请求：慢请求发送副本，取先返回的结果
+        hedge_layout = QHBoxLayout()
+        self.hedge_percentile_label = QLabel(self.tr("hedge_percentile"))
+        self.hedge_percentile = QSpinBox()
+        self.hedge_percentile.setRange(0, 99)
+        self.hedge_percentile.setValue(self.settings.value("hedge_percentile", 0, type=int))
+        hedge_layout.addWidget(self.hedge_percentile_label)
+        hedge_layout.addWidget(self.hedge_percentile)
+        ollama_settings_layout.addLayout(hedge_layout)
+        
+        # 翻译缓存
+        cache_layout = QHBoxLayout()
+        self.use_cache = QCheckBox(self.tr("use_cache"))
+        self.use_cache.setChecked(self.settings.value("use_cache", True, type=bool))
+        self.clear_cache_button = QPushButton(self.tr("clear_cache"))
+        self.clear_cache_button.clicked.connect(self.clear_cache)
+        cache_layout.addWidget(self.use_cache)
+        cache_layout.addWidget(self.clear_cache_button)
+        ollama_settings_layout.addLayout(cache_layout)
+        
+        # 性能指标导出
+        self.export_metrics = QCheckBox(self.tr("export_metrics"))
+        self.export_metrics.setChecked(self.settings.value("export_metrics", False, type=bool))
+        ollama_settings_layout.addWidget(self.export_metrics)
+        
         # 应用程序语言选择
         app_lang_layout = QHBoxLayout()
         self.app_lang_label = QLabel(self.tr("app_language"))
@@ -415,7 +691,84 @@ class MainWindow(QMainWindow):
         
         settings_layout.addWidget(self.ollama_settings_group)
         
+        # 队列标签页
+        queue_tab = QWidget()
+        queue_layout = QVBoxLayout()
+        queue_tab.setLayout(queue_layout)
+        self.tabs.insertTab(1, queue_tab, self.tr("queue_tab"))
+        
+        # 添加文件和文件夹
+        queue_add_layout = QHBoxLayout()
+        self.add_files_button = QPushButton(self.tr("add_files"))
+        self.add_files_button.clicked.connect(self.add_queue_files)
+        self.add_folder_button = QPushButton(self.tr("add_folder"))
+        self.add_folder_button.clicked.connect(self.add_queue_folder)
+        queue_add_layout.addWidget(self.add_files_button)
+        queue_add_layout.addWidget(self.add_folder_button)
+        queue_layout.addLayout(queue_add_layout)
+        
+        pattern_layout = QHBoxLayout()
+        self.file_pattern_label = QLabel(self.tr("file_pattern"))
+        self.file_pattern = QLineEdit(self.settings.value("queue_pattern", ""))
+        self.file_pattern.setPlaceholderText("*.srt")
+        self.recursive = QCheckBox(self.tr("recursive"))
+        pattern_layout.addWidget(self.file_pattern_label)
+        pattern_layout.addWidget(self.file_pattern)
+        pattern_layout.addWidget(self.recursive)
+        queue_layout.addLayout(pattern_layout)
+        
+        output_folder_layout = QHBoxLayout()
+        self.output_folder_label = QLabel(self.tr("output_folder"))
+        self.output_folder = QLineEdit(self.settings.value("queue_output_folder", ""))
+        self.output_folder_button = QPushButton(self.tr("browse"))
+        self.output_folder_button.clicked.connect(self.select_output_folder)
+        output_folder_layout.addWidget(self.output_folder_label)
+        output_folder_layout.addWidget(self.output_folder)
+        output_folder_layout.addWidget(self.output_folder_button)
+        queue_layout.addLayout(output_folder_layout)
+        
+        parallel_jobs_layout = QHBoxLayout()
+        self.parallel_jobs_label = QLabel(self.tr("parallel_jobs"))
+        self.parallel_jobs = QSpinBox()
+        self.parallel_jobs.setRange(1, 8)
+        self.parallel_jobs.setValue(self.settings.value("parallel_jobs", DEFAULT_PARALLEL_JOBS, type=int))
+        parallel_jobs_layout.addWidget(self.parallel_jobs_label)
+        parallel_jobs_layout.addWidget(self.parallel_jobs)
+        queue_layout.addLayout(parallel_jobs_layout)
+        
+        # 任务列表，每个文件一行
+        self.queue_table = QTableWidget(0, 5)
+        self.queue_table.setHorizontalHeaderLabels(self.tr("queue_columns").split("|"))
+        self.queue_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.queue_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.Stretch)
+        self.queue_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.queue_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        queue_layout.addWidget(self.queue_table)
+        
+        queue_button_layout = QHBoxLayout()
+        self.start_queue_button = QPushButton(self.tr("start_queue"))
+        self.start_queue_button.clicked.connect(self.start_queue)
+        self.stop_queue_button = QPushButton(self.tr("stop_queue"))
+        self.stop_queue_button.setEnabled(False)
+        self.stop_queue_button.clicked.connect(self.stop_queue)
+        self.remove_selected_button = QPushButton(self.tr("remove_selected"))
+        self.remove_selected_button.clicked.connect(self.remove_selected_jobs)
+        self.clear_finished_button = QPushButton(self.tr("clear_finished"))
+        self.clear_finished_button.clicked.connect(self.clear_finished_jobs)
+        self.retry_failed_button = QPushButton(self.tr("retry_failed"))
+        self.retry_failed_button.clicked.connect(self.retry_failed_jobs)
+        for button in (self.start_queue_button, self.stop_queue_button, self.remove_selected_button,
+                       self.clear_finished_button, self.retry_failed_button):
+            queue_button_layout.addWidget(button)
+        queue_layout.addLayout(queue_button_layout)
+        
+        # 加载上次保存的队列
+        self.job_queue = JobQueue()
+        self.queue_thread = None
+        self.refresh_queue_table()
+        
         # 初始化UI状态
+        self.configure_http()
         self.update_model_options()
         self.refresh_ollama_models()
         
@@ -450,19 +803,27 @@ class MainWindow(QMainWindow):
         except Exception as e:
             self.log(self.tr("error_refreshing").format(str(e)))
     
+    def warm_up_model(self, model_name):
+        if not model_name or self.tr("ollama_local") not in self.model_type.currentText():
+            return
+        self.log(self.tr("loading_model").format(model_name))
+        thread = ModelWarmupThread(model_name, self.ollama_host.text(), self.keep_alive.text())
+        thread.loaded_signal.connect(lambda name, hosts: self.log(self.tr("model_loaded").format(name, hosts)))
+        thread.error_signal.connect(lambda error: self.log(self.tr("error_loading_model").format(error)))
+        # 线程结束前保留引用
+        thread.finished.connect(lambda: self.warmup_threads.discard(thread))
+        self.warmup_threads.add(thread)
+        thread.start()
+    
     def select_input_file(self):
         file_type = self.file_type_combo.currentText()
-        file_filter = ""
-        if file_type == "txt":
-            file_filter = "Text files (*.txt)"
-        elif file_type == "pdf":
-            file_filter = "PDF files (*.pdf)"
-        elif file_type == "docx":
-            file_filter = "Word files (*.docx)"
-        elif file_type == "epub":
-            file_filter = "EPUB files (*.epub)"
-        elif file_type == "srt":
-            file_filter = "Subtitle files (*.srt)"
+        # 当前类型优先，其次是所有支持的格式
+        extensions = " ".join("*" + ext for fmt in FILE_FORMATS.values() for ext in fmt.extensions)
+        file_filter = ";;".join([
+            get_file_format(file_type).file_filter(),
+            f"Supported files ({extensions})",
+            "All files (*)"
+        ])
         
         file_path, _ = QFileDialog.getOpenFileName(
             self, "Select Input File", "", file_filter
@@ -470,14 +831,12 @@ class MainWindow(QMainWindow):
         
         if file_path:
             self.input_path.setText(file_path)
+            # 根据文件内容自动识别类型
+            detected_type = detect_file_type(file_path)
+            if detected_type:
+                self.file_type_combo.setCurrentText(detected_type)
             # 自动生成输出路径
-            base_name = os.path.basename(file_path)
-            name, ext = os.path.splitext(base_name)
-            output_path = os.path.join(
-                os.path.dirname(file_path),
-                f"{name}_translated{ext}"
-            )
-            self.output_path.setText(output_path)
+            self.output_path.setText(default_output_path(file_path))
     
     def select_output_file(self):
         file_type = self.file_type_combo.currentText()
@@ -487,9 +846,9 @@ class MainWindow(QMainWindow):
         elif file_type == "pdf":
             file_filter = "Text files (*.txt)"  # PDF输出为文本
         elif file_type == "docx":
-            file_filter = "Text files (*.txt)"  # DOCX输出为文本
+            file_filter = "Word files (*.docx);;Text files (*.txt)"  # DOCX保留格式、表格和页眉页脚，也可输出为文本
         elif file_type == "epub":
-            file_filter = "Text files (*.txt)"  # EPUB输出为文本
+            file_filter = "EPUB files (*.epub);;Text files (*.txt)"  # EPUB保留原有结构，也可输出为文本
         elif file_type == "srt":
             file_filter = "Subtitle files (*.srt)"
         
@@ -502,8 +861,18 @@ class MainWindow(QMainWindow):
     
     def save_settings(self):
         self.settings.setValue("ollama_host", self.ollama_host.text())
+        self.settings.setValue("keep_alive", self.keep_alive.text())
         self.settings.setValue("api_url", self.api_url.text())
         self.settings.setValue("api_key", self.api_key.text())
+        self.settings.setValue("max_workers", self.max_workers.value())
+        self.settings.setValue("request_timeout", self.request_timeout.value())
+        self.settings.setValue("use_cache", self.use_cache.isChecked())
+        self.settings.setValue("export_metrics", self.export_metrics.isChecked())
+        self.settings.setValue("requests_per_second", self.requests_per_second.value())
+        self.settings.setValue("tokens_per_minute", self.tokens_per_minute.value())
+        self.settings.setValue("max_retries", self.max_retries.value())
+        self.settings.setValue("hedge_percentile", self.hedge_percentile.value())
+        self.configure_http()
         
         # 保存语言设置
         lang_index = self.app_lang_combo.currentIndex()
@@ -519,6 +888,21 @@ class MainWindow(QMainWindow):
         # 提示用户需要重启应用程序以应用语言更改
         QMessageBox.information(self, "Info", "Language settings saved. Please restart the application to apply changes.")
     
+    def configure_http(self):
+        """根据当前设置配置共享的HTTP连接池"""
+        configure_http_client(
+            read_timeout=self.request_timeout.value(),
+            pool_maxsize=max(DEFAULT_POOL_MAXSIZE, self.max_workers.value())
+        )
+    
+    def clear_cache(self):
+        cache = TranslationCache()
+        try:
+            cache.clear()
+        finally:
+            cache.close()
+        self.log(self.tr("cache_cleared"))
+    
     def log(self, message):
         self.log_text.append(message)
     
@@ -536,6 +920,9 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, self.tr("warning"), self.tr("select_output"))
             return
         
+        # 以文件内容识别的类型为准
+        file_type = detect_file_type(input_file) or file_type
+        
         # 获取模型设置
         model_type = "ollama" if self.tr("ollama_local") in self.model_type.currentText() else "api"
         
@@ -561,38 +948,241 @@ class MainWindow(QMainWindow):
         
         # 获取字幕选项
         merge_bilingual = False
-        if file_type == "srt":
+        if get_file_format(file_type).kind == "subtitle":
             merge_bilingual = self.merge_bilingual.isChecked()
+        batch_size = self.subtitle_batch_size.value()
         
         # 在翻译期间禁用UI
-        self.translate_button.setEnabled(False)
+        self.set_translation_running(True)
         self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("%p%")
+        self.chunk_progress_bar.setValue(0)
+        self.stream_stats_label.clear()
         
         # 创建并启动翻译线程
         self.translation_thread = TranslationThread(
             input_file, output_file, file_type, model_type, model_name,
-            api_url, api_key, merge_bilingual, source_lang, target_lang
+            api_url, api_key, merge_bilingual, source_lang, target_lang,
+            self.max_workers.value(), self.use_cache.isChecked(), batch_size,
+            self.stream_responses.isChecked(), self.requests_per_second.value(),
+            self.tokens_per_minute.value(), self.max_retries.value(), self.export_metrics.isChecked(),
+            self.ollama_host.text(), self.keep_alive.text(), self.hedge_percentile.value() / 100,
+            self.calibrate_chunk_size.isChecked()
         )
         
         self.translation_thread.progress_signal.connect(self.update_progress)
         self.translation_thread.result_signal.connect(self.translation_completed)
         self.translation_thread.error_signal.connect(self.translation_error)
+        self.translation_thread.cache_stats_signal.connect(self.log_cache_stats)
+        self.translation_thread.resume_signal.connect(self.log_resume)
+        self.translation_thread.stream_signal.connect(self.update_stream_stats)
+        self.translation_thread.telemetry_signal.connect(self.update_telemetry)
+        self.translation_thread.cancelled_signal.connect(self.translation_cancelled)
+        self.translation_thread.retry_signal.connect(self.log_retry)
+        self.translation_thread.calibration_signal.connect(self.log_calibration)
+        self.translation_thread.calibrated_signal.connect(
+            lambda chunk_size: self.log(self.tr("calibration_done").format(chunk_size))
+        )
         
         self.log(self.tr("starting_translation").format(input_file))
         self.translation_thread.start()
     
+    def job_options(self):
+        """当前界面设置下的翻译任务选项"""
+        model_type = "ollama" if self.tr("ollama_local") in self.model_type.currentText() else "api"
+        return {
+            "model_type": model_type,
+            "model_name": self.ollama_model_combo.currentText() if model_type == "ollama" else None,
+            "api_url": self.api_url.text() if model_type == "api" else None,
+            "merge_bilingual": self.merge_bilingual.isChecked(),
+            "source_lang": self.source_lang.currentText(),
+            "target_lang": self.target_lang.currentText(),
+            "max_workers": self.max_workers.value(),
+            "use_cache": self.use_cache.isChecked(),
+            "batch_size": self.subtitle_batch_size.value(),
+            "stream": self.stream_responses.isChecked(),
+            "export_metrics": self.export_metrics.isChecked(),
+            "ollama_host": self.ollama_host.text(),
+            "keep_alive": self.keep_alive.text(),
+            "hedge_percentile": self.hedge_percentile.value() / 100
+        }
+    
+    def add_queue_paths(self, paths, pattern=None, recursive=False):
+        options = self.job_options()
+        if options["model_type"] == "ollama" and not options["model_name"]:
+            QMessageBox.warning(self, self.tr("warning"), self.tr("no_models"))
+            return
+        try:
+            jobs = self.job_queue.add_paths(paths, options, pattern, recursive, self.output_folder.text() or None)
+        except ValueError as e:
+            # 多个文件会写入同一个输出文件
+            QMessageBox.warning(self, self.tr("warning"), str(e))
+            return
+        self.settings.setValue("queue_pattern", self.file_pattern.text())
+        self.settings.setValue("queue_output_folder", self.output_folder.text())
+        self.log(self.tr("queue_added").format(len(jobs)))
+        self.refresh_queue_table()
+    
+    def add_queue_files(self):
+        file_paths, _ = QFileDialog.getOpenFileNames(self, self.tr("add_files"), "", "All files (*)")
+        if file_paths:
+            self.add_queue_paths(file_paths)
+    
+    def add_queue_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, self.tr("add_folder"))
+        if folder:
+            self.add_queue_paths([folder], self.file_pattern.text().strip() or None, self.recursive.isChecked())
+    
+    def select_output_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, self.tr("output_folder"))
+        if folder:
+            self.output_folder.setText(folder)
+    
+    def refresh_queue_table(self):
+        jobs = self.job_queue.jobs
+        self.queue_table.setRowCount(len(jobs))
+        for row, job in enumerate(jobs):
+            values = [job.input_file, job.file_type, self.tr("status_" + job.status), f"{job.progress}%",
+                      job.output_file]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setData(Qt.UserRole, job.id)
+                if column == 2 and job.error:
+                    item.setToolTip(job.error)
+                self.queue_table.setItem(row, column, item)
+    
+    def queue_row(self, job_id):
+        for row in range(self.queue_table.rowCount()):
+            if self.queue_table.item(row, 0).data(Qt.UserRole) == job_id:
+                return row
+        return None
+    
+    def update_job_status(self, job_id):
+        job = self.job_queue.get(job_id)
+        if job is not None and job.error:
+            self.log(self.tr("queue_job_failed").format(os.path.basename(job.input_file), job.error))
+        self.refresh_queue_table()
+    
+    def update_job_progress(self, job_id, value):
+        row = self.queue_row(job_id)
+        if row is not None:
+            self.queue_table.item(row, 3).setText(f"{value}%")
+    
+    def start_queue(self):
+        self.start_queue_button.setEnabled(False)
+        self.stop_queue_button.setEnabled(True)
+        self.queue_thread = QueueThread(
+            self.job_queue, self.max_workers.value(), self.parallel_jobs.value(),
+            self.requests_per_second.value(), self.tokens_per_minute.value(), self.max_retries.value(),
+            self.api_key.text()
+        )
+        self.settings.setValue("parallel_jobs", self.parallel_jobs.value())
+        self.queue_thread.status_signal.connect(self.update_job_status)
+        self.queue_thread.progress_signal.connect(self.update_job_progress)
+        self.queue_thread.retry_signal.connect(self.log_retry)
+        self.queue_thread.finished.connect(self.queue_finished)
+        self.queue_thread.start()
+    
+    def stop_queue(self):
+        self.stop_queue_button.setEnabled(False)
+        if self.queue_thread is not None:
+            self.queue_thread.cancel()
+    
+    def queue_finished(self):
+        statuses = [job.status for job in self.job_queue.jobs]
+        self.log(self.tr("queue_finished").format(
+            statuses.count("done"), statuses.count("failed"), statuses.count("cancelled")
+        ))
+        self.start_queue_button.setEnabled(True)
+        self.stop_queue_button.setEnabled(False)
+        self.refresh_queue_table()
+    
+    def remove_selected_jobs(self):
+        rows = {index.row() for index in self.queue_table.selectedIndexes()}
+        for row in rows:
+            self.job_queue.remove(self.queue_table.item(row, 0).data(Qt.UserRole))
+        self.refresh_queue_table()
+    
+    def clear_finished_jobs(self):
+        self.job_queue.clear_finished()
+        self.refresh_queue_table()
+    
+    def retry_failed_jobs(self):
+        self.job_queue.retry_failed()
+        self.refresh_queue_table()
+    
     def update_progress(self, value):
         self.progress_bar.setValue(value)
     
+    def update_stream_stats(self, ttft, tokens_per_sec, in_flight):
+        self.chunk_progress_bar.setValue(in_flight)
+        self.stream_stats_label.setText(self.tr("stream_stats").format(ttft, tokens_per_sec))
+    
+    def update_telemetry(self, summary):
+        # 用吞吐量、剩余时间和缓存命中替换单纯的百分比
+        eta = summary["eta_seconds"]
+        eta_text = "--:--" if eta is None else f"{int(eta) // 60}:{int(eta) % 60:02d}"
+        lookups = summary["cache_hits"] + summary["cache_misses"]
+        self.progress_bar.setFormat(self.tr("progress_summary").format(
+            summary["chunks_per_sec"], summary["tokens_per_sec"], eta_text, summary["cache_hits"], lookups
+        ))
+    
+    def set_translation_running(self, running):
+        """翻译进行中时只允许暂停和取消"""
+        self.translate_button.setEnabled(not running)
+        self.cancel_button.setEnabled(running)
+        self.pause_button.setEnabled(running)
+        self.pause_button.setText(self.tr("pause"))
+    
+    def toggle_pause(self):
+        # 暂停时中止进行中的请求，已完成的片段保留在内存和日志中
+        if self.translation_thread.paused:
+            self.translation_thread.resume()
+            self.pause_button.setText(self.tr("pause"))
+            self.log(self.tr("translation_resumed"))
+        else:
+            self.translation_thread.pause()
+            self.pause_button.setText(self.tr("resume"))
+            self.log(self.tr("translation_paused"))
+    
+    def cancel_translation(self):
+        self.cancel_button.setEnabled(False)
+        self.pause_button.setEnabled(False)
+        self.translation_thread.cancel()
+    
+    def translation_cancelled(self):
+        self.log(self.tr("translation_cancelled"))
+        self.set_translation_running(False)
+    
+    def log_retry(self, attempt, delay, error_message):
+        self.log(self.tr("retrying").format(attempt, delay, error_message))
+    
+    def log_calibration(self, measurement):
+        if measurement["error"]:
+            self.log(self.tr("calibration_failed_size").format(**measurement))
+        else:
+            self.log(self.tr("calibration_measurement").format(**measurement))
+    
+    def log_resume(self, count):
+        self.log(self.tr("resuming_job").format(count))
+    
+    def log_cache_stats(self, hits, misses):
+        self.log(self.tr("cache_stats").format(hits, misses))
+    
     def translation_completed(self, output_file):
         message = self.tr("translation_completed").format(output_file)
         self.log(message)
-        self.translate_button.setEnabled(True)
+        if self.export_metrics.isChecked():
+            self.log(self.tr("metrics_saved").format(", ".join(metrics_paths_for(output_file))))
+        hedging = self.translation_thread.job.hedging
+        if hedging is not None:
+            self.log(self.tr("hedge_stats").format(hedging.hedged, hedging.wins))
+        self.set_translation_running(False)
         QMessageBox.information(self, self.tr("success"), message)
     
     def translation_error(self, error_message):
         self.log(f"{self.tr('error')}: {error_message}")
-        self.translate_button.setEnabled(True)
+        self.set_translation_running(False)
         QMessageBox.critical(self, self.tr("error"), error_message)
 
 
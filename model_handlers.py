@@ -1,219 +1,870 @@
+import copy
 import json
-import requests
-from PyQt5.QtCore import pyqtSignal
+import re
+import threading
 import time
+from collections import UserList, deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from functools import partial
+from http_client import get_http_client, was_aborted, RequestAborted
+from translation_cache import make_cache_key
+from telemetry import current_chunk
+from chunking import (iter_chunks, context_window, chunk_token_budget, estimate_tokens, DEFAULT_CHUNK_TOKENS,
+                      OUTPUT_TOKEN_RATIO, PROMPT_OVERHEAD_TOKENS)
+from rate_limiter import (RequestGovernor, TransientError, TranslationCancelled, parse_retry_after,
+                          RETRY_STATUS_CODES, RETRYABLE_ERRORS)
+from host_pool import HostPool, parse_hosts, get_host_pool
+from hedging import current_attempt
+from srt_stream import SubtitleCues
 
-def detect_ollama_models(host="http://localhost:11434"):
-    """Detect available Ollama models."""
-    try:
-        response = requests.get(f"{host}/api/tags")
-        if response.status_code == 200:
-            data = response.json()
-            models = [model["name"] for model in data.get("models", [])]
-            return models
-        else:
-            raise Exception(f"Failed to get models: {response.status_code}")
-    except Exception as e:
-        raise Exception(f"Error detecting Ollama models: {str(e)}")
+# Address of a local Ollama server
+OLLAMA_DEFAULT_HOST = "http://localhost:11434"
+
+# Number of chunk requests kept in flight at once
+DEFAULT_MAX_WORKERS = 4
+
+# Estimated tokens per chunk for plain text content when the model is unknown
+DEFAULT_CHUNK_SIZE = DEFAULT_CHUNK_TOKENS
+
+# Ollama truncates prompts to this context unless num_ctx is set explicitly
+OLLAMA_DEFAULT_NUM_CTX = 2048
+# num_ctx is rounded up to a multiple of this; Ollama reloads a model whenever num_ctx changes
+OLLAMA_NUM_CTX_STEP = 1024
+
+# How long Ollama keeps the model loaded after the last request; -1 keeps it until it is unloaded
+OLLAMA_DEFAULT_KEEP_ALIVE = "30m"
+
+# Subtitle cues packed into one request, and the character budget of a batch
+DEFAULT_SUBTITLE_BATCH_SIZE = 10
+DEFAULT_SUBTITLE_BATCH_CHARS = 2000
+
+# Numbered markers used to pack several subtitle cues into one request
+BATCH_MARKER_PATTERN = re.compile(r"^[ \t]*\[(\d+)\][ \t]?", re.MULTILINE)
+BATCH_INSTRUCTIONS = (
+    " The text consists of numbered segments, each starting with a marker like [1] on a new line."
+    " Translate every segment separately and keep each marker exactly once, in the same order."
+)
+
+# Inline markup of EPUB and DOCX units is sent as placeholder tags; see inline_tags
+TAG_INSTRUCTIONS = " Keep tags such as <g1>, </g1> and <x2/> unchanged, around the words they mark."
+
+# Seconds between checks for a cancelled job while waiting on requests
+CANCEL_POLL_INTERVAL = 0.1
+
+# A streamed translation is cut off once it is this many times longer than its input
+MAX_OUTPUT_RATIO = 4
+MIN_OUTPUT_TOKENS = 64
+
+# Bump whenever the prompts change so cached translations are not reused
+PROMPT_VERSION = 2
+
+def _list_ollama_models(host):
+    response = get_http_client().get(f"{host}/api/tags")
+    if response.status_code == 200:
+        data = response.json()
+        return [model["name"] for model in data.get("models", [])]
+    raise Exception(f"Failed to get models: {response.status_code}")
+
+def parse_keep_alive(value):
+    """Turn a keep_alive setting such as "30m", "600" or "-1" into what Ollama accepts."""
+    value = str(value).strip()
+    # Ollama reads bare numbers as seconds but needs a unit on durations given as strings
+    return int(value) if re.fullmatch(r"-?\d+", value) else value or OLLAMA_DEFAULT_KEEP_ALIVE
+
+def ollama_num_ctx(chunk_size, model_name=None):
+    """Return the context to load a model with for chunks of chunk_size estimated tokens.
+
+    It holds the system prompt, a chunk and its translation, rounded up so
+    that every job with a similar chunk size shares one loaded model.
+    """
+    tokens = PROMPT_OVERHEAD_TOKENS + int(chunk_size * (1 + OUTPUT_TOKEN_RATIO))
+    num_ctx = -(-tokens // OLLAMA_NUM_CTX_STEP) * OLLAMA_NUM_CTX_STEP
+    return min(num_ctx, max(OLLAMA_NUM_CTX_STEP, context_window(model_name)))
+
+def ollama_system_prompt(source_lang, target_lang, numbered=False, tagged=False):
+    """Return the system prompt, built once per translator so every request sends the same bytes.
+
+    tagged=True asks the model to keep the placeholder tags of EPUB and DOCX units.
+    """
+    system_prompt = f"Translate the following text from {source_lang} to {target_lang}. Preserve the original meaning and style."
+    if tagged:
+        system_prompt += TAG_INSTRUCTIONS
+    if numbered:
+        system_prompt += BATCH_INSTRUCTIONS
+    return system_prompt
+
+def _output_token_limit(text, num_ctx):
+    """Return num_predict for text: room for a long translation, within what is left of the context."""
+    input_tokens = estimate_tokens(text)
+    limit = min(input_tokens * MAX_OUTPUT_RATIO, num_ctx - PROMPT_OVERHEAD_TOKENS - input_tokens)
+    return max(MIN_OUTPUT_TOKENS, limit)
+
+def warm_up_ollama_model(model_name, host=OLLAMA_DEFAULT_HOST, keep_alive=OLLAMA_DEFAULT_KEEP_ALIVE, num_ctx=None):
+    """Load a model on every healthy host so the first chunks do not wait for it.
+
+    The model is loaded with the num_ctx translations will use, by default
+    the one for the model's calibrated chunk size, and kept for keep_alive.
+    Returns the hosts that loaded it; raises Exception if none did.
+    """
+    pool = host if isinstance(host, HostPool) else get_host_pool(host)
+    num_ctx = num_ctx or ollama_num_ctx(tuned_chunk_size_for("ollama", model_name), model_name)
+    loaded = []
+    errors = []
+    for url in pool.healthy_hosts() or pool.hosts:
+        try:
+            # A chat request without messages only loads the model
+            response = get_http_client().post(f"{url}/api/chat", json={
+                "model": model_name,
+                "messages": [],
+                "keep_alive": parse_keep_alive(keep_alive),
+                "options": {"num_ctx": num_ctx}
+            })
+            _check_response(response)
+            response.close()
+            loaded.append(url)
+        except Exception as e:
+            errors.append(f"{url}: {str(e)}")
+    if not loaded:
+        raise Exception(f"Failed to load {model_name}: {'; '.join(errors)}")
+    return loaded
+
+def detect_ollama_models(host=OLLAMA_DEFAULT_HOST):
+    """Detect available Ollama models.
+    
+    host may list several hosts separated by commas; only models available
+    on every reachable host are returned.
+    """
+    models = None
+    errors = []
+    for url in parse_hosts(host):
+        try:
+            host_models = _list_ollama_models(url)
+        except Exception as e:
+            errors.append(f"{url}: {str(e)}")
+            continue
+        models = host_models if models is None else [model for model in models if model in host_models]
+    if models is None:
+        raise Exception(f"Error detecting Ollama models: {'; '.join(errors) or 'no hosts configured'}")
+    return models
+
+class StreamMonitor:
+    """Live statistics for streamed generations, shared by all worker threads.
+    
+    Tracks time-to-first-token, tokens per second and how far the requests
+    in flight have got. cancel() aborts every streamed request immediately
+    by closing its connection.
+    """
+    
+    def __init__(self, on_update=None, update_interval=0.25):
+        self.on_update = on_update
+        self.update_interval = update_interval
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._active = {}  # id -> [response, generated tokens, expected tokens]
+        self._last_update = 0
+        self.first_token_times = []
+        self.generated_tokens = 0
+        self.generation_time = 0
+    
+    def cancel(self):
+        self.cancelled.set()
+        with self._lock:
+            responses = [entry[0] for entry in self._active.values()]
+        for response in responses:
+            # Closing the connection unblocks the reader thread at once
+            response.close()
+    
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise TranslationCancelled("Translation cancelled")
+    
+    def begin(self, response, expected_tokens):
+        with self._lock:
+            self._active[id(response)] = [response, 0, expected_tokens]
+        if self.cancelled.is_set():
+            response.close()
+    
+    def first_token(self, elapsed):
+        with self._lock:
+            self.first_token_times.append(elapsed)
+    
+    def token(self, response):
+        with self._lock:
+            self._active[id(response)][1] += 1
+        self._maybe_update()
+    
+    def end(self, response, tokens, duration):
+        with self._lock:
+            self._active.pop(id(response), None)
+            self.generated_tokens += tokens
+            self.generation_time += duration
+        self._maybe_update(force=True)
+    
+    def stats(self):
+        """Return average time-to-first-token, tokens/sec and in-flight completion in percent."""
+        with self._lock:
+            ttft = sum(self.first_token_times) / len(self.first_token_times) if self.first_token_times else 0.0
+            tokens_per_sec = self.generated_tokens / self.generation_time if self.generation_time > 0 else 0.0
+            generated = sum(entry[1] for entry in self._active.values())
+            expected = sum(entry[2] for entry in self._active.values())
+        in_flight = min(100, int(generated / expected * 100)) if expected else 0
+        return ttft, tokens_per_sec, in_flight
+    
+    def _maybe_update(self, force=False):
+        if self.on_update is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_update < self.update_interval:
+            return
+        self._last_update = now
+        self.on_update(*self.stats())
 
-def translate_with_ollama(content, model_name, source_lang="auto", target_lang="en", progress_signal=None):
-    """Translate content using Ollama model."""
+def _read_ollama_stream(response, text, monitor, chunk=None):
+    """Collect a streamed /api/chat response, enforcing the output limit."""
+    input_tokens = estimate_tokens(text)
+    max_tokens = max(MIN_OUTPUT_TOKENS, input_tokens * MAX_OUTPUT_RATIO)
+    started = time.monotonic()
+    first_token_at = None
+    parts = []
+    
+    if monitor is not None:
+        monitor.begin(response, input_tokens)
     try:
-        host = "http://localhost:11434"
-        
-        # For subtitle files, we need to handle them differently
-        if isinstance(content, list) or hasattr(content, '__iter__') and not isinstance(content, (str, bytes, dict)):
-            # This is likely a subtitle file
-            translated_content = content.__class__()  # Create a new instance of the same class
-            
-            total_items = len(content)
-            for i, item in enumerate(content):
-                # Create a system prompt for translation
-                system_prompt = f"Translate the following text from {source_lang} to {target_lang}. Preserve the original meaning and style."
-                
-                # Prepare the prompt with the subtitle text
-                prompt = f"Translate: {item.text}"
-                
-                # Make the API call
-                response = requests.post(
-                    f"{host}/api/generate",
-                    json={
-                        "model": model_name,
-                        "prompt": prompt,
-                        "system": system_prompt,
-                        "stream": False
-                    }
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    translated_text = result.get("response", "").strip()
-                    
-                    # Create a new subtitle item with the translated text
-                    new_item = item.__class__(
-                        index=item.index,
-                        start=item.start,
-                        end=item.end,
-                        text=translated_text
-                    )
-                    translated_content.append(new_item)
-                else:
-                    raise Exception(f"Translation failed: {response.status_code}")
-                
-                # Update progress
-                if progress_signal:
-                    progress_value = int((i + 1) / total_items * 100)
-                    progress_signal.emit(progress_value)
-                
-                # Add a small delay to avoid overwhelming the API
-                time.sleep(0.1)
+        # Each NDJSON line carries one generated token
+        for line in response.iter_lines():
+            if monitor is not None:
+                monitor.check_cancelled()
+            if chunk is not None:
+                chunk.add_received(len(line) + 1)
+            if not line:
+                continue
             
-            return translated_content
-        else:
-            # This is a text file
-            # Split the content into chunks to avoid token limits
-            chunks = split_text_into_chunks(content, 1000)  # 1000 characters per chunk
-            translated_chunks = []
+            data = json.loads(line)
+            if "error" in data:
+                raise Exception(f"Translation failed: {data['error']}")
             
-            total_chunks = len(chunks)
-            for i, chunk in enumerate(chunks):
-                # Create a system prompt for translation
-                system_prompt = f"Translate the following text from {source_lang} to {target_lang}. Preserve the original meaning and style."
-                
-                # Make the API call
-                response = requests.post(
-                    f"{host}/api/generate",
-                    json={
-                        "model": model_name,
-                        "prompt": f"Translate: {chunk}",
-                        "system": system_prompt,
-                        "stream": False
-                    }
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    translated_chunk = result.get("response", "").strip()
-                    translated_chunks.append(translated_chunk)
-                else:
-                    raise Exception(f"Translation failed: {response.status_code}")
-                
-                # Update progress
-                if progress_signal:
-                    progress_value = int((i + 1) / total_chunks * 100)
-                    progress_signal.emit(progress_value)
-                
-                # Add a small delay to avoid overwhelming the API
-                time.sleep(0.1)
+            piece = data.get("message", {}).get("content", "")
+            if piece:
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                    if monitor is not None:
+                        monitor.first_token(first_token_at - started)
+                parts.append(piece)
+                if monitor is not None:
+                    monitor.token(response)
+                if len(parts) > max_tokens:
+                    raise Exception(f"Translation exceeded the maximum output length of {max_tokens} tokens")
             
-            return "\n".join(translated_chunks)
+            if data.get("done"):
+                if chunk is not None:
+                    chunk.generation(data)
+                _check_done_reason(data)
+                break
+        
+        if monitor is not None:
+            # The stream also ends early when cancel() closed the connection
+            monitor.check_cancelled()
     except Exception as e:
-        raise Exception(f"Error translating with Ollama: {str(e)}")
+        if monitor is not None:
+            # A connection closed by cancel() surfaces as an arbitrary read error
+            monitor.check_cancelled()
+        if not isinstance(e, RequestAborted) and was_aborted(response):
+            raise RequestAborted(f"Request aborted: {str(e)}") from e
+        raise
+    finally:
+        response.close()
+        if monitor is not None:
+            duration = time.monotonic() - first_token_at if first_token_at is not None else 0
+            monitor.end(response, len(parts), duration)
+    
+    return "".join(parts)
 
-def translate_with_api(content, api_url, api_key, source_lang="auto", target_lang="en", progress_signal=None):
-    """Translate content using an external API."""
+def _check_response(response):
+    """Raise for a failed response; overload and server errors are retryable."""
+    if response.status_code == 200:
+        return
+    
+    response.close()
+    message = f"Translation failed: {response.status_code}"
+    if response.status_code in RETRY_STATUS_CODES:
+        raise TransientError(message, parse_retry_after(response.headers.get("Retry-After")))
+    raise Exception(message)
+
+def _check_done_reason(data):
+    """Raise if Ollama stopped generating at num_predict rather than at the end of the translation."""
+    if data.get("done_reason") == "length":
+        raise Exception(f"Translation was cut off at {data.get('eval_count', 0)} tokens")
+
+def _ollama_translate_text(text, model_name, host, system_prompt, keep_alive, num_ctx, stream=False,
+                           monitor=None):
+    """Translate a single piece of text with an Ollama model.
+    
+    host is a HostPool; the request goes to its least loaded healthy host,
+    avoiding the hosts already used by other copies of a hedged request.
+    With stream=True the response is read token by token; see StreamMonitor.
+    """
+    if monitor is not None:
+        monitor.check_cancelled()
+    
+    attempt = current_attempt()
+    url = host.acquire(exclude=attempt.hosts if attempt is not None else ())
+    if attempt is not None:
+        attempt.hosts.add(url)
+    started = time.monotonic()
     try:
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}"
-        }
+        translated_text = _ollama_chat(text, model_name, url, system_prompt, keep_alive, num_ctx, stream, monitor)
+    except RETRYABLE_ERRORS:
+        host.release(url, failed=True)
+        raise
+    except BaseException:
+        host.release(url)
+        raise
+    host.release(url, (time.monotonic() - started) / max(1, estimate_tokens(text)))
+    return translated_text
+
+def _ollama_chat(text, model_name, host, system_prompt, keep_alive, num_ctx, stream, monitor):
+    """Send one /api/chat request to a single Ollama host.
+    
+    The system message comes first and never changes within a job, so the
+    server can reuse its evaluated prefix. num_ctx is fixed per job as well,
+    since changing it reloads the model.
+    """
+    chunk = current_chunk()
+    if chunk is not None:
+        chunk.attempt_started()
+    
+    # Make the API call
+    response = get_http_client().post(
+        f"{host}/api/chat",
+        json={
+            "model": model_name,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Translate: {text}"}
+            ],
+            "stream": stream,
+            "keep_alive": keep_alive,
+            "options": {"num_ctx": num_ctx, "num_predict": _output_token_limit(text, num_ctx)}
+        },
+        stream=stream
+    )
+    if chunk is not None:
+        chunk.response_received(response)
+    _check_response(response)
+    
+    if stream:
+        return _read_ollama_stream(response, text, monitor, chunk).strip()
+    
+    result = response.json()
+    if chunk is not None:
+        chunk.add_received(len(response.content))
+        chunk.generation(result)
+    _check_done_reason(result)
+    return result.get("message", {}).get("content", "").strip()
+
+def _api_translate_text(text, api_url, headers, source_lang, target_lang):
+    """Translate a single piece of text with an external API."""
+    # Prepare the request data
+    data = {
+        "text": text,
+        "source_language": source_lang,
+        "target_language": target_lang
+    }
+    
+    # Make the API call
+    chunk = current_chunk()
+    if chunk is not None:
+        chunk.attempt_started()
+    response = get_http_client().post(api_url, json=data, headers=headers)
+    if chunk is not None:
+        chunk.response_received(response)
+    _check_response(response)
+    
+    result = response.json()
+    if chunk is not None:
+        chunk.add_received(len(response.content))
+    return result.get("translated_text", "").strip()
+
+def _request_tokens(text):
+    """Estimate the tokens a request for text costs: its prompt and the expected answer."""
+    return int(estimate_tokens(text) * (1 + OUTPUT_TOKEN_RATIO))
+
+def _hedged_translate(text, translate_fn, hedging, governor=None):
+    """Send a duplicate request for text if it runs slow, keeping the first answer; see HedgePolicy.
+
+    The duplicate goes through the governor, if given, so it counts toward
+    the same rate and concurrency limits as every other request.
+    """
+    return hedging.call(translate_fn, text, governor, _request_tokens(text))
+
+def _governed_translate(text, translate_fn, governor):
+    """Send text through the governor's rate limit, concurrency limit and retries."""
+    return governor.call(translate_fn, text, tokens=_request_tokens(text))
+
+def _cached_translate(text, translate_fn, cache, backend, model, source_lang, target_lang, validate=None):
+    """Look text up in the translation cache before calling translate_fn.
+    
+    With validate(text, translated_text), only translations it accepts are
+    stored or reused, so a bad response is asked for again instead.
+    """
+    key = make_cache_key(text, backend, model, source_lang, target_lang, PROMPT_VERSION)
+    translated_text = cache.get(key)
+    if translated_text is not None and (validate is None or validate(text, translated_text)):
+        return translated_text
+    translated_text = translate_fn(text)
+    if validate is None or validate(text, translated_text):
+        cache.put(key, translated_text)
+    return translated_text
+
+def _scoped_translate(text, translate_fn, scope):
+    """Send the requests for text in a RequestScope, sending them again if a pause aborted them."""
+    while True:
+        with scope.activate():
+            try:
+                return translate_fn(text)
+            except RequestAborted:
+                if scope.closed:
+                    raise TranslationCancelled("Translation cancelled")
+                # Paused: the new request waits for resume() before it is sent
+
+def _measured_translate(text, translate_fn, telemetry):
+    """Record the queue time, latency, tokens and bytes of one chunk in telemetry."""
+    chunk = telemetry.begin()
+    ok = False
+    try:
+        translated_text = translate_fn(text)
+        ok = True
+        return translated_text
+    finally:
+        telemetry.end(chunk, ok)
+
+def make_ollama_translator(model_name, source_lang="auto", target_lang="en", cache=None, numbered=False,
+                           stream=False, monitor=None, governor=None, host=OLLAMA_DEFAULT_HOST, telemetry=None,
+                           scope=None, keep_alive=OLLAMA_DEFAULT_KEEP_ALIVE, num_ctx=None, hedging=None,
+                           tagged=False):
+    """Return a function translating a single text with an Ollama model.
+    
+    With numbered=True the model is told to keep batch markers intact, and
+    responses that lost them are not cached. With tagged=True it is told to
+    keep the placeholder tags of EPUB and DOCX units. With
+    stream=True responses are streamed and reported to the StreamMonitor.
+    host may be a HostPool or a host setting listing one or more hosts.
+    The model stays loaded for keep_alive after each request, with num_ctx
+    sized for the model's default chunk size unless given. Slow requests
+    are duplicated to another host under the HedgePolicy, if given.
+    Requests that miss the cache go through the RequestGovernor, if given.
+    Requests are sent in the RequestScope, if given, so they can be paused
+    and aborted. Every call is measured in the JobTelemetry, if given.
+    """
+    if not isinstance(host, HostPool):
+        host = get_host_pool(host)
+    
+    translate_fn = partial(
+        _ollama_translate_text,
+        model_name=model_name,
+        host=host,
+        system_prompt=ollama_system_prompt(source_lang, target_lang, numbered, tagged),
+        keep_alive=parse_keep_alive(keep_alive),
+        num_ctx=num_ctx or ollama_num_ctx(tuned_chunk_size_for("ollama", model_name), model_name),
+        stream=stream,
+        monitor=monitor
+    )
+    if hedging is not None:
+        translate_fn = partial(_hedged_translate, translate_fn=translate_fn, hedging=hedging,
+                               governor=governor)
+    if governor is not None:
+        translate_fn = partial(_governed_translate, translate_fn=translate_fn, governor=governor)
+    if cache is not None:
+        translate_fn = partial(
+            _cached_translate,
+            translate_fn=translate_fn,
+            cache=cache,
+            backend="ollama-numbered" if numbered else "ollama",
+            model=model_name,
+            source_lang=source_lang,
+            target_lang=target_lang,
+            validate=is_complete_batch if numbered else None
+        )
+    if scope is not None:
+        translate_fn = partial(_scoped_translate, translate_fn=translate_fn, scope=scope)
+    if telemetry is not None:
+        translate_fn = partial(_measured_translate, translate_fn=translate_fn, telemetry=telemetry)
+    return translate_fn
+
+def make_api_translator(api_url, api_key, source_lang="auto", target_lang="en", cache=None, numbered=False,
+                        governor=None, telemetry=None, scope=None, hedging=None):
+    """Return a function translating a single text with an external API.
+    
+    The generic API has no prompt, so numbered only separates cache entries
+    and keeps responses that do not split into the batch's texts out of them.
+    Slow requests are sent again on a new connection under the HedgePolicy,
+    if given, which reaches another replica behind a load balancer.
+    Requests that miss the cache go through the RequestGovernor, if given.
+    Requests are sent in the RequestScope, if given, so they can be paused
+    and aborted. Every call is measured in the JobTelemetry, if given.
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+    
+    translate_fn = partial(
+        _api_translate_text,
+        api_url=api_url,
+        headers=headers,
+        source_lang=source_lang,
+        target_lang=target_lang
+    )
+    if hedging is not None:
+        translate_fn = partial(_hedged_translate, translate_fn=translate_fn, hedging=hedging,
+                               governor=governor)
+    if governor is not None:
+        translate_fn = partial(_governed_translate, translate_fn=translate_fn, governor=governor)
+    if cache is not None:
+        translate_fn = partial(
+            _cached_translate,
+            translate_fn=translate_fn,
+            cache=cache,
+            backend="api-numbered" if numbered else "api",
+            model=api_url,
+            source_lang=source_lang,
+            target_lang=target_lang,
+            validate=is_complete_batch if numbered else None
+        )
+    if scope is not None:
+        translate_fn = partial(_scoped_translate, translate_fn=translate_fn, scope=scope)
+    if telemetry is not None:
+        translate_fn = partial(_measured_translate, translate_fn=translate_fn, telemetry=telemetry)
+    return translate_fn
+
+def report_progress(progress, value):
+    """Report progress to a Qt-style signal (anything with emit) or a plain callable."""
+    if progress:
+        getattr(progress, "emit", progress)(value)
+
+def _raise_first_failure(pending):
+    """Re-raise the exception of any finished request in the pending window."""
+    for _, _, value in pending:
+        if isinstance(value, Future) and value.done() and value.exception() is not None:
+            raise value.exception()
+
+def iter_translations(texts, translate_fn, max_workers=DEFAULT_MAX_WORKERS, max_pending=None, journal=None,
+                      cancel_event=None):
+    """Translate an iterable of texts concurrently, yielding results in input order.
+    
+    Up to ``max_workers`` requests are in flight at once, and at most
+    ``max_pending`` texts are read ahead of the oldest unfinished one, so a
+    lazy input is only consumed as fast as translations are delivered.
+    Identical texts within the read-ahead window share one request; repeats
+    further apart are left to the translation cache, so memory stays
+    bounded by the window however long the input is. The
+    first failure cancels all pending work and is re-raised once the requests
+    already in flight have returned.
+    
+    If a TranslationJournal is given, texts it already holds are skipped and
+    every new translation is recorded in it as it is yielded. Setting
+    cancel_event raises TranslationCancelled without waiting for requests in
+    flight.
+    """
+    max_workers = max(1, max_workers)
+    max_pending = max(max_pending or max_workers * 2, max_workers)
+    
+    pending = deque()  # (index, text, translation or Future)
+    shared = {}  # text -> [Future, entries in pending using it], to share work between repeated texts
+    
+    def finish_head():
+        index, text, value = pending.popleft()
+        if not isinstance(value, Future):
+            return value
         
-        # For subtitle files, we need to handle them differently
-        if isinstance(content, list) or hasattr(content, '__iter__') and not isinstance(content, (str, bytes, dict)):
-            # This is likely a subtitle file
-            translated_content = content.__class__()  # Create a new instance of the same class
-            
-            total_items = len(content)
-            for i, item in enumerate(content):
-                # Prepare the request data
-                data = {
-                    "text": item.text,
-                    "source_language": source_lang,
-                    "target_language": target_lang
-                }
-                
-                # Make the API call
-                response = requests.post(api_url, json=data, headers=headers)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    translated_text = result.get("translated_text", "").strip()
-                    
-                    # Create a new subtitle item with the translated text
-                    new_item = item.__class__(
-                        index=item.index,
-                        start=item.start,
-                        end=item.end,
-                        text=translated_text
-                    )
-                    translated_content.append(new_item)
-                else:
-                    raise Exception(f"Translation failed: {response.status_code}")
-                
-                # Update progress
-                if progress_signal:
-                    progress_value = int((i + 1) / total_items * 100)
-                    progress_signal.emit(progress_value)
-                
-                # Add a small delay to avoid overwhelming the API
-                time.sleep(0.1)
-            
-            return translated_content
-        else:
-            # This is a text file
-            # Split the content into chunks to avoid token limits
-            chunks = split_text_into_chunks(content, 1000)  # 1000 characters per chunk
-            translated_chunks = []
-            
-            total_chunks = len(chunks)
-            for i, chunk in enumerate(chunks):
-                # Prepare the request data
-                data = {
-                    "text": chunk,
-                    "source_language": source_lang,
-                    "target_language": target_lang
-                }
-                
-                # Make the API call
-                response = requests.post(api_url, json=data, headers=headers)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    translated_chunk = result.get("translated_text", "").strip()
-                    translated_chunks.append(translated_chunk)
-                else:
-                    raise Exception(f"Translation failed: {response.status_code}")
-                
-                # Update progress
-                if progress_signal:
-                    progress_value = int((i + 1) / total_chunks * 100)
-                    progress_signal.emit(progress_value)
-                
-                # Add a small delay to avoid overwhelming the API
-                time.sleep(0.1)
+        entry = shared[text]
+        entry[1] -= 1
+        if not entry[1]:
+            del shared[text]
+        translated_text = value.result()
+        if journal is not None:
+            journal.record(index, text, translated_text)
+        return translated_text
+    
+    def head_ready():
+        value = pending[0][2]
+        return not isinstance(value, Future) or value.done()
+    
+    def wait_for_progress():
+        # Wake up on any completion so a failure anywhere stops the job at once
+        waiting = {value for _, _, value in pending if isinstance(value, Future) and not value.done()}
+        timeout = CANCEL_POLL_INTERVAL if cancel_event is not None else None
+        wait(waiting, timeout=timeout, return_when=FIRST_COMPLETED)
+        check_cancelled()
+        _raise_first_failure(pending)
+    
+    def check_cancelled():
+        if cancel_event is not None and cancel_event.is_set():
+            raise TranslationCancelled("Translation cancelled")
+    
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        for index, text in enumerate(texts):
+            check_cancelled()
+            translated_text = journal.get(index, text) if journal is not None else None
+            if translated_text is not None:
+                pending.append((index, text, translated_text))
+            else:
+                entry = shared.get(text)
+                if entry is None:
+                    entry = shared[text] = [executor.submit(translate_fn, text), 0]
+                entry[1] += 1
+                pending.append((index, text, entry[0]))
             
-            return "\n".join(translated_chunks)
-    except Exception as e:
-        raise Exception(f"Error translating with API: {str(e)}")
+            # Hand out finished results, and block while the window is full
+            while pending and (len(pending) >= max_pending or head_ready()):
+                if not head_ready():
+                    wait_for_progress()
+                    continue
+                _raise_first_failure(pending)
+                yield finish_head()
+        
+        while pending:
+            if not head_ready():
+                wait_for_progress()
+                continue
+            yield finish_head()
+    finally:
+        # Requests abandoned by a cancel finish in the background and are discarded
+        cancelled = cancel_event is not None and cancel_event.is_set()
+        executor.shutdown(wait=not cancelled, cancel_futures=True)
 
-def split_text_into_chunks(text, chunk_size=1000):
-    """Split text into chunks of approximately chunk_size characters."""
-    chunks = []
-    current_chunk = ""
+def translate_texts(texts, translate_fn, progress_signal=None, max_workers=DEFAULT_MAX_WORKERS, journal=None,
+                    cancel_event=None):
+    """Translate a list of texts concurrently and return the results in input order.
     
-    # Split by paragraphs first
-    paragraphs = text.split("\n")
+    Progress is reported as each text is delivered. See iter_translations.
+    """
+    total = len(texts)
+    results = []
+    for translated_text in iter_translations(texts, translate_fn, max_workers, journal=journal,
+                                             cancel_event=cancel_event):
+        results.append(translated_text)
+        
+        # Update progress
+        report_progress(progress_signal, int(len(results) / total * 100))
     
-    for paragraph in paragraphs:
-        # If adding this paragraph would exceed chunk size, save current chunk and start a new one
-        if len(current_chunk) + len(paragraph) > chunk_size and current_chunk:
-            chunks.append(current_chunk)
-            current_chunk = paragraph + "\n"
-        else:
-            current_chunk += paragraph + "\n"
+    return results
+
+def _group_subtitle_texts(texts, batch_size, max_chars):
+    """Pack consecutive cue texts into batches bounded by count and size."""
+    batches = []
+    batch = []
+    batch_chars = 0
+    for text in texts:
+        if batch and (len(batch) >= batch_size or batch_chars + len(text) > max_chars):
+            batches.append(batch)
+            batch = []
+            batch_chars = 0
+        batch.append(text)
+        batch_chars += len(text)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def format_batch(texts):
+    """Join cue texts into one request, each prefixed with a numbered marker."""
+    return "\n".join(f"[{number}] {text}" for number, text in enumerate(texts, 1))
+
+def parse_batch(response, count):
+    """Split a batched response back into count texts, or return None on a mismatch."""
+    parts = BATCH_MARKER_PATTERN.split(response)
+    # parts = [preamble, "1", text, "2", text, ...]
+    numbers = parts[1::2]
+    if numbers != [str(number) for number in range(1, count + 1)]:
+        return None
+    return [text.strip() for text in parts[2::2]]
+
+def is_complete_batch(batch_text, response):
+    """Return whether a response splits into as many texts as the numbered batch it answers."""
+    return parse_batch(response, len(BATCH_MARKER_PATTERN.findall(batch_text))) is not None
+
+def _translate_batch(texts, batch_fn, single_fn):
+    """Translate a batch of cue texts, halving the batch whenever markers do not line up."""
+    if len(texts) == 1:
+        return [single_fn(texts[0])]
+    
+    translated_texts = parse_batch(batch_fn(format_batch(texts)), len(texts))
+    if translated_texts is not None:
+        return translated_texts
+    
+    # Fall back to smaller batches
+    middle = len(texts) // 2
+    return _translate_batch(texts[:middle], batch_fn, single_fn) + _translate_batch(texts[middle:], batch_fn, single_fn)
+
+def iter_subtitle_translations(texts, translate_fn, batch_fn=None, progress_signal=None,
+                               max_workers=DEFAULT_MAX_WORKERS, journal=None, batch_size=DEFAULT_SUBTITLE_BATCH_SIZE,
+                               max_batch_chars=DEFAULT_SUBTITLE_BATCH_CHARS, cancel_event=None):
+    """Translate subtitle cue texts, packing several cues into each request, and yield them in order.
+    
+    batch_fn translates a numbered batch as produced by format_batch. Without
+    it, or with a batch size of 1, every cue is sent on its own. Each
+    translation is yielded as soon as its request and all earlier ones are
+    done, so a writer can consume them while later requests are in flight.
+    """
+    if batch_fn is None or batch_size <= 1:
+        texts = list(texts)
+        total = len(texts)
+        for done, translated_text in enumerate(iter_translations(texts, translate_fn, max_workers, journal=journal,
+                                                                 cancel_event=cancel_event), 1):
+            report_progress(progress_signal, int(done / total * 100))
+            yield translated_text
+        return
+    
+    batches = _group_subtitle_texts(texts, batch_size, max_batch_chars)
+    batch_texts = [format_batch(batch) for batch in batches]
+    batches_by_text = dict(zip(batch_texts, batches))
+    
+    def translate_batch(batch_text):
+        return _translate_batch(batches_by_text[batch_text], batch_fn, translate_fn)
+    
+    total = len(batch_texts)
+    for done, translated_batch in enumerate(iter_translations(batch_texts, translate_batch, max_workers,
+                                                              journal=journal, cancel_event=cancel_event), 1):
+        report_progress(progress_signal, int(done / total * 100))
+        yield from translated_batch
+
+def translate_subtitle_texts(texts, translate_fn, batch_fn=None, progress_signal=None, max_workers=DEFAULT_MAX_WORKERS,
+                             journal=None, batch_size=DEFAULT_SUBTITLE_BATCH_SIZE,
+                             max_batch_chars=DEFAULT_SUBTITLE_BATCH_CHARS, cancel_event=None):
+    """Translate subtitle cue texts and return them as a list; see iter_subtitle_translations."""
+    return list(iter_subtitle_translations(texts, translate_fn, batch_fn, progress_signal, max_workers, journal,
+                                           batch_size, max_batch_chars, cancel_event))
+
+def _is_subtitle_content(content):
+    return isinstance(content, list) or hasattr(content, '__iter__') and not isinstance(content, (str, bytes, dict))
+
+def _translated_cue(cue, translated_text):
+    if isinstance(cue, str):
+        return translated_text
+    translated_cue = copy.copy(cue)
+    translated_cue.text = translated_text
+    return translated_cue
+
+def _translate_content(content, translate_fn, progress_signal, max_workers, journal, batch_fn, batch_size, chunk_size,
+                       cancel_event=None):
+    """Translate subtitle or plain text content with the given per-text function.
+
+    Subtitles are SubtitleCues, or any other sequence of cue texts or of
+    cues with a text attribute, such as a pysrt file; those are returned as
+    a list, or the same kind of list, of translated copies.
+    """
+    # For subtitle files, we need to handle them differently
+    if isinstance(content, SubtitleCues):
+        # Subtitle cues get their translated texts, sharing the original numbers and times
+        translated_texts = translate_subtitle_texts(
+            content.iter_texts(), translate_fn, batch_fn, progress_signal, max_workers, journal,
+            batch_size, cancel_event=cancel_event
+        )
+        return content.replace_texts(translated_texts)
+    elif _is_subtitle_content(content):
+        cues = list(content)
+        translated_texts = translate_subtitle_texts(
+            [cue if isinstance(cue, str) else cue.text for cue in cues], translate_fn, batch_fn, progress_signal,
+            max_workers, journal, batch_size, cancel_event=cancel_event
+        )
+        translated_cues = [_translated_cue(cue, text) for cue, text in zip(cues, translated_texts)]
+        return content.__class__(translated_cues) if isinstance(content, (list, UserList)) else translated_cues
+    else:
+        # This is a text file
+        # Split the content into chunks to avoid token limits
+        chunks = split_text_into_chunks(content, chunk_size)
+        translated_chunks = translate_texts(chunks, translate_fn, progress_signal, max_workers, journal, cancel_event)
+        return "\n".join(translated_chunks)
+
+def translate_with_ollama(content, model_name, source_lang="auto", target_lang="en", progress_signal=None,
+                          max_workers=DEFAULT_MAX_WORKERS, cache=None, journal=None,
+                          batch_size=DEFAULT_SUBTITLE_BATCH_SIZE, chunk_size=None, stream=False, monitor=None,
+                          governor=None, host=OLLAMA_DEFAULT_HOST, telemetry=None, scope=None,
+                          keep_alive=OLLAMA_DEFAULT_KEEP_ALIVE, hedging=None):
+    """Translate content using Ollama model.
     
-    # Add the last chunk if it's not empty
-    if current_chunk:
-        chunks.append(current_chunk)
+    If a TranslationCache is given, previously translated chunks are reused.
+    If a TranslationJournal is given, the job resumes from it.
+    Subtitle cues are sent batch_size at a time; text is split into chunks of
+    chunk_size estimated tokens, by default the size calibrated for the model
+    or, without a calibration, one sized for its context. With stream=True responses are streamed and reported to the StreamMonitor.
+    host may list several Ollama hosts, which then share the chunks. The
+    model is loaded with a context sized for chunk_size and stays loaded for
+    keep_alive after each request. Requests are rate limited and retried by
+    the governor; by default one with no rate limit and max_workers
+    concurrency is used. Every request is measured in the JobTelemetry and
+    sent in the RequestScope, and slow ones are hedged by the HedgePolicy,
+    if given.
+    """
+    try:
+        cancel_event = monitor.cancelled if monitor is not None else None
+        if governor is None:
+            governor = RequestGovernor(max_workers, cancel_event=cancel_event)
+        chunk_size = chunk_size or tuned_chunk_size_for("ollama", model_name)
+        num_ctx = ollama_num_ctx(chunk_size, model_name)
+        translate_fn = make_ollama_translator(model_name, source_lang, target_lang, cache, stream=stream,
+                                              monitor=monitor, governor=governor, host=host, telemetry=telemetry,
+                                              scope=scope, keep_alive=keep_alive, num_ctx=num_ctx, hedging=hedging)
+        batch_fn = make_ollama_translator(model_name, source_lang, target_lang, cache, numbered=True,
+                                          stream=stream, monitor=monitor, governor=governor, host=host,
+                                          telemetry=telemetry, scope=scope, keep_alive=keep_alive, num_ctx=num_ctx,
+                                          hedging=hedging)
+        return _translate_content(
+            content, translate_fn, progress_signal, max_workers, journal, batch_fn, batch_size, chunk_size,
+            cancel_event
+        )
+    except TranslationCancelled:
+        raise
+    except Exception as e:
+        raise Exception(f"Error translating with Ollama: {str(e)}")
+
+def translate_with_api(content, api_url, api_key, source_lang="auto", target_lang="en", progress_signal=None,
+                       max_workers=DEFAULT_MAX_WORKERS, cache=None, journal=None,
+                       batch_size=DEFAULT_SUBTITLE_BATCH_SIZE, chunk_size=None, cancel_event=None, governor=None,
+                       telemetry=None, scope=None, hedging=None):
+    """Translate content using an external API.
     
-    return chunks
+    If a TranslationCache is given, previously translated chunks are reused.
+    If a TranslationJournal is given, the job resumes from it.
+    Subtitle cues are sent batch_size at a time; text is split into chunks of
+    chunk_size estimated tokens, by default the size calibrated for api_url.
+    Setting cancel_event stops the job.
+    Requests are rate limited and retried by the governor; by default one
+    with no rate limit and max_workers concurrency is used. Every request is
+    measured in the JobTelemetry and sent in the RequestScope, and slow ones
+    are hedged by the HedgePolicy, if given.
+    """
+    try:
+        if governor is None:
+            governor = RequestGovernor(max_workers, cancel_event=cancel_event)
+        translate_fn = make_api_translator(api_url, api_key, source_lang, target_lang, cache, governor=governor,
+                                           telemetry=telemetry, scope=scope, hedging=hedging)
+        batch_fn = make_api_translator(api_url, api_key, source_lang, target_lang, cache, numbered=True,
+                                       governor=governor, telemetry=telemetry, scope=scope, hedging=hedging)
+        chunk_size = chunk_size or tuned_chunk_size_for("api", api_url)
+        return _translate_content(
+            content, translate_fn, progress_signal, max_workers, journal, batch_fn, batch_size, chunk_size,
+            cancel_event
+        )
+    except TranslationCancelled:
+        raise
+    except Exception as e:
+        raise Exception(f"Error translating with API: {str(e)}")
+
+def chunk_size_for(backend, model_name=None):
+    """Return the chunk size in estimated tokens for a backend and model."""
+    context_tokens = context_window(model_name)
+    if backend == "ollama":
+        context_tokens = min(context_tokens, OLLAMA_DEFAULT_NUM_CTX)
+    return chunk_token_budget(context_tokens)
+
+def tuned_chunk_size_for(backend, model_name=None):
+    """Return the calibrated chunk size for a backend and model, or chunk_size_for's default."""
+    # chunk_tuner builds on this module, so it is imported when needed
+    from chunk_tuner import resolve_chunk_size
+    return resolve_chunk_size(backend, model_name)
+
+def split_text_into_chunks(text, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Split text into chunks of at most chunk_size estimated tokens."""
+    return list(iter_chunks([text], chunk_size))
@@ -0,0 +1,151 @@
+import os
+import queue
+import threading
+from collections import deque
+
+from file_handlers import write_text_stream
+from chunking import iter_chunks
+from model_handlers import iter_translations, report_progress, DEFAULT_CHUNK_SIZE, DEFAULT_MAX_WORKERS
+
+# Number of extracted segments buffered ahead of the chunker
+DEFAULT_SEGMENT_BUFFER = 8
+
+_END = object()
+
+def prefetch(iterable, buffer_size=DEFAULT_SEGMENT_BUFFER):
+    """Produce items of iterable on a background thread through a bounded queue.
+
+    The producer blocks once buffer_size items are waiting, so extraction runs
+    ahead of translation without reading the whole document into memory.
+    Exceptions raised by the producer are re-raised in the consumer.
+    """
+    buffer = queue.Queue(maxsize=buffer_size)
+    stop = threading.Event()
+
+    def put(item):
+        # Give up if the consumer has gone away, instead of blocking forever
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((_END, None))
+        except BaseException as e:
+            put((_END, e))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+def run_text_pipeline(segments, output_file, translate_fn, total_segments=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                      max_workers=DEFAULT_MAX_WORKERS, max_pending=None, journal=None, progress_signal=None,
+                      cancel_event=None):
+    """Stream a document through extract -> chunk -> translate -> write.
+
+    Segments are extracted on a background thread, chunked lazily, translated
+    concurrently and written to output_file in order as each chunk completes.
+    Every stage is bounded, so memory use does not grow with the document.
+    Progress is reported from the share of segments whose chunks have been
+    written, if total_segments is known.
+    """
+    consumed = 0
+    chunk_positions = deque()
+
+    def counted_segments():
+        nonlocal consumed
+        for segment in prefetch(segments):
+            consumed += 1
+            yield segment
+
+    def positioned_chunks():
+        for chunk in iter_chunks(counted_segments(), chunk_size):
+            chunk_positions.append(consumed)
+            yield chunk
+
+    def reported(translations):
+        for translated_chunk in translations:
+            position = chunk_positions.popleft()
+            if total_segments:
+                # Segment counts can be estimates, so only report 100% at the very end
+                report_progress(progress_signal, min(99, int(position / total_segments * 100)))
+            yield translated_chunk
+
+    translations = iter_translations(positioned_chunks(), translate_fn, max_workers, max_pending, journal,
+                                     cancel_event)
+    write_text_stream(output_file, reported(translations))
+
+    report_progress(progress_signal, 100)
+
+def _open_output(output_file, checkpoint):
+    """Open the output for appending at a checkpoint, or from scratch; return it and the resume offset."""
+    if checkpoint is not None and os.path.exists(output_file) and \
+            os.path.getsize(output_file) >= checkpoint["output_bytes"]:
+        f = open(output_file, 'r+b')
+        # Drop anything written after the checkpoint; it is translated again
+        f.truncate(checkpoint["output_bytes"])
+        f.seek(0, os.SEEK_END)
+        return f, checkpoint
+    return open(output_file, 'wb'), None
+
+def run_segment_pipeline(open_segments, output_file, translate_fn, total_bytes=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                         max_workers=DEFAULT_MAX_WORKERS, max_pending=None, journal=None, progress_signal=None,
+                         cancel_event=None):
+    """Stream a document read by byte offset through chunk -> translate -> write.
+
+    open_segments(start) yields TextSegments from byte offset start on. Each
+    segment is chunked on its own, so once its last chunk is written the job
+    can restart right after it: a checkpoint of the input offset and output
+    size is then recorded in the journal. A journal holding a checkpoint
+    resumes the job there, reading the input from that offset and appending
+    to the output, rather than translating or replaying earlier chunks.
+    """
+    checkpoint = journal.checkpoint if journal is not None else None
+    output, checkpoint = _open_output(output_file, checkpoint)
+    start = checkpoint["offset"] if checkpoint else 0
+    chunk_count = checkpoint["chunks"] if checkpoint else 0
+    # The end offset of each queued chunk's segment, if it is the segment's last chunk
+    chunk_ends = deque()
+
+    def segment_chunks():
+        for segment in prefetch(open_segments(start)):
+            chunks = list(iter_chunks([segment.text], chunk_size))
+            for number, chunk in enumerate(chunks, 1):
+                chunk_ends.append(segment.end if number == len(chunks) else None)
+                yield chunk
+
+    with output:
+        translations = iter_translations(segment_chunks(), translate_fn, max_workers, max_pending,
+                                         cancel_event=cancel_event)
+        for translated_chunk in translations:
+            if output.tell() > 0:
+                output.write(b"\n")
+            output.write(translated_chunk.encode("utf-8"))
+            chunk_count += 1
+
+            end = chunk_ends.popleft()
+            if end is not None:
+                output.flush()
+                os.fsync(output.fileno())
+                if journal is not None:
+                    journal.record_checkpoint(end, output.tell(), chunk_count)
+                if total_bytes:
+                    report_progress(progress_signal, min(99, int(end / total_bytes * 100)))
+
+    report_progress(progress_signal, 100)
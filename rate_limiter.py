@@ -0,0 +1,244 @@
+import email.utils
+import random
+import threading
+import time
+import requests
+
+# Status codes that mean "try again later" rather than "this request is wrong"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 60
+
+# Concurrency is halved at most once per cooldown, so one burst of errors counts once
+DECREASE_COOLDOWN = 1.0
+# Concurrency shrinks when per-token latency exceeds the best seen by this factor
+LATENCY_TOLERANCE = 2.0
+LATENCY_SMOOTHING = 0.2
+
+class TranslationCancelled(Exception):
+    """Raised when a running translation is cancelled by the user."""
+
+class TransientError(Exception):
+    """A failure worth retrying, optionally with the delay the server asked for."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+RETRYABLE_ERRORS = (
+    TransientError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+def parse_retry_after(value):
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def _sleep(seconds, cancel_event):
+    if cancel_event is None:
+        time.sleep(seconds)
+    elif cancel_event.wait(seconds):
+        raise TranslationCancelled("Translation cancelled")
+
+class RateLimiter:
+    """Token buckets limiting requests per second and tokens per minute.
+
+    A limit of 0 disables that bucket. block_for() holds back every caller,
+    which is how a server's Retry-After is honoured by all workers at once.
+    """
+
+    def __init__(self, requests_per_second=0, tokens_per_minute=0):
+        self.requests_per_second = requests_per_second
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = max(1.0, requests_per_second)
+        self._token_allowance = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._blocked_until = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_second:
+            self._request_allowance = min(max(1.0, self.requests_per_second),
+                                          self._request_allowance + elapsed * self.requests_per_second)
+        if self.tokens_per_minute:
+            self._token_allowance = min(self.tokens_per_minute,
+                                        self._token_allowance + elapsed * self.tokens_per_minute / 60)
+
+    def _reserve(self, tokens):
+        """Take capacity for one request, or return how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            wait = self._blocked_until - now
+            if self.requests_per_second and self._request_allowance < 1:
+                wait = max(wait, (1 - self._request_allowance) / self.requests_per_second)
+            if self.tokens_per_minute:
+                # A request larger than the whole budget waits for a full bucket
+                tokens = min(tokens, self.tokens_per_minute)
+                if self._token_allowance < tokens:
+                    wait = max(wait, (tokens - self._token_allowance) * 60 / self.tokens_per_minute)
+            if wait > 0:
+                return wait
+
+            if self.requests_per_second:
+                self._request_allowance -= 1
+            if self.tokens_per_minute:
+                self._token_allowance -= tokens
+            return 0
+
+    def acquire(self, tokens=0, cancel_event=None):
+        """Block until a request of the given token cost may be sent."""
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            _sleep(wait, cancel_event)
+
+    def block_for(self, seconds):
+        """Hold back all requests for the given number of seconds."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+class AdaptiveConcurrency:
+    """Additive-increase/multiplicative-decrease limit on requests in flight.
+
+    Errors that signal overload halve the limit; rising per-token latency
+    trims it; every success grows it back by about one request per window.
+    """
+
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._smoothed_latency = None
+        self._best_latency = None
+        self._last_decrease = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, cancel_event=None):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait(0.1)
+                if cancel_event is not None and cancel_event.is_set():
+                    raise TranslationCancelled("Translation cancelled")
+            self.in_flight += 1
+
+    def _decrease(self, factor, now):
+        if now - self._last_decrease >= DECREASE_COOLDOWN:
+            self.limit = max(self.min_limit, self.limit * factor)
+            self._last_decrease = now
+
+    def release(self, latency=None, overloaded=False):
+        """Return a slot, adjusting the limit from the outcome of the request."""
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if overloaded:
+                self._decrease(0.5, now)
+            elif latency is not None:
+                if self._smoothed_latency is None:
+                    self._smoothed_latency = latency
+                else:
+                    self._smoothed_latency += LATENCY_SMOOTHING * (latency - self._smoothed_latency)
+                if self._best_latency is None or self._smoothed_latency < self._best_latency:
+                    self._best_latency = self._smoothed_latency
+
+                if self._smoothed_latency > self._best_latency * LATENCY_TOLERANCE:
+                    self._decrease(0.9, now)
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+class RequestGovernor:
+    """Runs requests under a rate limit and adaptive concurrency, retrying transient failures.
+
+    Retries use exponential backoff with full jitter, or the server's
+    Retry-After when it sends one.
+    """
+
+    def __init__(self, max_concurrency, requests_per_second=0, tokens_per_minute=0,
+                 max_retries=DEFAULT_MAX_RETRIES, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY,
+                 cancel_event=None, on_retry=None):
+        self.limiter = RateLimiter(requests_per_second, tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cancel_event = cancel_event
+        self.on_retry = on_retry
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise TranslationCancelled("Translation cancelled")
+
+    def attempt(self, fn, *args, tokens=0, **kwargs):
+        """Call fn once under the limits, without retrying it.
+
+        A Retry-After the failure carries still holds back every request.
+        """
+        self.limiter.acquire(tokens, self.cancel_event)
+        self.concurrency.acquire(self.cancel_event)
+        started = time.monotonic()
+        latency = None
+        overloaded = False
+        try:
+            result = fn(*args, **kwargs)
+            latency = (time.monotonic() - started) / max(1, tokens)
+            return result
+        except RETRYABLE_ERRORS as e:
+            overloaded = True
+            retry_after = getattr(e, "retry_after", None)
+            if retry_after is not None:
+                self.limiter.block_for(min(self.max_delay, retry_after))
+            raise
+        finally:
+            self.concurrency.release(latency, overloaded)
+
+    def call(self, fn, *args, tokens=0, **kwargs):
+        """Call fn under the limits, retrying it on transient errors."""
+        attempt = 0
+        while True:
+            try:
+                return self.attempt(fn, *args, tokens=tokens, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                error = e
+
+            # A connection closed by a cancel also looks like a transient error
+            self._check_cancelled()
+            attempt += 1
+            if attempt > self.max_retries:
+                raise error
+
+            retry_after = getattr(error, "retry_after", None)
+            if retry_after is not None:
+                delay = min(self.max_delay, retry_after)
+            else:
+                delay = self.backoff(attempt)
+
+            with self._lock:
+                self.retries += 1
+            if self.on_retry is not None:
+                self.on_retry(attempt, delay, str(error))
+            _sleep(delay, self.cancel_event)
@@ -0,0 +1,172 @@
+import re
+from array import array
+
+# A timing line, with any display coordinates after the end time kept as they are
+TIMING_PATTERN = re.compile(r"^\s*(\d+):(\d+):(\d+)[,.:](\d+)\s*-->\s*(\d+):(\d+):(\d+)[,.:](\d+)(.*)$")
+NUMBER_PATTERN = re.compile(r"^\s*\d+\s*$")
+
+class Cue:
+    """One subtitle: its number, start and end in milliseconds, text and display coordinates."""
+
+    __slots__ = ("number", "start", "end", "text", "position")
+
+    def __init__(self, number, start, end, text, position=""):
+        self.number = number
+        self.start = start
+        self.end = end
+        self.text = text
+        self.position = position
+
+def _milliseconds(hours, minutes, seconds, fraction):
+    # "5" and "50" after the comma mean 500 ms, as "500" does
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(fraction.ljust(3, "0")[:3])
+
+def format_time(milliseconds):
+    """Format milliseconds as an SRT time such as 01:02:03,456."""
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+def _iter_lines(blocks):
+    """Split decoded text blocks into lines, which may run across blocks."""
+    rest = ""
+    for block in blocks:
+        lines = (rest + block).split("\n")
+        rest = lines.pop()
+        yield from lines
+    if rest:
+        yield rest
+
+def _cue_text(lines):
+    # Blank lines around the text separate cues; blank lines inside it are kept
+    while lines and not lines[-1].strip():
+        lines.pop()
+    start = 0
+    while start < len(lines) and not lines[start].strip():
+        start += 1
+    return "\n".join(line.rstrip() for line in lines[start:])
+
+def iter_cues(blocks):
+    """Parse SRT text, given as decoded blocks with "\\n" newlines, yielding one Cue at a time.
+
+    A cue starts at its timing line; the number line before it is optional,
+    and a missing one continues from the previous cue. Only the lines of the
+    current cue are held, and a cue is yielded once the next one starts.
+    Text before the first timing line is ignored.
+    """
+    cue = None
+    lines = []
+    for line in _iter_lines(blocks):
+        match = TIMING_PATTERN.match(line)
+        if match is None:
+            lines.append(line)
+            continue
+
+        # A number line directly before the timing line, at the start or after a blank line, is the cue number
+        number = None
+        if lines and NUMBER_PATTERN.match(lines[-1]) and (len(lines) == 1 or not lines[-2].strip()):
+            number = int(lines.pop())
+        if cue is not None:
+            cue.text = _cue_text(lines)
+            yield cue
+        if number is None:
+            number = cue.number + 1 if cue is not None else 1
+
+        groups = match.groups()
+        cue = Cue(number, _milliseconds(*groups[0:4]), _milliseconds(*groups[4:8]), "", groups[8].rstrip())
+        lines = []
+
+    if cue is not None:
+        cue.text = _cue_text(lines)
+        yield cue
+
+class SubtitleCues:
+    """Subtitle cues held in a few flat arrays rather than as objects.
+
+    Numbers and start/end times live in arrays, and all texts in a single
+    string with the offset each one starts at, so tens of thousands of cues
+    cost a handful of objects. Indexing and iterating make Cue objects on
+    demand; replace_texts() shares the arrays with the original.
+    """
+
+    def __init__(self, numbers=None, times=None, text="", offsets=None, positions=None):
+        self.numbers = numbers if numbers is not None else array("q")
+        # Start and end of cue i at 2 * i and 2 * i + 1
+        self.times = times if times is not None else array("q")
+        self._text = text
+        # Text of cue i is _text[offsets[i]:offsets[i + 1]]
+        self.offsets = offsets if offsets is not None else array("q", [0])
+        # Display coordinates by cue index, for the few cues that have them
+        self.positions = positions if positions is not None else {}
+
+    @classmethod
+    def from_cues(cls, cues):
+        """Pack an iterable of Cues, such as iter_cues() yields."""
+        numbers, times, offsets, positions = array("q"), array("q"), array("q", [0]), {}
+        texts = []
+        for index, cue in enumerate(cues):
+            numbers.append(cue.number)
+            times.append(cue.start)
+            times.append(cue.end)
+            texts.append(cue.text)
+            offsets.append(offsets[-1] + len(cue.text))
+            if cue.position:
+                positions[index] = cue.position
+        return cls(numbers, times, "".join(texts), offsets, positions)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def text(self, index):
+        return self._text[self.offsets[index]:self.offsets[index + 1]]
+
+    def iter_texts(self):
+        for index in range(len(self)):
+            yield self.text(index)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("cue index out of range")
+        return Cue(self.numbers[index], self.times[2 * index], self.times[2 * index + 1], self.text(index),
+                   self.positions.get(index, ""))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def replace_texts(self, texts):
+        """Return the same cues with new texts; raises ValueError if the count differs."""
+        texts = list(texts)
+        if len(texts) != len(self):
+            raise ValueError(f"Got {len(texts)} texts for {len(self)} subtitles")
+        offsets = array("q", [0])
+        for text in texts:
+            offsets.append(offsets[-1] + len(text))
+        return SubtitleCues(self.numbers, self.times, "".join(texts), offsets, self.positions)
+
+def format_cue(number, start, end, text, position=""):
+    return f"{number}\n{format_time(start)} --> {format_time(end)}{position}\n{text}\n\n"
+
+def write_cues(f, cues, translated_texts=None, bilingual=False):
+    """Write SubtitleCues to an open text file in one pass.
+
+    With translated_texts, an iterable that may still be producing them,
+    each cue is written with its translation as soon as that arrives, or
+    with its original text and the translation below it if bilingual.
+    Raises ValueError if there are fewer or more translations than cues.
+    """
+    translations = iter(translated_texts) if translated_texts is not None else None
+    for index in range(len(cues)):
+        text = cues.text(index)
+        if translations is not None:
+            translated_text = next(translations, None)
+            if translated_text is None:
+                raise ValueError(f"Got {index} translations for {len(cues)} subtitles")
+            text = f"{text}\n{translated_text}" if bilingual else translated_text
+        f.write(format_cue(cues.numbers[index], cues.times[2 * index], cues.times[2 * index + 1], text,
+                           cues.positions.get(index, "")))
+    if translations is not None and next(translations, None) is not None:
+        raise ValueError(f"Got more translations than the {len(cues)} subtitles")
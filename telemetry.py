@@ -0,0 +1,322 @@
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# The chunk being translated on the current worker thread, if it is measured
+_local = threading.local()
+# Latency samples kept per job for percentiles; longer jobs keep a uniform sample
+RESERVOIR_SIZE = 1024
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of values, or None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def current_chunk():
+    """Return the ChunkMetrics of the chunk this thread is translating, or None."""
+    return getattr(_local, "chunk", None)
+
+@contextmanager
+def measuring(chunk):
+    """Count the requests sent on this thread toward chunk, e.g. from a helper thread."""
+    previous = current_chunk()
+    _local.chunk = chunk
+    try:
+        yield chunk
+    finally:
+        _local.chunk = previous
+
+class LatencyReservoir:
+    """A uniform sample of at most size latencies, with the count and sum of all of them."""
+
+    def __init__(self, size=RESERVOIR_SIZE):
+        self.size = size
+        self.samples = []
+        self.count = 0
+        self.total = 0.0
+        self._random = random.Random(0)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            # Keep each of the values seen so far with the same chance
+            index = self._random.randrange(self.count)
+            if index < self.size:
+                self.samples[index] = value
+
+    def percentile(self, fraction):
+        return percentile(self.samples, fraction)
+
+class ChunkMetrics:
+    """Measurements of one translation request, including its retries.
+
+    queue_seconds is the time spent waiting for a rate limit or concurrency
+    slot before the first attempt; request_seconds runs from the first
+    attempt to the end. A chunk with no attempts was answered from the cache.
+    Hedged duplicates count as attempts but not as retries.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.first_attempt_at = None
+        self.ended_at = None
+        self.attempts = 0
+        self.hedges = 0
+        self.ok = False
+        self.first_byte_seconds = None
+        self.load_seconds = 0.0
+        self.prompt_tokens = 0
+        self.prompt_eval_seconds = 0.0
+        self.eval_tokens = 0
+        self.eval_seconds = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        # A hedged duplicate counts toward the chunk from a thread of its own
+        self._lock = threading.Lock()
+
+    def attempt_started(self):
+        with self._lock:
+            if self.first_attempt_at is None:
+                self.first_attempt_at = time.monotonic()
+            self.attempts += 1
+
+    def hedge_started(self):
+        with self._lock:
+            self.hedges += 1
+
+    def response_received(self, response):
+        """Record the request size and time to the response headers of an attempt."""
+        self.first_byte_seconds = response.elapsed.total_seconds()
+        body = response.request.body if response.request is not None else None
+        self.bytes_sent += len(body or b"")
+
+    def add_received(self, size):
+        self.bytes_received += size
+
+    def generation(self, data):
+        """Record the statistics Ollama reports in its final response object."""
+        # Ollama reports durations in nanoseconds
+        self.load_seconds += data.get("load_duration", 0) / 1e9
+        self.prompt_tokens += data.get("prompt_eval_count", 0)
+        self.prompt_eval_seconds += data.get("prompt_eval_duration", 0) / 1e9
+        self.eval_tokens += data.get("eval_count", 0)
+        self.eval_seconds += data.get("eval_duration", 0) / 1e9
+
+    @property
+    def cached(self):
+        return self.attempts == 0
+
+    @property
+    def status(self):
+        """The chunk's outcome: "failed", "cached" or "ok"."""
+        if not self.ok:
+            return "failed"
+        return "cached" if self.cached else "ok"
+
+    @property
+    def retries(self):
+        return max(0, self.attempts - self.hedges - 1)
+
+    @property
+    def queue_seconds(self):
+        end = self.first_attempt_at if self.first_attempt_at is not None else self.ended_at
+        return end - self.started_at
+
+    @property
+    def request_seconds(self):
+        if self.first_attempt_at is None:
+            return 0.0
+        return self.ended_at - self.first_attempt_at
+
+    @property
+    def tokens_per_sec(self):
+        return self.eval_tokens / self.eval_seconds if self.eval_seconds > 0 else None
+
+    def to_dict(self):
+        return {
+            "ok": self.ok,
+            "cached": self.cached,
+            "queue_seconds": round(self.queue_seconds, 6),
+            "request_seconds": round(self.request_seconds, 6),
+            "first_byte_seconds": self.first_byte_seconds,
+            "load_seconds": round(self.load_seconds, 6),
+            "prompt_tokens": self.prompt_tokens,
+            "prompt_eval_seconds": round(self.prompt_eval_seconds, 6),
+            "eval_tokens": self.eval_tokens,
+            "eval_seconds": round(self.eval_seconds, 6),
+            "tokens_per_sec": self.tokens_per_sec,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "retries": self.retries,
+            "hedges": self.hedges,
+        }
+
+class JobTelemetry:
+    """Collects ChunkMetrics for a job and exports them as JSON or Prometheus text.
+
+    Totals are kept as each chunk ends and latency percentiles come from a
+    LatencyReservoir, so summary() costs the same at any point of a job.
+    Set progress (0-100) as the job advances to get an ETA in summary(),
+    cache to a TranslationCache to include its hit counts, and hedging to a
+    HedgePolicy to include how often hedged duplicates won.
+    """
+
+    def __init__(self, backend, model):
+        self.backend = backend
+        self.model = model
+        self.started_at = time.monotonic()
+        self.progress = 0
+        self.cache = None
+        self.hedging = None
+        self.chunks = []
+        self.statuses = {"ok": 0, "cached": 0, "failed": 0}
+        self.totals = dict.fromkeys(("requests", "retries", "prompt_tokens", "eval_tokens", "bytes_sent",
+                                     "bytes_received"), 0)
+        self.eval_seconds = 0.0
+        self.load_seconds = 0.0
+        self.queue_seconds = LatencyReservoir()
+        self.request_seconds = LatencyReservoir()
+        self._lock = threading.Lock()
+
+    def begin(self):
+        """Start measuring a chunk on this thread."""
+        chunk = ChunkMetrics()
+        chunk.previous = current_chunk()
+        _local.chunk = chunk
+        return chunk
+
+    def end(self, chunk, ok):
+        chunk.ended_at = time.monotonic()
+        chunk.ok = ok
+        _local.chunk = chunk.previous
+        del chunk.previous
+        with self._lock:
+            self.chunks.append(chunk)
+            self.statuses[chunk.status] += 1
+            self.totals["requests"] += chunk.attempts
+            self.totals["retries"] += chunk.retries
+            self.totals["prompt_tokens"] += chunk.prompt_tokens
+            self.totals["eval_tokens"] += chunk.eval_tokens
+            self.totals["bytes_sent"] += chunk.bytes_sent
+            self.totals["bytes_received"] += chunk.bytes_received
+            self.eval_seconds += chunk.eval_seconds
+            self.load_seconds += chunk.load_seconds
+            self.queue_seconds.add(chunk.queue_seconds)
+            if not chunk.cached:
+                self.request_seconds.add(chunk.request_seconds)
+
+    def summary(self):
+        """Return the job totals, rates, latency percentiles and ETA as a dict."""
+        with self._lock:
+            statuses = dict(self.statuses)
+            totals = dict(self.totals)
+            eval_seconds = self.eval_seconds
+            load_seconds = self.load_seconds
+            queue_seconds = self.queue_seconds.total
+            request_seconds = [self.request_seconds.percentile(q) for q in (0.50, 0.95, 0.99)]
+        chunks = sum(statuses.values())
+        elapsed = time.monotonic() - self.started_at
+        eval_tokens = totals["eval_tokens"]
+
+        eta = None
+        if 0 < self.progress < 100:
+            eta = elapsed * (100 - self.progress) / self.progress
+
+        return {
+            "backend": self.backend,
+            "model": self.model,
+            "elapsed_seconds": round(elapsed, 3),
+            "progress": self.progress,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+            "chunks": chunks,
+            "ok_chunks": statuses["ok"],
+            "failed_chunks": statuses["failed"],
+            "cached_chunks": statuses["cached"],
+            "requests": totals["requests"],
+            "retries": totals["retries"],
+            "chunks_per_sec": round(chunks / elapsed, 3) if elapsed > 0 else 0.0,
+            "prompt_tokens": totals["prompt_tokens"],
+            "eval_tokens": eval_tokens,
+            "tokens_per_sec": round(eval_tokens / eval_seconds, 2) if eval_seconds > 0 else 0.0,
+            "load_seconds": round(load_seconds, 3),
+            "queue_seconds_avg": round(queue_seconds / chunks, 4) if chunks else 0.0,
+            "request_seconds_p50": request_seconds[0],
+            "request_seconds_p95": request_seconds[1],
+            "request_seconds_p99": request_seconds[2],
+            "bytes_sent": totals["bytes_sent"],
+            "bytes_received": totals["bytes_received"],
+            "cache_hits": self.cache.hits if self.cache is not None else 0,
+            "cache_misses": self.cache.misses if self.cache is not None else 0,
+            "hedged_requests": self.hedging.hedged if self.hedging is not None else 0,
+            "hedge_wins": self.hedging.wins if self.hedging is not None else 0,
+        }
+
+    def write_json(self, file_path):
+        """Write the job summary and every chunk's measurements as JSON."""
+        with self._lock:
+            chunks = [chunk.to_dict() for chunk in self.chunks]
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump({"job": self.summary(), "chunks": chunks}, f, indent=2)
+
+    def write_prometheus(self, file_path):
+        """Write the job metrics in the Prometheus text exposition format."""
+        summary = self.summary()
+        labels = f'backend="{_escape_label(self.backend)}",model="{_escape_label(self.model)}"'
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append(f"# HELP translator_{name} {help_text}")
+            lines.append(f"# TYPE translator_{name} {metric_type}")
+            for extra_labels, value in samples:
+                lines.append(f"translator_{name}{{{labels}{extra_labels}}} {value}")
+
+        def seconds_summary(name, help_text, reservoir):
+            with self._lock:
+                samples = [(f',quantile="{q}"', reservoir.percentile(q) or 0) for q in (0.5, 0.95, 0.99)]
+                total, count = reservoir.total, reservoir.count
+            metric(name, "summary", help_text, samples)
+            lines.append(f"translator_{name}_sum{{{labels}}} {total}")
+            lines.append(f"translator_{name}_count{{{labels}}} {count}")
+
+        metric("chunks_total", "counter", "Chunks translated, by outcome.", [
+            (',status="ok"', summary["ok_chunks"]),
+            (',status="cached"', summary["cached_chunks"]),
+            (',status="failed"', summary["failed_chunks"]),
+        ])
+        metric("requests_total", "counter", "HTTP requests sent, including retries.", [("", summary["requests"])])
+        metric("retries_total", "counter", "Requests retried after a transient failure.", [("", summary["retries"])])
+        metric("hedged_requests_total", "counter", "Duplicate requests sent for slow chunks.",
+               [("", summary["hedged_requests"])])
+        metric("hedge_wins_total", "counter", "Hedged duplicates that answered first.", [("", summary["hedge_wins"])])
+        metric("cache_hits_total", "counter", "Translation cache hits.", [("", summary["cache_hits"])])
+        metric("cache_misses_total", "counter", "Translation cache misses.", [("", summary["cache_misses"])])
+        metric("prompt_tokens_total", "counter", "Prompt tokens evaluated by the model.", [("", summary["prompt_tokens"])])
+        metric("eval_tokens_total", "counter", "Tokens generated by the model.", [("", summary["eval_tokens"])])
+        metric("bytes_sent_total", "counter", "Request body bytes sent.", [("", summary["bytes_sent"])])
+        metric("bytes_received_total", "counter", "Response body bytes received.", [("", summary["bytes_received"])])
+        metric("model_load_seconds_total", "counter", "Time the model spent loading.", [("", summary["load_seconds"])])
+        metric("tokens_per_second", "gauge", "Generation speed over the job.", [("", summary["tokens_per_sec"])])
+        metric("chunks_per_second", "gauge", "Chunk throughput over the job.", [("", summary["chunks_per_sec"])])
+        metric("job_duration_seconds", "gauge", "Time since the job started.", [("", summary["elapsed_seconds"])])
+        seconds_summary("queue_seconds", "Time a chunk waited for a rate limit or concurrency slot.",
+                        self.queue_seconds)
+        seconds_summary("request_seconds", "Time from a chunk's first attempt to its result.",
+                        self.request_seconds)
+
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def metrics_paths_for(output_file):
+    """Return the JSON and Prometheus metrics paths kept next to an output file."""
+    return output_file + ".metrics.json", output_file + ".metrics.prom"
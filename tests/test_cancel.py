@@ -0,0 +1,85 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from benchmarks.corpora import write_txt
+from benchmarks.stub_server import API_PATH, StubServer
+from rate_limiter import TranslationCancelled
+from translator import TranslationJob
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def _start_job(stub, tmp_path, size=20):
+    input_file, output_file = str(tmp_path / "book.txt"), str(tmp_path / "book_translated.txt")
+    write_txt(input_file, size)
+    job = TranslationJob(input_file, output_file, "txt", "api", None, api_url=stub.url + API_PATH, api_key="key",
+                         max_workers=2, use_cache=False)
+    job.chunk_size = 50
+    outcome = {}
+
+    def run():
+        try:
+            outcome["output"] = job.run()
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return job, thread, outcome, input_file
+
+def test_pause_holds_requests_and_resume_finishes(tmp_path):
+    with StubServer(latency=0.1) as stub:
+        job, thread, outcome, input_file = _start_job(stub, tmp_path)
+        _wait_for(lambda: stub.requests >= 2)
+        job.pause()
+        assert job.paused
+        sent = stub.requests
+        time.sleep(0.5)
+        assert stub.requests == sent
+
+        job.resume()
+        thread.join(30)
+        assert not thread.is_alive() and "error" not in outcome
+        with open(input_file, encoding="utf-8") as original, open(outcome["output"], encoding="utf-8") as output:
+            assert output.read().split() == original.read().split()
+
+def test_cancel_aborts_requests_in_flight(tmp_path):
+    with StubServer(latency=30) as stub:
+        job, thread, outcome, _ = _start_job(stub, tmp_path)
+        _wait_for(lambda: stub.requests >= 2)
+        started = time.monotonic()
+        job.cancel()
+        thread.join(10)
+        assert not thread.is_alive()
+        assert time.monotonic() - started < 5
+        assert isinstance(outcome["error"], TranslationCancelled)
+
+@pytest.mark.skipif(sys.platform == "win32", reason="SIGINT cannot be sent to a child process on Windows")
+def test_ctrl_c_aborts_requests_in_flight(tmp_path):
+    input_file = str(tmp_path / "book.txt")
+    write_txt(input_file, 20000)
+    with StubServer(latency=30) as stub:
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, "translate_cli.py"), input_file,
+                                    "--backend", "api", "--api-url", stub.url + API_PATH, "--api-key", "key",
+                                    "--no-cache", "--quiet"], cwd=ROOT, stderr=subprocess.PIPE, text=True)
+        try:
+            _wait_for(lambda: stub.requests >= 1)
+            started = time.monotonic()
+            process.send_signal(signal.SIGINT)
+            _, errors = process.communicate(timeout=10)
+        finally:
+            process.kill()
+        assert time.monotonic() - started < 5
+        assert process.returncode == 130, errors
+        assert "cancelled" in errors
@@ -0,0 +1,71 @@
+from checkpoint import TranslationJournal
+from model_handlers import translate_texts
+
+METADATA = {"input_file": "book.txt", "chunk_size": 512}
+
+def test_journal_replays_recorded_chunks(tmp_path):
+    path = str(tmp_path / "out.txt.journal")
+    journal = TranslationJournal(path, METADATA)
+    journal.record(0, "one", "eins")
+    journal.record(1, "two", "zwei")
+    journal.close()
+
+    journal = TranslationJournal(path, METADATA)
+    assert len(journal) == 2
+    assert journal.get(1, "two") == "zwei"
+    assert journal.get(0, "one") == "eins"
+    # Each chunk is replayed once, then forgotten
+    assert journal.get(0, "one") is None
+    journal.close()
+
+def test_journal_ignores_changed_chunks_and_other_jobs(tmp_path):
+    path = str(tmp_path / "out.txt.journal")
+    journal = TranslationJournal(path, METADATA)
+    journal.record(0, "one", "eins")
+    journal.close()
+
+    journal = TranslationJournal(path, METADATA)
+    assert journal.get(0, "changed") is None
+    journal.close()
+
+    journal = TranslationJournal(path, dict(METADATA, chunk_size=1024))
+    assert len(journal) == 0
+    assert journal.get(0, "one") is None
+    journal.close()
+
+def test_journal_drops_a_line_cut_short(tmp_path):
+    path = str(tmp_path / "out.txt.journal")
+    journal = TranslationJournal(path, METADATA)
+    journal.record(0, "one", "eins")
+    journal.close()
+    with open(path, 'ab') as f:
+        f.write(b'{"index": 1, "sou')
+
+    journal = TranslationJournal(path, METADATA)
+    assert len(journal) == 1
+    journal.record(1, "two", "zwei")
+    journal.close()
+
+    journal = TranslationJournal(path, METADATA)
+    assert journal.get(0, "one") == "eins"
+    assert journal.get(1, "two") == "zwei"
+    journal.close()
+
+def test_resumed_job_only_translates_missing_chunks(tmp_path):
+    path = str(tmp_path / "out.txt.journal")
+    texts = ["a", "b", "c", "d"]
+    journal = TranslationJournal(path, METADATA)
+    journal.record(0, "a", "A")
+    journal.record(1, "b", "B")
+    journal.close()
+
+    sent = []
+
+    def translate_fn(text):
+        sent.append(text)
+        return text.upper()
+
+    journal = TranslationJournal(path, METADATA)
+    assert translate_texts(texts, translate_fn, max_workers=2, journal=journal) == ["A", "B", "C", "D"]
+    journal.close()
+    assert sorted(sent) == ["c", "d"]
@@ -0,0 +1,55 @@
+import chunk_tuner
+from benchmarks.stub_server import API_PATH, StubServer
+from chunk_tuner import (ChunkSizeMeasurement, calibrate_chunk_size, pick_chunk_size, resolve_chunk_size,
+                         save_tuned_chunk_size)
+from model_handlers import chunk_size_for, translate_with_api
+
+def _measurement(chunk_size, seconds, output_tokens, error=None):
+    return ChunkSizeMeasurement(chunk_size, 1, 1000, output_tokens, seconds, error)
+
+def test_pick_prefers_fastest_complete_size():
+    measurements = [_measurement(256, 4.0, 1000), _measurement(512, 2.0, 990), _measurement(1024, 1.0, 600)]
+    # 1024 is fastest but lost text, so 512 wins
+    assert pick_chunk_size(measurements) == 512
+
+def test_pick_skips_failed_sizes():
+    measurements = [_measurement(256, 4.0, 1000), _measurement(512, 0, 0, error="timeout")]
+    assert pick_chunk_size(measurements) == 256
+    assert pick_chunk_size([_measurement(512, 0, 0, error="timeout")]) is None
+
+def test_calibration_translates_sample_at_each_size():
+    sample = " ".join(f"Sentence number {i} of the sample." for i in range(200))
+    calls = {}
+
+    def make_translator(chunk_size):
+        calls[chunk_size] = 0
+
+        def translate(text):
+            calls[chunk_size] += 1
+            return text
+        return translate
+
+    best, measurements = calibrate_chunk_size(sample, make_translator, sizes=(64, 256))
+    assert best in (64, 256)
+    assert [m.chunk_size for m in measurements] == [64, 256]
+    assert calls[64] > calls[256] >= 1
+
+def test_saved_calibration_is_resolved(tmp_path):
+    path = str(tmp_path / "chunk_sizes.json")
+    assert resolve_chunk_size("api", "http://host", path) == chunk_size_for("api")
+    save_tuned_chunk_size("api", "http://host", 300, [_measurement(300, 1.0, 1000)], path)
+    assert resolve_chunk_size("api", "http://host", path) == 300
+    assert resolve_chunk_size("api", "http://other", path) == chunk_size_for("api")
+
+def test_translation_uses_calibrated_chunk_size(monkeypatch):
+    monkeypatch.setattr(chunk_tuner, "load_tuned_chunk_sizes", lambda path: {})
+    content = "\n\n".join(f"Paragraph {i} has a few words in it." for i in range(60))
+    with StubServer(latency=0) as stub:
+        api_url = stub.url + API_PATH
+        assert translate_with_api(content, api_url, "key").split() == content.split()
+        untuned = stub.requests
+
+        monkeypatch.setattr(chunk_tuner, "load_tuned_chunk_sizes",
+                            lambda path: {f"api:{api_url}": {"chunk_size": 32}})
+        assert translate_with_api(content, api_url, "key").split() == content.split()
+        assert stub.requests - untuned > untuned
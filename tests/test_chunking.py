@@ -0,0 +1,35 @@
+from chunking import PAGE_BREAK, estimate_tokens, iter_chunks
+
+def test_paragraphs_are_kept_whole_within_the_budget():
+    paragraphs = [f"Paragraph {i} is short.\n" for i in range(12)]
+    chunks = list(iter_chunks(["".join(paragraphs)], 40))
+    assert "".join(chunks) == "".join(paragraphs)
+    assert all(estimate_tokens(chunk) <= 40 for chunk in chunks)
+    assert all(chunk.endswith("\n") for chunk in chunks)
+
+def test_long_paragraph_is_cut_at_sentence_ends():
+    paragraph = " ".join(f"Sentence {i} says something." for i in range(40)) + "\n"
+    chunks = list(iter_chunks([paragraph], 30))
+    assert len(chunks) > 1
+    assert "".join(chunks) == paragraph
+    assert all(estimate_tokens(chunk) <= 30 for chunk in chunks)
+    assert all(chunk.rstrip().endswith(".") for chunk in chunks)
+
+def test_unspaced_text_is_cut_to_the_budget():
+    text = "字" * 500
+    chunks = list(iter_chunks([text], 64))
+    assert "".join(chunks) == text + "\n"
+    assert all(estimate_tokens(chunk) <= 64 for chunk in chunks)
+
+def test_segment_boundaries_do_not_cut_paragraphs():
+    text = "One paragraph split across reads.\nAnother one.\n"
+    assert list(iter_chunks([text[:10], text[10:25], text[25:]], 100)) == [text]
+
+def test_page_break_closes_a_chunk_that_is_full_enough():
+    page = "Words on a page.\n" * 6  # 30 tokens
+    chunks = list(iter_chunks([page + PAGE_BREAK + page], 50))
+    assert chunks == [page, page]
+
+    # A nearly empty chunk runs on into the next page
+    short = "Short.\n"
+    assert list(iter_chunks([short + PAGE_BREAK + short], 50)) == [short + short]
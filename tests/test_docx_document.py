@@ -0,0 +1,100 @@
+from docx import Document
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+from docx_document import DocxDocument
+
+PAGE_FIELD = (f'<w:p {nsdecls("w")}><w:r><w:t xml:space="preserve">Page </w:t></w:r>'
+              '<w:r><w:fldChar w:fldCharType="begin"/></w:r><w:r><w:instrText> PAGE </w:instrText></w:r>'
+              '<w:r><w:fldChar w:fldCharType="separate"/></w:r><w:r><w:t>1</w:t></w:r>'
+              '<w:r><w:fldChar w:fldCharType="end"/></w:r><w:r><w:t xml:space="preserve"> of </w:t></w:r>'
+              '<w:fldSimple w:instr=" NUMPAGES "><w:r><w:t>3</w:t></w:r></w:fldSimple></w:p>')
+
+def _add_hyperlink(paragraph, text, url):
+    r_id = paragraph.part.relate_to(url, "http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink",
+                                    is_external=True)
+    hyperlink = OxmlElement("w:hyperlink")
+    hyperlink.set(qn("r:id"), r_id)
+    run = OxmlElement("w:r")
+    text_element = OxmlElement("w:t")
+    text_element.text = text
+    run.append(text_element)
+    hyperlink.append(run)
+    paragraph._p.append(hyperlink)
+
+def _write_sample(path):
+    document = Document()
+    paragraph = document.add_paragraph("Read the ")
+    paragraph.add_run("bold").bold = True
+    paragraph.add_run(" note on ")
+    _add_hyperlink(paragraph, "the website", "https://example.com")
+    paragraph.add_run("\tnow.")
+    table = document.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "Total"
+    table.cell(0, 1).text = "1,250.00"
+    section = document.sections[0]
+    section.header.paragraphs[0].text = "Header text"
+    section.footer._element.append(parse_xml(PAGE_FIELD))
+    document.save(path)
+
+def test_units_use_placeholders_and_skip_numbers(tmp_path):
+    path = str(tmp_path / "sample.docx")
+    _write_sample(path)
+    document = DocxDocument(path)
+    assert document.texts == ["Read the <g1>bold</g1> note on <g2>the website</g2>\tnow.", "Total", "Header text",
+                              "Page <x1/> of <x2/>"]
+    assert "Page 1 of 3" in list(document.iter_paragraph_texts())
+
+def test_round_trip_keeps_formatting_links_and_fields(tmp_path):
+    path, output = str(tmp_path / "sample.docx"), str(tmp_path / "out.docx")
+    _write_sample(path)
+    document = DocxDocument(path)
+    document.save(output, ["Lisez <g2>le site</g2>\tmaintenant, la note <g1>grasse</g1>.", "Total (fr)",
+                           "En-tête", "Page <x1/> sur <x2/>"])
+
+    translated = Document(output)
+    runs = translated.paragraphs[0].runs
+    assert translated.paragraphs[0].text.startswith("Lisez ")
+    assert [run.text for run in runs if run.bold] == ["grasse"]
+    hyperlinks = translated.paragraphs[0]._p.findall(qn("w:hyperlink"))
+    assert len(hyperlinks) == 1 and hyperlinks[0].get(qn("r:id"))
+    assert "".join(t.text for t in hyperlinks[0].iter(qn("w:t"))) == "le site"
+    assert translated.tables[0].cell(0, 1).text == "1,250.00"
+    assert translated.sections[0].header.paragraphs[0].text == "En-tête"
+
+    footer = translated.sections[0].footer._element
+    assert len(footer.findall(".//" + qn("w:instrText"))) == 1
+    assert len(footer.findall(".//" + qn("w:fldSimple"))) == 1
+    assert list(DocxDocument(output).iter_paragraph_texts())[-1] == "Page 1 sur 3"
+
+def test_lost_placeholders_keep_fields_and_text(tmp_path):
+    path, output = str(tmp_path / "sample.docx"), str(tmp_path / "out.docx")
+    _write_sample(path)
+    document = DocxDocument(path)
+    document.save(output, ["Lisez la note grasse sur le site maintenant.", "Total", "En-tête", "Page sur"])
+
+    texts = list(DocxDocument(output).iter_paragraph_texts())
+    assert texts[0] == "Lisez la note grasse sur le site maintenant."
+    assert texts[-1] == "Page sur13"
+
+TEXT_BOX = ('<w:r {}><mc:AlternateContent><mc:Choice Requires="wps"><w:drawing><wps:txbx><w:txbxContent>'
+            '<w:p><w:r><w:t>Box text</w:t></w:r></w:p></w:txbxContent></wps:txbx></w:drawing></mc:Choice>'
+            '<mc:Fallback><w:pict><v:textbox><w:txbxContent><w:p><w:r><w:t>Box text</w:t></w:r></w:p>'
+            '</w:txbxContent></v:textbox></w:pict></mc:Fallback></mc:AlternateContent></w:r>').format(
+    nsdecls("w") + ' xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"'
+    ' xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape"'
+    ' xmlns:v="urn:schemas-microsoft-com:vml"')
+
+def test_text_box_is_translated_once_and_copied_to_its_fallback(tmp_path):
+    path, output = str(tmp_path / "box.docx"), str(tmp_path / "out.docx")
+    document = Document()
+    document.add_paragraph("Before the box")._p.append(parse_xml(TEXT_BOX))
+    document.save(path)
+
+    loaded = DocxDocument(path)
+    assert loaded.texts == ["Before the box<x1/>", "Box text"]
+    loaded.save(output, ["Avant la boîte<x1/>", "Texte de la boîte"])
+
+    body = Document(output).element.body
+    assert ["".join(t.text for t in box.iter(qn("w:t"))) for box in body.iter(qn("w:txbxContent"))] == [
+        "Texte de la boîte", "Texte de la boîte"]
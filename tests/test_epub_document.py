@@ -0,0 +1,81 @@
+import re
+import zipfile
+
+from benchmarks.corpora import write_epub
+from epub_document import EpubDocument, extract_units, replace_units
+
+NAV = ('<nav epub:type="toc"><ol>'
+       '<li><a href="chapter_1.xhtml">Chapter 1</a></li>'
+       '<li><a href="part_2.xhtml">Part 2</a><ol><li><a href="chapter_3.xhtml">Chapter 3</a></li></ol></li>'
+       '</ol></nav>')
+
+def _translate(markup, translate):
+    units = extract_units(markup)
+    return replace_units(markup, units, [translate(unit.text) for unit in units])
+
+def test_table_of_contents_keeps_its_links():
+    units = extract_units(NAV)
+    assert [unit.text for unit in units] == ["Chapter 1", "Part 2", "Chapter 3"]
+    assert _translate(NAV, str.upper) == NAV.replace(">Chapter 1<", ">CHAPTER 1<").replace(
+        ">Part 2<", ">PART 2<").replace(">Chapter 3<", ">CHAPTER 3<")
+
+def test_inline_markup_becomes_placeholders_and_is_restored():
+    markup = '<p>Click <a href="notes.xhtml#n1" id="r1">here</a> for <em>more</em> &amp; less.<img src="a.png"/></p>'
+    units = extract_units(markup)
+    assert [unit.text for unit in units] == ["Click <g1>here</g1> for <g2>more</g2> & less."]
+
+    translated = _translate(markup, lambda text: "Für <g2>mehr</g2> & weniger <g1>hier</g1> klicken.")
+    assert translated == ('<p>Für <em>mehr</em> &amp; weniger <a href="notes.xhtml#n1" id="r1">hier</a> klicken.'
+                          '<img src="a.png"/></p>')
+
+def test_lost_placeholders_keep_text_and_elements_without_text():
+    markup = '<p><a id="anchor"></a>Some <b>bold</b> text<br/>and <img src="x.png"/> more</p>'
+    units = extract_units(markup)
+    assert units[0].text == "Some <g2>bold</g2> text\nand <x3/> more"
+
+    translated = _translate(markup, lambda text: "Etwas fetter Text\nund mehr")
+    assert translated == '<p><a id="anchor"></a><img src="x.png"/>Etwas fetter Text<br/>und mehr</p>'
+
+def test_math_and_unclosed_inline_elements_are_kept():
+    markup = '<p>Let <math><mi>x</mi></math> be <b>large</p><p>Next</p>'
+    units = extract_units(markup)
+    assert [unit.text for unit in units] == ["Let <x1/> be <x2/>large", "Next"]
+    assert _translate(markup, str.upper) == '<p>LET <math><mi>x</mi></math> BE <b>LARGE</p><p>NEXT</p>'
+
+def test_epub_round_trip_keeps_navigation(tmp_path):
+    source = str(tmp_path / "book.epub")
+    target = str(tmp_path / "book_translated.epub")
+    write_epub(source, 12)
+
+    document = EpubDocument(source)
+    names = [chapter.name for chapter in document.chapters]
+    assert names[-1].endswith("nav.xhtml")
+    document.save(target, [text.upper() for text in document.texts])
+
+    translated = EpubDocument(target)
+    assert translated.texts == [text.upper() for text in document.texts]
+    with zipfile.ZipFile(source) as original, zipfile.ZipFile(target) as result:
+        assert result.namelist() == original.namelist()
+        nav = [name for name in names if name.endswith("nav.xhtml")][0]
+        assert result.read(nav).count(b"<a href=") == original.read(nav).count(b"<a href=")
+
+def test_latin1_chapter_takes_any_script(tmp_path):
+    source = str(tmp_path / "book.epub")
+    latin1 = str(tmp_path / "latin1.epub")
+    target = str(tmp_path / "book_translated.epub")
+    write_epub(source, 4)
+    chapter = EpubDocument(source).chapters[0].name
+    with zipfile.ZipFile(source) as original, zipfile.ZipFile(latin1, 'w') as rewritten:
+        for info in original.infolist():
+            data = original.read(info)
+            if info.filename == chapter:
+                markup = re.sub(r"^<\?xml[^>]*\?>\s*", "", data.decode("utf-8"))
+                data = ('<?xml version="1.0" encoding="iso-8859-1"?>\n' + markup).encode("iso-8859-1")
+            rewritten.writestr(info, data)
+
+    document = EpubDocument(latin1)
+    greek = [f"Κείμενο {number}" for number in range(len(document.texts))]
+    document.save(target, greek)
+    assert EpubDocument(target).texts == greek
+    with zipfile.ZipFile(target) as result:
+        assert result.read(chapter).startswith(b'<?xml version="1.0" encoding="iso-8859-1"?>')
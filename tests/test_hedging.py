@@ -0,0 +1,99 @@
+import threading
+import time
+
+from hedging import HEDGE_MIN_SAMPLES, HedgePolicy, current_attempt
+from rate_limiter import RequestGovernor
+
+class Aborted(Exception):
+    pass
+
+def _warmed_policy():
+    policy = HedgePolicy(budget=1.0, min_delay=0.05)
+    for _ in range(HEDGE_MIN_SAMPLES):
+        policy.call(lambda text: text, "warm up")
+    return policy
+
+def _wait_closed(scope, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not scope.closed:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    raise Aborted()
+
+class Copies:
+    """A translate function whose first call is the primary copy and second the duplicate."""
+
+    def __init__(self, primary, hedge):
+        self.behaviours = [primary, hedge]
+        self.scopes = []
+        self.lock = threading.Lock()
+
+    def __call__(self, text):
+        with self.lock:
+            behaviour = self.behaviours[len(self.scopes)]
+            self.scopes.append(current_attempt().scope)
+        return behaviour(current_attempt().scope)
+
+def test_no_hedge_before_enough_samples():
+    policy = HedgePolicy(budget=1.0, min_delay=0.01)
+    assert policy.hedge_delay(10) is None
+    assert policy.call(lambda text: time.sleep(0.05) or "done", "text") == "done"
+    assert policy.stats()["hedged"] == 0
+
+def test_slow_primary_is_hedged_and_loses():
+    policy = _warmed_policy()
+    copies = Copies(_wait_closed, lambda scope: "from duplicate")
+    assert policy.call(copies, "slow text") == "from duplicate"
+    assert policy.stats() == {"requests": HEDGE_MIN_SAMPLES + 1, "hedged": 1, "wins": 1}
+    # The primary was aborted once the duplicate answered
+    assert copies.scopes[0].closed and not copies.scopes[1].closed
+
+def test_primary_answering_first_aborts_the_duplicate():
+    policy = _warmed_policy()
+    hedge_started = threading.Event()
+    hedge_aborted = threading.Event()
+
+    def hedge(scope):
+        hedge_started.set()
+        try:
+            _wait_closed(scope)
+        finally:
+            hedge_aborted.set()
+
+    copies = Copies(lambda scope: hedge_started.wait(5) and "from primary", hedge)
+    assert policy.call(copies, "slow text") == "from primary"
+    assert hedge_aborted.wait(5)
+    assert copies.scopes[1].closed
+    assert policy.stats()["wins"] == 0
+
+def test_duplicate_answers_when_primary_fails():
+    policy = _warmed_policy()
+
+    def primary(scope):
+        time.sleep(0.2)
+        raise Aborted()
+
+    assert policy.call(Copies(primary, lambda scope: "from duplicate"), "slow text") == "from duplicate"
+
+def test_duplicate_waits_for_a_governor_slot():
+    policy = _warmed_policy()
+    governor = RequestGovernor(1)
+    copies = Copies(lambda scope: time.sleep(0.3) or "from primary", lambda scope: "from duplicate")
+
+    def hedged(text):
+        return policy.call(copies, text, governor, 10)
+
+    # The primary holds the only slot, so the duplicate is never sent
+    assert governor.call(hedged, "slow text") == "from primary"
+    time.sleep(0.1)
+    assert len(copies.scopes) == 1
+    assert policy.stats()["hedged"] == 0
+    assert governor.concurrency.in_flight == 0
+
+def test_duplicate_takes_a_governor_slot():
+    policy = _warmed_policy()
+    governor = RequestGovernor(2)
+    in_flight = []
+    copies = Copies(_wait_closed, lambda scope: in_flight.append(governor.concurrency.in_flight) or "from duplicate")
+    assert governor.call(lambda text: policy.call(copies, text, governor, 10), "slow text") == "from duplicate"
+    assert in_flight == [2]
@@ -0,0 +1,52 @@
+import host_pool
+from host_pool import FAILURE_THRESHOLD, HostPool, parse_hosts
+
+def test_parse_hosts_normalises_and_dedupes():
+    assert parse_hosts("gpu1:11434, http://gpu2:11434/;gpu1:11434") == ["http://gpu1:11434", "http://gpu2:11434"]
+
+def test_acquire_picks_least_outstanding_then_fastest():
+    pool = HostPool(["http://a", "http://b"])
+    pool._endpoints["http://b"].latency = 0.1
+    pool._endpoints["http://a"].latency = 0.5
+    # Tied on outstanding requests, so the faster host goes first
+    assert pool.acquire() == "http://b"
+    assert pool.acquire() == "http://a"
+    assert pool.acquire(exclude={"http://a"}) == "http://b"
+
+def test_failing_host_is_ejected_until_a_health_check(monkeypatch):
+    pool = HostPool(["http://a", "http://b"])
+    for _ in range(FAILURE_THRESHOLD):
+        pool.release(pool.acquire(exclude={"http://b"}), failed=True)
+    assert pool.healthy_hosts() == ["http://b"]
+    assert all(pool.acquire() == "http://b" for _ in range(3))
+
+    checked = []
+    monkeypatch.setattr(pool, "check_health", lambda url: checked.append(url))
+    pool._endpoints["http://a"].down_until = 0
+    pool.acquire()
+    assert checked == ["http://a"]
+
+def test_only_a_real_success_clears_failures():
+    pool = HostPool(["http://a"])
+    for _ in range(FAILURE_THRESHOLD - 1):
+        pool.release(pool.acquire(), failed=True)
+    # A rejected request (4xx) says nothing about the host
+    pool.release(pool.acquire())
+    pool.release(pool.acquire(), failed=True)
+    assert pool.healthy_hosts() == []
+
+    pool = HostPool(["http://a"])
+    for _ in range(FAILURE_THRESHOLD - 1):
+        pool.release(pool.acquire(), failed=True)
+    pool.release(pool.acquire(), latency=0.2)
+    pool.release(pool.acquire(), failed=True)
+    assert pool.healthy_hosts() == ["http://a"]
+
+def test_every_host_down_still_returns_one_due_soonest(monkeypatch):
+    monkeypatch.setattr(host_pool.time, "monotonic", lambda: 100.0)
+    pool = HostPool(["http://a", "http://b"])
+    for url, down_until in (("http://a", 130), ("http://b", 110)):
+        endpoint = pool._endpoints[url]
+        endpoint.failures = FAILURE_THRESHOLD
+        endpoint.down_until = down_until
+    assert pool.acquire() == "http://b"
@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from model_handlers import iter_translations
+
+class Tracker:
+    """A translate function that records how many calls run at once."""
+
+    def __init__(self, delay=lambda text: 0.01):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, text):
+        with self.lock:
+            self.calls.append(text)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay(text))
+            return text.upper()
+        finally:
+            with self.lock:
+                self.active -= 1
+
+def test_results_keep_input_order_and_workers_are_bounded():
+    texts = [f"text {i}" for i in range(20)]
+    # Earlier texts take longest, so they finish last
+    tracker = Tracker(lambda text: 0.002 * (20 - int(text.split()[1])))
+    assert list(iter_translations(texts, tracker, max_workers=4)) == [text.upper() for text in texts]
+    assert tracker.peak == 4
+
+def test_input_is_read_only_a_window_ahead():
+    read = []
+
+    def texts():
+        for i in range(50):
+            read.append(i)
+            yield f"text {i}"
+
+    gate = threading.Event()
+    results = iter_translations(texts(), lambda text: gate.wait(5) and text, max_workers=2, max_pending=6)
+    thread = threading.Thread(target=lambda: next(results))
+    thread.start()
+    time.sleep(0.1)
+    # The window is full and the first text is blocked, so nothing more is read
+    assert len(read) == 6
+    gate.set()
+    thread.join()
+    assert len(list(results)) == 49
+
+def test_repeats_in_window_share_one_request():
+    tracker = Tracker()
+    texts = ["same", "other", "same", "same"]
+    assert list(iter_translations(texts, tracker, max_workers=2)) == ["SAME", "OTHER", "SAME", "SAME"]
+    assert sorted(tracker.calls) == ["other", "same"]
+
+def test_first_failure_is_raised():
+    def translate(text):
+        if text == "bad":
+            raise ValueError("boom")
+        return text
+
+    with pytest.raises(ValueError, match="boom"):
+        list(iter_translations(["a", "bad", "c", "d"], translate, max_workers=2))
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from job_queue import JobQueue
+
+OPTIONS = {"model_type": "ollama", "model_name": "m"}
+
+def _write(path, text="Hello.\n"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+def test_rescan_skips_earlier_outputs(tmp_path):
+    _write(str(tmp_path / "a.txt"))
+    _write(str(tmp_path / "a_translated.txt"))
+    queue = JobQueue(path=None)
+
+    jobs = queue.add_paths([str(tmp_path)], OPTIONS)
+    assert [job.input_file for job in jobs] == [str(tmp_path / "a.txt")]
+    assert jobs[0].output_file == str(tmp_path / "a_translated.txt")
+
+def test_scan_skips_outputs_of_queued_jobs(tmp_path):
+    _write(str(tmp_path / "in" / "a.txt"))
+    queue = JobQueue(path=None)
+    queue.add(str(tmp_path / "in" / "a.txt"), OPTIONS, output_file=str(tmp_path / "in" / "custom.txt"))
+    # A running job's output is on disk by the time the folder is scanned again
+    _write(str(tmp_path / "in" / "custom.txt"))
+
+    assert queue.add_paths([str(tmp_path / "in")], OPTIONS) == []
+
+def test_recursive_output_dir_keeps_subfolders(tmp_path):
+    _write(str(tmp_path / "src" / "a" / "x.txt"))
+    _write(str(tmp_path / "src" / "b" / "x.txt"))
+    queue = JobQueue(path=None)
+
+    jobs = queue.add_paths([str(tmp_path / "src")], OPTIONS, recursive=True, output_dir=str(tmp_path / "out"))
+    assert sorted(job.output_file for job in jobs) == [
+        str(tmp_path / "out" / "a" / "x_translated.txt"),
+        str(tmp_path / "out" / "b" / "x_translated.txt"),
+    ]
+
+def test_shared_output_is_rejected(tmp_path):
+    _write(str(tmp_path / "a" / "x.txt"))
+    _write(str(tmp_path / "b" / "x.txt"))
+    queue = JobQueue(path=None)
+    queue.add(str(tmp_path / "a" / "x.txt"), OPTIONS, output_dir=str(tmp_path / "out"))
+
+    with pytest.raises(ValueError):
+        queue.add(str(tmp_path / "b" / "x.txt"), OPTIONS, output_dir=str(tmp_path / "out"))
+    assert len(queue.jobs) == 1
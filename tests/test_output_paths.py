@@ -0,0 +1,16 @@
+import os
+
+from benchmarks.corpora import write_docx, write_pdf, write_srt, write_txt
+from translator import default_output_path
+
+def test_default_output_path_keeps_formats_written_in_kind(tmp_path):
+    for name, writer in [("a.txt", write_txt), ("a.srt", write_srt), ("a.docx", write_docx)]:
+        path = str(tmp_path / name)
+        writer(path, 3)
+        base, ext = os.path.splitext(name)
+        assert default_output_path(path) == str(tmp_path / f"{base}_translated{ext}")
+
+def test_default_output_path_uses_txt_for_text_output(tmp_path):
+    path = str(tmp_path / "a.pdf")
+    write_pdf(path, 3)
+    assert default_output_path(path, str(tmp_path / "out")) == str(tmp_path / "out" / "a_translated.txt")
@@ -0,0 +1,10 @@
+from benchmarks.corpora import write_pdf
+from file_handlers import PDF_PARALLEL_MIN_PAGES, iter_pdf_pages
+
+def test_parallel_extraction_matches_page_order(tmp_path):
+    path = str(tmp_path / "book.pdf")
+    write_pdf(path, 400)
+    serial = list(iter_pdf_pages(path, workers=1))
+    assert len(serial) >= PDF_PARALLEL_MIN_PAGES
+    assert list(iter_pdf_pages(path, workers=2)) == serial
+    assert all(serial)
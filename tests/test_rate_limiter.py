@@ -0,0 +1,117 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limiter
+from rate_limiter import (DECREASE_COOLDOWN, AdaptiveConcurrency, RateLimiter, RequestGovernor, TransientError,
+                          parse_retry_after)
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A fake clock for rate_limiter whose sleeps advance it at once."""
+    state = SimpleNamespace(now=100.0)
+
+    def sleep(seconds):
+        state.now += seconds
+
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(monotonic=lambda: state.now, sleep=sleep,
+                                                              time=time.time))
+    return state
+
+def test_requests_per_second_paces_after_a_burst(clock):
+    limiter = RateLimiter(requests_per_second=2)
+    sent = []
+    for _ in range(5):
+        limiter.acquire()
+        sent.append(round(clock.now - 100, 3))
+    assert sent == [0, 0, 0.5, 1.0, 1.5]
+
+def test_tokens_per_minute_waits_for_the_bucket(clock):
+    limiter = RateLimiter(tokens_per_minute=600)
+    limiter.acquire(300)
+    limiter.acquire(300)
+    assert clock.now == 100
+    limiter.acquire(300)
+    assert clock.now == pytest.approx(130)
+    # A request larger than the whole budget waits for a full bucket, not forever
+    limiter.acquire(10000)
+    assert clock.now == pytest.approx(190)
+
+def test_block_for_holds_back_every_request(clock):
+    limiter = RateLimiter()
+    limiter.block_for(3)
+    limiter.acquire()
+    assert clock.now == pytest.approx(103)
+
+def test_overload_halves_the_limit_once_per_cooldown(clock):
+    concurrency = AdaptiveConcurrency(8)
+    for _ in range(2):
+        concurrency.acquire()
+        concurrency.release(overloaded=True)
+    assert concurrency.limit == 4
+
+    clock.now += DECREASE_COOLDOWN
+    concurrency.acquire()
+    concurrency.release(overloaded=True)
+    assert concurrency.limit == 2
+
+def test_successes_grow_the_limit_by_one_per_window(clock):
+    concurrency = AdaptiveConcurrency(8)
+    concurrency.limit = 2.0
+    for _ in range(2):
+        concurrency.acquire()
+        concurrency.release(latency=0.01)
+    assert int(concurrency.limit) == 2
+    for _ in range(2):
+        concurrency.acquire()
+        concurrency.release(latency=0.01)
+    assert int(concurrency.limit) == 3
+
+def test_rising_latency_trims_the_limit(clock):
+    concurrency = AdaptiveConcurrency(8)
+    concurrency.acquire()
+    concurrency.release(latency=0.01)
+    for _ in range(20):
+        concurrency.acquire()
+        concurrency.release(latency=1.0)
+    assert concurrency.limit == pytest.approx(8 * 0.9)
+
+def test_retry_after_sets_the_delay_and_blocks_other_requests(clock):
+    retries = []
+    outcomes = [TransientError("429", retry_after=2), "done"]
+
+    def send():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    governor = RequestGovernor(4, on_retry=lambda attempt, delay, error: retries.append(delay))
+    assert governor.call(send) == "done"
+    assert retries == [2]
+    assert clock.now == pytest.approx(102)
+    assert governor.limiter._blocked_until == pytest.approx(102)
+    assert governor.concurrency.in_flight == 0
+
+def test_retries_stop_after_max_and_skip_other_errors(clock):
+    calls = []
+
+    def fail(error):
+        calls.append(error)
+        raise error
+
+    governor = RequestGovernor(2, max_retries=2, base_delay=0.1)
+    with pytest.raises(TransientError):
+        governor.call(fail, TransientError("503"))
+    assert len(calls) == 3
+    with pytest.raises(ValueError):
+        governor.call(fail, ValueError("400"))
+    assert len(calls) == 4
+    assert governor.retries == 2
+
+def test_parse_retry_after():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
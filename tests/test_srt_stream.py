@@ -0,0 +1,57 @@
+import io
+
+import pytest
+
+from benchmarks.corpora import write_srt
+from file_handlers import read_srt_file, write_srt_stream
+from srt_stream import SubtitleCues, iter_cues, write_cues
+
+SAMPLE = ("1\n00:00:01,000 --> 00:00:02,500\nHello there.\n\n"
+          "2\n00:00:03,000 --> 00:00:04,000 X1:10 X2:100 Y1:20 Y2:50\nTwo lines,\n\nwith a blank one.\n\n"
+          "00:00:05,5 --> 01:02:03,456\nNo number\n")
+
+def _cues(text, block_size=7):
+    return SubtitleCues.from_cues(iter_cues(text[start:start + block_size] for start in range(0, len(text), block_size)))
+
+def test_cues_parse_across_blocks():
+    cues = _cues(SAMPLE)
+    assert [(cue.number, cue.start, cue.end, cue.text, cue.position) for cue in cues] == [
+        (1, 1000, 2500, "Hello there.", ""),
+        (2, 3000, 4000, "Two lines,\n\nwith a blank one.", " X1:10 X2:100 Y1:20 Y2:50"),
+        (3, 5500, 3723456, "No number", ""),
+    ]
+
+def test_write_cues_round_trip():
+    cues = _cues(SAMPLE)
+    out = io.StringIO()
+    write_cues(out, cues)
+    assert [(cue.number, cue.start, cue.end, cue.text, cue.position) for cue in _cues(out.getvalue())] == [
+        (cue.number, cue.start, cue.end, cue.text, cue.position) for cue in cues]
+    assert out.getvalue().startswith("1\n00:00:01,000 --> 00:00:02,500\nHello there.\n\n")
+
+def test_write_cues_translated_and_bilingual():
+    cues = _cues(SAMPLE)
+    out = io.StringIO()
+    write_cues(out, cues, iter(["Bonjour.", "Deux lignes.", "Sans numéro"]), bilingual=True)
+    assert "Hello there.\nBonjour.\n\n" in out.getvalue()
+    assert [cue.text for cue in _cues(out.getvalue())][2] == "No number\nSans numéro"
+
+def test_write_cues_rejects_wrong_count():
+    cues = _cues(SAMPLE)
+    with pytest.raises(ValueError):
+        write_cues(io.StringIO(), cues, ["one", "two"])
+    with pytest.raises(ValueError):
+        write_cues(io.StringIO(), cues, ["one", "two", "three", "four"])
+
+def test_read_srt_file_handles_bom_and_crlf(tmp_path):
+    path = tmp_path / "sample.srt"
+    path.write_bytes(b"\xef\xbb\xbf" + SAMPLE.replace("\n", "\r\n").encode("utf-8"))
+    assert [cue.text for cue in read_srt_file(str(path))] == [cue.text for cue in _cues(SAMPLE)]
+
+def test_srt_file_round_trip(tmp_path):
+    path, output = str(tmp_path / "corpus.srt"), str(tmp_path / "out.srt")
+    write_srt(path, 50)
+    cues = read_srt_file(path)
+    write_srt_stream(output, cues, cues.iter_texts())
+    with open(path, encoding="utf-8") as original, open(output, encoding="utf-8") as written:
+        assert written.read().strip() == original.read().strip()
@@ -0,0 +1,80 @@
+from model_handlers import (format_batch, parse_batch, is_complete_batch, _translate_batch, _cached_translate,
+                            _translate_content, translate_subtitle_texts, ollama_system_prompt,
+                            BATCH_INSTRUCTIONS, TAG_INSTRUCTIONS)
+from srt_stream import Cue, SubtitleCues
+from translation_cache import TranslationCache
+
+def test_format_and_parse_batch_round_trip():
+    texts = ["Hello", "Two\nlines", "Bye"]
+    assert parse_batch(format_batch(texts), 3) == texts
+
+def test_parse_batch_rejects_missing_and_reordered_markers():
+    assert parse_batch("[1] a\n[3] c", 3) is None
+    assert parse_batch("[2] b\n[1] a", 2) is None
+    assert parse_batch("[1] a\n[2] b\n[3] c", 2) is None
+
+def test_system_prompt_mentions_tags_only_for_tagged_units():
+    plain = ollama_system_prompt("en", "fr", numbered=True)
+    assert BATCH_INSTRUCTIONS in plain
+    assert TAG_INSTRUCTIONS not in plain
+    assert TAG_INSTRUCTIONS in ollama_system_prompt("en", "fr", numbered=True, tagged=True)
+
+def test_translate_batch_halves_until_markers_line_up():
+    requests = []
+
+    def batch_fn(batch_text):
+        requests.append(batch_text)
+        texts = parse_batch(batch_text, len(batch_text.split("\n")))
+        if len(texts) > 2:
+            # Merge the first two segments, as a model sometimes does
+            return format_batch([texts[0] + " " + texts[1]] + texts[2:]).upper()
+        return format_batch(texts).upper()
+
+    result = _translate_batch(["a", "b", "c", "d", "e"], batch_fn, str.upper)
+    assert result == ["A", "B", "C", "D", "E"]
+    # The whole batch, then both halves, then the halves of the three-cue half
+    assert len(requests) == 4
+
+def test_incomplete_batch_is_not_cached(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.sqlite"))
+    batch_text = format_batch(["a", "b"])
+    responses = iter(["[1] A B", "[1] A\n[2] B"])
+    calls = []
+
+    def translate_fn(text):
+        calls.append(text)
+        return next(responses)
+
+    def cached(text):
+        return _cached_translate(text, translate_fn, cache, "test-numbered", "m", "en", "de", is_complete_batch)
+
+    assert cached(batch_text) == "[1] A B"
+    assert cached(batch_text) == "[1] A\n[2] B"
+    assert cached(batch_text) == "[1] A\n[2] B"
+    assert len(calls) == 2
+    cache.close()
+
+def test_translate_subtitle_texts_keeps_order_across_batches():
+    texts = [f"cue {number}" for number in range(25)]
+
+    def batch_fn(batch_text):
+        return batch_text.upper()
+
+    result = translate_subtitle_texts(texts, str.upper, batch_fn, max_workers=3, batch_size=4)
+    assert result == [text.upper() for text in texts]
+
+def test_plain_cue_lists_are_translated():
+    def batch_fn(batch_text):
+        return batch_text.upper()
+
+    assert _translate_content(["a", "b"], str.upper, None, 2, None, batch_fn, 4, 100) == ["A", "B"]
+
+    cues = [Cue(1, 0, 1000, "hello", " X1:1"), Cue(2, 1000, 2000, "world")]
+    translated = _translate_content(cues, str.upper, None, 2, None, batch_fn, 4, 100)
+    assert [(cue.number, cue.end, cue.text, cue.position) for cue in translated] == [
+        (1, 1000, "HELLO", " X1:1"), (2, 2000, "WORLD", "")]
+    assert cues[0].text == "hello"
+
+    subtitles = SubtitleCues.from_cues(cues)
+    assert list(_translate_content(subtitles, str.upper, None, 2, None, batch_fn, 4, 100).iter_texts()) == [
+        "HELLO", "WORLD"]
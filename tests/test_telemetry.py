@@ -0,0 +1,45 @@
+from telemetry import JobTelemetry, LatencyReservoir, percentile
+
+def _chunk(telemetry, attempts, ok):
+    chunk = telemetry.begin()
+    for _ in range(attempts):
+        chunk.attempt_started()
+    telemetry.end(chunk, ok)
+
+def test_each_chunk_counts_under_one_status(tmp_path):
+    telemetry = JobTelemetry("api", "http://host")
+    _chunk(telemetry, 1, True)
+    _chunk(telemetry, 3, True)
+    _chunk(telemetry, 0, True)
+    # A chunk cancelled before its first attempt is failed, not cached
+    _chunk(telemetry, 0, False)
+    _chunk(telemetry, 2, False)
+
+    summary = telemetry.summary()
+    assert (summary["ok_chunks"], summary["cached_chunks"], summary["failed_chunks"]) == (2, 1, 2)
+    assert summary["chunks"] == 5
+    assert summary["requests"] == 6
+    assert summary["retries"] == 3
+
+    path = str(tmp_path / "job.prom")
+    telemetry.write_prometheus(path)
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    assert 'status="ok"} 2' in text
+    assert 'status="cached"} 1' in text
+    assert 'status="failed"} 2' in text
+    assert 'translator_request_seconds_count{backend="api",model="http://host"} 3' in text
+
+def test_reservoir_is_exact_until_full_then_bounded():
+    reservoir = LatencyReservoir(size=100)
+    for value in range(100):
+        reservoir.add(value)
+    assert reservoir.percentile(0.5) == percentile(list(range(100)), 0.5)
+
+    for value in range(100, 10000):
+        reservoir.add(value)
+    assert len(reservoir.samples) == 100
+    assert reservoir.count == 10000
+    assert reservoir.total == sum(range(10000))
+    # A uniform sample of the whole job, not just its start or end
+    assert 2500 < reservoir.percentile(0.5) < 7500
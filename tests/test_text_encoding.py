@@ -0,0 +1,35 @@
+from file_handlers import ENCODING_SAMPLE_LIMIT, TEXT_BLOCK_SIZE, detect_encoding, iter_text_segments, read_text_file
+
+TAIL = "Le menu du jour : café, crème brûlée et thé glacé à volonté.\n"
+
+def _ascii_head(size):
+    line = "The quick brown fox jumps over the lazy dog.\n"
+    return line * (size // len(line) + 1)
+
+def test_ascii_head_does_not_decide_utf8(tmp_path):
+    path = tmp_path / "menu.txt"
+    text = _ascii_head(TEXT_BLOCK_SIZE + 8 * 1024) + TAIL
+    path.write_bytes(text.encode("cp1252"))
+    assert read_text_file(str(path)) == text
+    assert "".join(segment.text for segment in iter_text_segments(str(path))) == text
+
+def test_utf8_after_ascii_head(tmp_path):
+    path = tmp_path / "menu.txt"
+    text = _ascii_head(2 * TEXT_BLOCK_SIZE) + TAIL
+    path.write_bytes(text.encode("utf-8"))
+    assert detect_encoding(str(path)) == "utf-8"
+    assert read_text_file(str(path)) == text
+
+def test_all_ascii_sample_is_utf8(tmp_path):
+    path = tmp_path / "plain.txt"
+    path.write_bytes(_ascii_head(ENCODING_SAMPLE_LIMIT + 1024).encode("ascii"))
+    assert detect_encoding(str(path)) == "utf-8"
+
+def test_utf16_without_bom_is_not_read_as_utf8(tmp_path):
+    text = _ascii_head(4096) + TAIL
+    for encoding in ("utf-16-le", "utf-16-be"):
+        path = tmp_path / f"{encoding}.txt"
+        path.write_bytes(text.encode(encoding))
+        assert detect_encoding(str(path)).replace("-", "") == encoding.replace("-", "")
+        assert read_text_file(str(path)) == text
+        assert "".join(segment.text for segment in iter_text_segments(str(path))) == text
@@ -0,0 +1,43 @@
+from benchmarks.corpora import write_txt
+from file_handlers import iter_text_segments, read_text_file
+
+def _check_resume(path, segment_size):
+    segments = list(iter_text_segments(path, segment_size=segment_size))
+    assert len(segments) > 2
+    assert "".join(segment.text for segment in segments) == read_text_file(path)
+    assert segments[0].start in (0, 2) and all(a.end == b.start for a, b in zip(segments, segments[1:]))
+    for index in sorted({0, 1, len(segments) // 2, len(segments) - 2}):
+        resumed = list(iter_text_segments(path, start=segments[index].end, segment_size=segment_size))
+        assert "".join(part.text for part in resumed) == "".join(part.text for part in segments[index + 1:])
+    return segments
+
+def test_segments_end_at_line_breaks_and_resume(tmp_path):
+    path = str(tmp_path / "corpus.txt")
+    write_txt(path, 8000)
+    segments = _check_resume(path, 1024)
+    assert all(segment.text.endswith("\n") for segment in segments[:-1])
+
+def test_long_utf8_line_is_not_cut_inside_a_character(tmp_path):
+    path = tmp_path / "line.txt"
+    path.write_bytes(("ü€𝄞 " * 3000).encode("utf-8"))
+    _check_resume(str(path), 1000)
+
+def test_utf16_with_bom_and_crlf(tmp_path):
+    path = tmp_path / "wide.txt"
+    path.write_bytes(("Ligne numéro %d\r\n" * 500 % tuple(range(500))).encode("utf-16"))
+    segments = _check_resume(str(path), 512)
+    assert segments[0].start == 2
+    assert "\r" not in "".join(segment.text for segment in segments)
+
+LONG_LINES = {
+    "utf-16": "日本語のテキスト、改行なし𝄞",
+    "gb18030": "这是一段很长的中文文本，没有任何换行符，用来测试分段。",
+    "shift_jis": "これは改行のない長い日本語の文章です。",
+}
+
+def test_long_lines_in_wide_and_multibyte_encodings_resume_on_characters(tmp_path):
+    for encoding, line in LONG_LINES.items():
+        path = tmp_path / f"{encoding}.txt"
+        path.write_bytes((line * 400).encode(encoding))
+        segments = _check_resume(str(path), 999)
+        assert "".join(segment.text for segment in segments) == line * 400
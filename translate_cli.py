@@ -0,0 +1,267 @@
+"""Command line entry point for translating files without the GUI.
+
+Examples:
+    python translate_cli.py book.epub --model llama3 --target zh
+    python translate_cli.py season1/ --pattern "*.srt" --output-dir out/ --model llama3 --jobs 2
+    python translate_cli.py movie.srt --backend api --api-url https://example.com/v1/chat/completions --bilingual
+
+This module never imports PyQt5, so it runs on headless servers.
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+from contextlib import contextmanager
+
+from http_client import configure_http_client, DEFAULT_POOL_MAXSIZE, DEFAULT_READ_TIMEOUT
+from translation_cache import TranslationCache
+from model_handlers import (detect_ollama_models, TranslationCancelled, OLLAMA_DEFAULT_HOST,
+                            OLLAMA_DEFAULT_KEEP_ALIVE, DEFAULT_MAX_WORKERS, DEFAULT_SUBTITLE_BATCH_SIZE)
+from rate_limiter import DEFAULT_MAX_RETRIES
+from file_handlers import FILE_FORMATS, detect_file_type
+from translator import TranslationJob, default_output_path
+from telemetry import metrics_paths_for
+from hedging import DEFAULT_HEDGE_BUDGET
+from job_queue import JobQueue, QueueRunner, DEFAULT_PARALLEL_JOBS, DONE
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Translate long text and subtitle files with AI models.")
+    parser.add_argument("input", nargs="*", help="files, folders or glob patterns to translate")
+    parser.add_argument("-o", "--output",
+                        help="output file for a single input (default: <name>_translated<ext>, .txt for PDF)")
+    parser.add_argument("--output-dir", help="folder for the outputs of several inputs (default: next to each input)")
+    parser.add_argument("--pattern", help="file pattern inside folders (default: all supported files)")
+    parser.add_argument("--recursive", action="store_true", help="include subfolders and ** in patterns")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_PARALLEL_JOBS,
+                        help="files translated at once when several are given")
+    parser.add_argument("--type", choices=sorted(FILE_FORMATS),
+                        help="file type if it cannot be detected from the content or extension")
+    parser.add_argument("--backend", choices=["ollama", "api"], default="ollama")
+    parser.add_argument("--model", help="Ollama model name")
+    parser.add_argument("--host", default=os.environ.get("OLLAMA_HOST", OLLAMA_DEFAULT_HOST),
+                        help="Ollama hosts, comma separated (default: $OLLAMA_HOST or the local server)")
+    parser.add_argument("--keep-alive", default=OLLAMA_DEFAULT_KEEP_ALIVE,
+                        help=f"how long Ollama keeps the model loaded, e.g. 10m or -1 for always "
+                             f"(default: {OLLAMA_DEFAULT_KEEP_ALIVE})")
+    parser.add_argument("--hedge", type=float, default=0, metavar="PERCENTILE",
+                        help="duplicate requests slower than this percentile of recent ones, e.g. 95 (0 = off)")
+    parser.add_argument("--hedge-budget", type=float, default=DEFAULT_HEDGE_BUDGET,
+                        help=f"most duplicate requests per request (default: {DEFAULT_HEDGE_BUDGET})")
+    parser.add_argument("--api-url", help="API endpoint for the api backend")
+    parser.add_argument("--api-key", default=os.environ.get("TRANSLATOR_API_KEY"),
+                        help="API key (default: $TRANSLATOR_API_KEY)")
+    parser.add_argument("--source", default="auto", help="source language (default: auto)")
+    parser.add_argument("--target", default="en", help="target language (default: en)")
+    parser.add_argument("--bilingual", action="store_true", help="merge original and translated subtitles")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS, help="concurrent requests")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_SUBTITLE_BATCH_SIZE,
+                        help="subtitle cues per request")
+    parser.add_argument("--stream", action="store_true", help="stream Ollama responses")
+    parser.add_argument("--rps", type=float, default=0, help="requests per second limit (0 = unlimited)")
+    parser.add_argument("--tpm", type=int, default=0, help="tokens per minute limit (0 = unlimited)")
+    parser.add_argument("--retries", type=int, default=DEFAULT_MAX_RETRIES, help="retries per request")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_READ_TIMEOUT, help="request timeout in seconds")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="first translate a sample at several chunk sizes and keep the fastest for this model")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the translation cache")
+    parser.add_argument("--clear-cache", action="store_true", help="clear the translation cache and exit")
+    parser.add_argument("--metrics", action="store_true",
+                        help="write JSON and Prometheus metrics next to the output")
+    parser.add_argument("--list-models", action="store_true", help="list local Ollama models and exit")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print errors")
+    return parser
+
+@contextmanager
+def cancel_on_interrupt(cancel):
+    """Call cancel on the first Ctrl+C instead of raising KeyboardInterrupt.
+
+    Raised in the middle of a job, KeyboardInterrupt would first wait for
+    the requests in flight; cancel aborts them instead. A second Ctrl+C
+    interrupts as usual. Only the main thread receives signals, so elsewhere
+    this does nothing.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def on_interrupt(signum, frame):
+        signal.signal(signal.SIGINT, previous)
+        # Not in the handler itself, which may have interrupted a thread holding a lock cancel needs
+        threading.Thread(target=cancel, daemon=True).start()
+
+    previous = signal.signal(signal.SIGINT, on_interrupt)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    configure_http_client(read_timeout=args.timeout, pool_maxsize=max(DEFAULT_POOL_MAXSIZE, args.workers))
+
+    if args.clear_cache:
+        cache = TranslationCache()
+        try:
+            cache.clear()
+        finally:
+            cache.close()
+        print("Translation cache cleared", file=sys.stderr)
+        return 0
+
+    if args.list_models:
+        try:
+            for model in detect_ollama_models(args.host):
+                print(model)
+        except Exception as e:
+            print(str(e), file=sys.stderr)
+            return 1
+        return 0
+
+    if not args.input:
+        parser.error("an input file is required")
+    if args.backend == "ollama" and not args.model:
+        parser.error("--model is required for the ollama backend")
+    if args.backend == "api" and not (args.api_url and args.api_key):
+        parser.error("--api-url and --api-key are required for the api backend")
+
+    def log(message):
+        if not args.quiet:
+            print(message, file=sys.stderr)
+
+    if len(args.input) > 1 or not os.path.isfile(args.input[0]):
+        if args.calibrate:
+            parser.error("--calibrate takes a single input file")
+        return run_batch(args, log)
+
+    input_file = args.input[0]
+    file_type = detect_file_type(input_file) or args.type
+    if file_type is None:
+        parser.error("cannot detect the file type, use --type")
+
+    def on_progress(value):
+        if not args.quiet:
+            print(f"\rProgress: {value}%", end="", file=sys.stderr, flush=True)
+
+    def on_telemetry(summary):
+        if not args.quiet and summary["progress"] < 100:
+            eta = summary["eta_seconds"]
+            print(f"\rProgress: {summary['progress']}% | {summary['chunks_per_sec']:.1f} chunks/s | "
+                  f"{summary['tokens_per_sec']:.0f} tokens/s | ETA {'-' if eta is None else f'{eta:.0f}s'}   ",
+                  end="", file=sys.stderr, flush=True)
+
+    def on_retry(attempt, delay, error):
+        log(f"\nRetry {attempt} in {delay:.1f}s: {error}")
+
+    job = TranslationJob(
+        input_file, args.output or default_output_path(input_file, args.output_dir, file_type), file_type,
+        args.backend, args.model, args.api_url, args.api_key, args.bilingual,
+        args.source, args.target, args.workers, not args.no_cache, args.batch_size,
+        args.stream, args.rps, args.tpm, args.retries, args.metrics,
+        ollama_host=args.host,
+        keep_alive=args.keep_alive,
+        hedge_percentile=args.hedge / 100,
+        hedge_budget=args.hedge_budget,
+        on_progress=on_progress,
+        on_retry=on_retry,
+        on_telemetry=on_telemetry,
+        on_resume=lambda count: log(f"Resuming interrupted job: {count} chunks already translated"),
+        on_cache_stats=lambda hits, misses: log(f"\nCache: {hits} hits, {misses} misses")
+    )
+
+    try:
+        with cancel_on_interrupt(job.cancel):
+            if args.calibrate:
+                log("Calibrating chunk size...")
+                chunk_size = job.calibrate(on_measurement=lambda m: log(
+                    f"  {m.chunk_size:>5} tokens: " + (f"failed: {m.error}" if m.error else
+                                                       f"{m.tokens_per_sec:.1f} tokens/s, output ratio {m.output_ratio:.2f}")
+                ))
+                log(f"Chunk size {chunk_size} tokens saved for this model")
+            output_file = job.run()
+    except (KeyboardInterrupt, TranslationCancelled):
+        job.cancel()
+        print("\nTranslation cancelled; run again to resume", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"\nError: {str(e)}", file=sys.stderr)
+        return 1
+
+    summary = job.telemetry.summary()
+    log(f"\nTranslation completed: {output_file}")
+    log(f"{summary['chunks']} chunks, {summary['requests']} requests, {summary['retries']} retries, "
+        f"{summary['chunks_per_sec']:.1f} chunks/s, {summary['tokens_per_sec']:.0f} tokens/s, "
+        f"p95 request {summary['request_seconds_p95'] or 0:.2f} s")
+    if job.hedging is not None:
+        log(f"Hedging: {summary['hedged_requests']} duplicate requests, {summary['hedge_wins']} answered first")
+    if args.metrics:
+        log("Metrics: " + ", ".join(metrics_paths_for(output_file)))
+    return 0
+
+def run_batch(args, log):
+    """Translate several files through a job queue sharing one request budget."""
+    queue = JobQueue(path=None)
+    options = {
+        "model_type": args.backend,
+        "model_name": args.model,
+        "api_url": args.api_url,
+        "merge_bilingual": args.bilingual,
+        "source_lang": args.source,
+        "target_lang": args.target,
+        "max_workers": args.workers,
+        "use_cache": not args.no_cache,
+        "batch_size": args.batch_size,
+        "stream": args.stream,
+        "export_metrics": args.metrics,
+        "ollama_host": args.host,
+        "keep_alive": args.keep_alive,
+        "hedge_percentile": args.hedge / 100,
+        "hedge_budget": args.hedge_budget,
+    }
+    try:
+        jobs = queue.add_paths(args.input, options, args.pattern, args.recursive, args.output_dir)
+    except ValueError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+    if not jobs:
+        print("No supported files found", file=sys.stderr)
+        return 1
+    log(f"Translating {len(jobs)} files, {args.jobs} at a time")
+
+    def on_status(job):
+        if job.status == DONE:
+            log(f"Done: {job.output_file}")
+        elif job.error:
+            print(f"Failed: {job.input_file}: {job.error}", file=sys.stderr)
+
+    runner = QueueRunner(queue, args.workers, args.jobs, args.rps, args.tpm, args.retries, args.api_key,
+                         on_status=on_status,
+                         on_retry=lambda attempt, delay, error: log(f"Retry {attempt} in {delay:.1f}s: {error}"))
+    # Run in the background so Ctrl+C reaches this thread and can cancel the jobs
+    thread = threading.Thread(target=runner.run)
+    cancelled = threading.Event()
+
+    def cancel():
+        cancelled.set()
+        runner.cancel()
+
+    with cancel_on_interrupt(cancel):
+        thread.start()
+        try:
+            while thread.is_alive():
+                thread.join(0.2)
+        except KeyboardInterrupt:
+            cancel()
+            thread.join()
+    if cancelled.is_set():
+        print("\nTranslation cancelled; run again to resume", file=sys.stderr)
+        return 130
+
+    done = sum(1 for job in queue.jobs if job.status == DONE)
+    log(f"{done} of {len(queue.jobs)} files translated")
+    return 0 if done == len(queue.jobs) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
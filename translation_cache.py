@@ -0,0 +1,118 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".longtext_translator", "translation_cache.sqlite")
+DEFAULT_MAX_ENTRIES = 200000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+def normalize_text(text):
+    """Normalize text so that trivially different copies share a cache entry."""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in text.strip().split("\n"))
+
+def make_cache_key(text, backend, model, source_lang, target_lang, prompt_version):
+    """Build the cache key for a text translated with the given settings."""
+    parts = [normalize_text(text), backend, model or "", source_lang, target_lang, str(prompt_version)]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+class TranslationCache:
+    """Disk-backed translation memory with least-recently-used eviction."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "key TEXT PRIMARY KEY, translation TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON translations (last_access)")
+        self._conn.commit()
+
+        self._entries, self._bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM translations"
+        ).fetchone()
+
+    def get(self, key):
+        """Return the cached translation for key, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT translation FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute("UPDATE translations SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key, translation):
+        """Store a translation, evicting old entries if the cache is full."""
+        size = len(translation.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM translations WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._entries -= 1
+                self._bytes -= old[0]
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, translation, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, translation, size, time.time())
+            )
+            self._entries += 1
+            self._bytes += size
+
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is within its limits."""
+        while self._entries > self.max_entries or self._bytes > self.max_bytes:
+            # Remove in batches so a large overshoot does not take one query per entry
+            batch = max(1, self._entries - self.max_entries, self._entries // 100)
+            rows = self._conn.execute(
+                "SELECT key, size FROM translations ORDER BY last_access LIMIT ?", (batch,)
+            ).fetchall()
+            if not rows:
+                break
+
+            self._conn.executemany("DELETE FROM translations WHERE key = ?", [(key,) for key, _ in rows])
+            self._entries -= len(rows)
+            self._bytes -= sum(size for _, size in rows)
+
+    def clear(self):
+        """Remove every cached translation."""
+        with self._lock:
+            self._conn.execute("DELETE FROM translations")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+            self._entries = 0
+            self._bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": self._entries,
+                "bytes": self._bytes
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,311 @@
+import os
+import time
+from functools import partial
+
+from file_handlers import detect_file_type, get_file_format
+from translation_cache import TranslationCache
+from checkpoint import open_job_journal
+from model_handlers import (make_ollama_translator, make_api_translator, translate_subtitle_texts,
+                            iter_subtitle_translations, warm_up_ollama_model, ollama_num_ctx,
+                            StreamMonitor, OLLAMA_DEFAULT_HOST, OLLAMA_DEFAULT_KEEP_ALIVE, DEFAULT_MAX_WORKERS,
+                            DEFAULT_SUBTITLE_BATCH_SIZE, PROMPT_VERSION)
+from rate_limiter import RequestGovernor, DEFAULT_MAX_RETRIES
+from pipeline import run_text_pipeline, run_segment_pipeline
+from telemetry import JobTelemetry, metrics_paths_for
+from http_client import RequestScope
+from hedging import HedgePolicy, DEFAULT_HEDGE_BUDGET
+from chunk_tuner import (calibrate_chunk_size, calibration_sizes, read_sample, resolve_chunk_size,
+                         save_tuned_chunk_size, CALIBRATION_SAMPLE_TOKENS)
+from chunking import CHARS_PER_TOKEN
+
+# Seconds between live telemetry summaries
+SUMMARY_INTERVAL = 0.5
+
+def default_output_path(input_file, output_dir=None, file_type=None):
+    """Return the default output path: the input name with a _translated suffix.
+
+    The output goes next to the input unless output_dir is given. Documents
+    translated into plain text, such as PDF, get a .txt extension; the
+    format is detected from the file, falling back to file_type.
+    """
+    name, ext = os.path.splitext(os.path.basename(input_file))
+    file_type = detect_file_type(input_file) or file_type
+    if file_type is not None and file_type != "txt" and get_file_format(file_type).kind == "document":
+        ext = ".txt"
+    return os.path.join(output_dir or os.path.dirname(input_file), f"{name}_translated{ext}")
+
+class TranslationJob:
+    """Translate one file end to end, reporting through plain callbacks.
+
+    This is the translation core shared by the GUI and the command line; it
+    does not depend on Qt. The format is detected from the file content,
+    falling back to file_type when it cannot be told. Callbacks are optional:
+
+    - on_progress(percent)
+    - on_stream(ttft, tokens_per_sec, in_flight_percent)
+    - on_retry(attempt, delay, error_message)
+    - on_resume(journaled_chunks)
+    - on_cache_stats(hits, misses)
+    - on_telemetry(summary), with the dict of JobTelemetry.summary()
+
+    Markup formats such as EPUB are written back in their own format, with
+    their text units translated batch_size at a time, unless output_file has
+    another extension; then their text is translated like any document.
+
+    ollama_host may list several hosts separated by commas; chunks are then
+    spread over all of them, and each keeps the model loaded for keep_alive.
+    Passing a governor shares its request budget with other jobs; by default
+    the job gets its own. With hedge_percentile set (e.g. 0.95), a request
+    slower than that share of recent ones is duplicated, up to hedge_budget
+    extra requests per request; see HedgePolicy.
+
+    Text is chunked at the size calibrated for the backend and model, if
+    any; calibrate() measures it on a sample of this file. With export_metrics=True the job's metrics are written next to the
+    output as JSON and Prometheus text, whether or not the job succeeds.
+    """
+
+    def __init__(self, input_file, output_file, file_type, model_type, model_name,
+                 api_url=None, api_key=None, merge_bilingual=False, source_lang="auto", target_lang="en",
+                 max_workers=DEFAULT_MAX_WORKERS, use_cache=True, batch_size=DEFAULT_SUBTITLE_BATCH_SIZE,
+                 stream=False, requests_per_second=0, tokens_per_minute=0, max_retries=DEFAULT_MAX_RETRIES,
+                 export_metrics=False, governor=None, ollama_host=OLLAMA_DEFAULT_HOST,
+                 keep_alive=OLLAMA_DEFAULT_KEEP_ALIVE, hedge_percentile=None, hedge_budget=DEFAULT_HEDGE_BUDGET,
+                 on_progress=None, on_stream=None, on_retry=None, on_resume=None,
+                 on_cache_stats=None, on_telemetry=None):
+        self.input_file = input_file
+        self.output_file = output_file
+        self.file_type = detect_file_type(input_file) or file_type
+        self.file_format = get_file_format(self.file_type)
+        self.keep_format = self.file_format.kind == "markup" and \
+            os.path.splitext(output_file)[1].lower() in self.file_format.extensions
+        self.model_type = model_type
+        self.model_name = model_name
+        self.ollama_host = ollama_host
+        self.keep_alive = keep_alive
+        self.api_url = api_url
+        self.api_key = api_key
+        self.merge_bilingual = merge_bilingual
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self.max_workers = max_workers
+        self.use_cache = use_cache
+        self.batch_size = batch_size
+        self.chunk_size = resolve_chunk_size(model_type, model_name if model_type == "ollama" else api_url)
+        self.stream = stream
+        self.on_progress = on_progress
+        self.on_resume = on_resume
+        self.on_cache_stats = on_cache_stats
+        self.on_telemetry = on_telemetry
+        self.export_metrics = export_metrics
+        self.telemetry = JobTelemetry(model_type, model_name if model_type == "ollama" else api_url)
+        self._last_summary = 0
+        self.monitor = StreamMonitor(on_update=on_stream)
+        self.scope = RequestScope()
+        self.hedging = HedgePolicy(hedge_percentile, hedge_budget) if hedge_percentile else None
+        self.telemetry.hedging = self.hedging
+        self.governor = governor or RequestGovernor(
+            max_workers,
+            requests_per_second=requests_per_second,
+            tokens_per_minute=tokens_per_minute,
+            max_retries=max_retries,
+            cancel_event=self.monitor.cancelled,
+            on_retry=on_retry
+        )
+
+    def cancel(self):
+        """Stop scheduling chunks and abort the requests in flight."""
+        self.monitor.cancel()
+        self.scope.close()
+
+    def pause(self):
+        """Hold back new requests and abort the ones in flight until resume().
+
+        Finished chunks are kept; the aborted requests are sent again on resume.
+        """
+        self.scope.pause()
+
+    def resume(self):
+        self.scope.resume()
+
+    @property
+    def paused(self):
+        return self.scope.paused
+
+    def run(self):
+        """Translate the input file and return the output path.
+
+        Raises TranslationCancelled if cancelled and Exception on failure;
+        in both cases finished chunks stay in the journal for a later resume.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_file)), exist_ok=True)
+
+        # Open the checkpoint journal, resuming an interrupted run of the same job
+        journal = open_job_journal(
+            self.input_file, self.output_file, self.file_type, self.model_type,
+            self.model_name if self.model_type == "ollama" else self.api_url,
+            self.source_lang, self.target_lang, self.chunk_size, PROMPT_VERSION,
+            self.batch_size if self.file_format.kind == "subtitle" or self.keep_format else 1
+        )
+        if len(journal) > 0 and self.on_resume:
+            self.on_resume(len(journal))
+
+        cache = TranslationCache() if self.use_cache else None
+        self.telemetry.cache = cache
+        try:
+            if self.file_format.kind == "subtitle":
+                self.translate_subtitles(cache, journal)
+            elif self.keep_format:
+                self.translate_markup(cache, journal)
+            else:
+                self.translate_document(cache, journal)
+        finally:
+            journal.close()
+            self.report_telemetry(force=True)
+            if self.export_metrics:
+                self.write_metrics()
+            if cache is not None:
+                if self.on_cache_stats:
+                    self.on_cache_stats(cache.hits, cache.misses)
+                cache.close()
+
+        # The output is complete, so the journal is no longer needed
+        journal.remove()
+        return self.output_file
+
+    def report_progress(self, value):
+        self.telemetry.progress = value
+        if self.on_progress:
+            self.on_progress(value)
+        self.report_telemetry()
+
+    def report_telemetry(self, force=False):
+        """Send a live telemetry summary, at most once per SUMMARY_INTERVAL."""
+        now = time.monotonic()
+        if self.on_telemetry is None or not force and now - self._last_summary < SUMMARY_INTERVAL:
+            return
+        self._last_summary = now
+        self.on_telemetry(self.telemetry.summary())
+
+    def write_metrics(self):
+        json_path, prometheus_path = metrics_paths_for(self.output_file)
+        self.telemetry.write_json(json_path)
+        self.telemetry.write_prometheus(prometheus_path)
+
+    def make_translator(self, cache, numbered=False, chunk_size=None, measured=True):
+        """Create the per-chunk translation function for the selected backend.
+
+        chunk_size defaults to the job's; measured=False keeps the requests
+        out of the job's telemetry.
+        """
+        telemetry = self.telemetry if measured else None
+        if self.model_type == "ollama":
+            return make_ollama_translator(self.model_name, self.source_lang, self.target_lang, cache,
+                                          numbered=numbered, stream=self.stream, monitor=self.monitor,
+                                          governor=self.governor, host=self.ollama_host, telemetry=telemetry,
+                                          scope=self.scope, keep_alive=self.keep_alive,
+                                          num_ctx=ollama_num_ctx(chunk_size or self.chunk_size, self.model_name),
+                                          hedging=self.hedging, tagged=self.keep_format)
+        return make_api_translator(self.api_url, self.api_key, self.source_lang, self.target_lang, cache,
+                                   numbered=numbered, governor=self.governor, telemetry=telemetry,
+                                   scope=self.scope, hedging=self.hedging)
+
+    def calibrate(self, on_measurement=None):
+        """Find the fastest chunk size on a sample of the input, save it and use it for this job.
+
+        A sample of the document is translated, uncached, at each size of
+        CALIBRATION_SIZES that fits the model. The fastest size whose output
+        is not cut short wins and is saved for the backend and model, so
+        later jobs start with it. on_measurement(measurement) is called
+        after each size. Returns the chosen size.
+        """
+        if self.file_format.kind == "subtitle":
+            raise Exception("Subtitles are sent in batches of cues; there is no chunk size to calibrate")
+        model = self.model_name if self.model_type == "ollama" else self.api_url
+        sizes = calibration_sizes(self.model_type, self.model_name)
+
+        segments, _ = self.file_format.open_stream(self.input_file)
+        sample = read_sample(segments, max(CALIBRATION_SAMPLE_TOKENS, max(sizes) * self.max_workers))
+        if not sample.strip():
+            raise Exception(f"No text to calibrate on in {self.input_file}")
+
+        def make_translator(chunk_size):
+            if self.model_type == "ollama":
+                # Each size loads the model with its own context, which must not count against it
+                warm_up_ollama_model(self.model_name, self.ollama_host, self.keep_alive,
+                                     ollama_num_ctx(chunk_size, self.model_name))
+            return self.make_translator(None, chunk_size=chunk_size, measured=False)
+
+        chunk_size, measurements = calibrate_chunk_size(sample, make_translator, sizes, self.max_workers,
+                                                        self.monitor.cancelled, on_measurement)
+        save_tuned_chunk_size(self.model_type, model, chunk_size, measurements)
+        self.chunk_size = chunk_size
+        return chunk_size
+
+    def translate_document(self, cache, journal):
+        """Stream a text document through the translation pipeline."""
+        if self.file_format.open_segments is not None:
+            # Formats read by byte offset resume from where they stopped
+            run_segment_pipeline(
+                partial(self.file_format.open_segments, self.input_file),
+                self.output_file,
+                self.make_translator(cache),
+                total_bytes=os.path.getsize(self.input_file),
+                chunk_size=self.chunk_size,
+                max_workers=self.max_workers,
+                journal=journal,
+                progress_signal=self.report_progress,
+                cancel_event=self.monitor.cancelled
+            )
+            return
+
+        segments, total_segments = self.file_format.open_stream(self.input_file)
+        run_text_pipeline(
+            segments,
+            self.output_file,
+            self.make_translator(cache),
+            total_segments=total_segments,
+            chunk_size=self.chunk_size,
+            max_workers=self.max_workers,
+            journal=journal,
+            progress_signal=self.report_progress,
+            cancel_event=self.monitor.cancelled
+        )
+
+    def translate_markup(self, cache, journal):
+        """Translate the text units of a structured document and write it in its own format."""
+        document = self.file_format.read(self.input_file)
+        if document is None:
+            raise Exception(f"Failed to read {self.input_file}")
+
+        # Consecutive units share a request up to the chunk size, as subtitle cues do
+        translated_texts = translate_subtitle_texts(
+            document.texts,
+            self.make_translator(cache),
+            self.make_translator(cache, numbered=True),
+            self.report_progress,
+            self.max_workers,
+            journal,
+            self.batch_size,
+            max_batch_chars=self.chunk_size * CHARS_PER_TOKEN,
+            cancel_event=self.monitor.cancelled
+        )
+        if not self.file_format.write(self.output_file, document, translated_texts):
+            raise Exception(f"Failed to write {self.output_file}")
+
+    def translate_subtitles(self, cache, journal):
+        """Translate a subtitle file, writing each (optionally bilingual) cue as its translation arrives."""
+        cues = self.file_format.read(self.input_file)
+        if cues is None:
+            raise Exception(f"Failed to read {self.input_file}")
+
+        translated_texts = iter_subtitle_translations(
+            cues.iter_texts(),
+            self.make_translator(cache),
+            self.make_translator(cache, numbered=True),
+            self.report_progress,
+            self.max_workers,
+            journal,
+            self.batch_size,
+            cancel_event=self.monitor.cancelled
+        )
+        self.file_format.write(self.output_file, cues, translated_texts, self.merge_bilingual)